@@ -0,0 +1,184 @@
+"""Benchmark del packer de guillotina de la Nesting App.
+
+Uso:
+    python -m benchmarks.nesting_bench --sizes 100 500 2000
+
+Compara `pack_group_with_positions` con la implementación de referencia
+(`_pack_group_reference`) sobre grupos de laminado sintéticos y comprueba
+que los layouts son idénticos.
+
+    python -m benchmarks.nesting_bench --groups 30 --workers 4
+
+Mide el runner de grupos en paralelo (`iter_packed_jobs`) frente a empaquetar
+los grupos uno detrás de otro, junto al tiempo del grupo más lento.
+
+    python -m benchmarks.nesting_bench --zip 800 --workers 4
+
+Mide el ZIP de layouts: matplotlib en serie frente a Pillow en paralelo.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from lib.nesting import EDGE_MARGIN, GroupLayout, PieceItem, get_board_rule  # noqa: E402
+from lib.nesting.packer import _pack_group_reference, clear_pack_cache, pack_group_with_positions  # noqa: E402
+from lib.nesting.render import build_layouts_zip, clear_render_cache, typology_color_map  # noqa: E402
+from lib.nesting.runner import iter_packed_jobs  # noqa: E402
+
+DEFAULT_SIZES = [100, 500, 2000]
+# Anchos/altos típicos de frentes y costados CUBRO (mm).
+FRONT_WIDTHS = [147, 197, 297, 347, 397, 447, 497, 597, 797, 897]
+FRONT_HEIGHTS = [138, 197, 277, 357, 447, 597, 717, 797, 897, 1197, 1597, 2000, 2298]
+TYPOLOGIES = ["Puerta", "Cajón", "Costado", "Balda", "Zócalo", "Tapeta"]
+
+
+def generate_group(n_pieces: int, seed: int = 0, custom_ratio: float = 0.2) -> list[PieceItem]:
+    """Grupo realista: mayoría de medidas estándar repetidas y un % de piezas a medida."""
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(n_pieces):
+        if rng.random() < custom_ratio:
+            w, h = float(rng.integers(80, 1200)), float(rng.integers(80, 2900))
+        else:
+            w, h = float(rng.choice(FRONT_WIDTHS)), float(rng.choice(FRONT_HEIGHTS))
+        items.append(PieceItem(piece_id=f"P{i}", typology=TYPOLOGIES[i % len(TYPOLOGIES)], w=w, h=h))
+    return items
+
+
+def bench_size(n_pieces: int, gama: str = "laminado", repeats: int = 3) -> dict:
+    rule = get_board_rule(gama, "")
+    usable_w = rule["board_w"] - 2 * EDGE_MARGIN
+    usable_h = rule["board_h"] - 2 * EDGE_MARGIN
+    items = generate_group(n_pieces, seed=n_pieces)
+
+    def best_time(func):
+        best, result = float("inf"), None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = func(items, usable_w, usable_h, rule["rotate"])
+            best = min(best, time.perf_counter() - start)
+        return best, result
+
+    ref_s, ref = best_time(_pack_group_reference)
+    new_s, new = best_time(pack_group_with_positions)
+    return {
+        "pieces": n_pieces,
+        "boards": len(new[0]),
+        "reference_s": ref_s,
+        "packer_s": new_s,
+        "speedup": ref_s / new_s if new_s else float("inf"),
+        "identical": new == ref,
+    }
+
+
+def bench_groups(n_groups: int = 30, pieces_per_group: int = 400, workers: int | None = None) -> dict:
+    """Semana multi-proyecto sintética: `n_groups` grupos de acabado independientes."""
+    rule = get_board_rule("laminado", "")
+    usable_w = rule["board_w"] - 2 * EDGE_MARGIN
+    usable_h = rule["board_h"] - 2 * EDGE_MARGIN
+    jobs = [
+        (generate_group(pieces_per_group // 2 + (g * 37) % pieces_per_group, seed=g), usable_w, usable_h, rule["rotate"])
+        for g in range(n_groups)
+    ]
+
+    slowest = 0.0
+    start = time.perf_counter()
+    sequential = []
+    for job in jobs:
+        t0 = time.perf_counter()
+        sequential.append(pack_group_with_positions(*job))
+        slowest = max(slowest, time.perf_counter() - t0)
+    sequential_s = time.perf_counter() - start
+
+    clear_pack_cache()
+    start = time.perf_counter()
+    parallel = dict(iter_packed_jobs(jobs, max_workers=workers))
+    parallel_s = time.perf_counter() - start
+    clear_pack_cache()
+    return {
+        "groups": n_groups,
+        "sequential_s": sequential_s,
+        "parallel_s": parallel_s,
+        "slowest_group_s": slowest,
+        "identical": [parallel[i] for i in range(len(jobs))] == sequential,
+    }
+
+
+def bench_zip(n_pieces: int = 800, workers: int | None = None) -> dict:
+    """ZIP de layouts de un grupo de `n_pieces`: matplotlib en serie vs Pillow en el pool."""
+    rule = get_board_rule("laminado", "")
+    usable_w = rule["board_w"] - 2 * EDGE_MARGIN
+    usable_h = rule["board_h"] - 2 * EDGE_MARGIN
+    items = generate_group(n_pieces, seed=n_pieces)
+    boards, unplaced = pack_group_with_positions(items, usable_w, usable_h, rule["rotate"])
+    layout = GroupLayout(
+        material="MDF", gama="laminado", acabado="blanco", gama_raw="LAM", acabado_raw="Blanco",
+        board_w=rule["board_w"], board_h=rule["board_h"], usable_w=usable_w, usable_h=usable_h,
+        allow_rotate=rule["rotate"], pieces=n_pieces, nominal_area=sum(it.w * it.h for it in items),
+        boards=boards, unplaced=unplaced,
+    )
+    colors = typology_color_map(TYPOLOGIES)
+
+    timings = {}
+    for name, backend, max_workers in (("matplotlib_s", "matplotlib", 1), ("pil_s", "pil", workers)):
+        clear_render_cache()
+        start = time.perf_counter()
+        build_layouts_zip([layout], colors, "Bench", backend=backend, max_workers=max_workers)
+        timings[name] = time.perf_counter() - start
+    clear_render_cache()
+    return {"boards": len(boards), **timings, "speedup": timings["matplotlib_s"] / timings["pil_s"]}
+
+
+def format_report(results: list[dict]) -> str:
+    lines = [f"{'piezas':>8} {'tableros':>9} {'referencia':>12} {'packer':>10} {'speedup':>8} {'idéntico':>9}"]
+    for res in results:
+        lines.append(
+            f"{res['pieces']:>8} {res['boards']:>9} {res['reference_s'] * 1000:>9.1f} ms "
+            f"{res['packer_s'] * 1000:>7.1f} ms {res['speedup']:>7.1f}x {'sí' if res['identical'] else 'NO':>9}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del packer de la Nesting App")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--gama", default="laminado")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--groups", type=int, default=0, help="Mide el runner paralelo con N grupos")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--zip", type=int, default=0, help="Mide el ZIP de layouts con un grupo de N piezas")
+    args = parser.parse_args(argv)
+
+    if args.zip:
+        res = bench_zip(args.zip, workers=args.workers)
+        print(
+            f"{res['boards']} tableros: matplotlib {res['matplotlib_s']:.2f} s · "
+            f"Pillow {res['pil_s']:.2f} s · speedup {res['speedup']:.1f}x"
+        )
+        return 0
+
+    if args.groups:
+        res = bench_groups(args.groups, workers=args.workers)
+        print(
+            f"{res['groups']} grupos: secuencial {res['sequential_s']:.2f} s · paralelo {res['parallel_s']:.2f} s · "
+            f"grupo más lento {res['slowest_group_s']:.2f} s · idéntico {'sí' if res['identical'] else 'NO'}"
+        )
+        return 0 if res["identical"] else 1
+
+    results = [bench_size(size, gama=args.gama, repeats=args.repeats) for size in args.sizes]
+    print(format_report(results))
+    return 0 if all(res["identical"] for res in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
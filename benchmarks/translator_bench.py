@@ -0,0 +1,215 @@
+"""Benchmark del Traductor ALVIC con proyectos CUBRO sintéticos.
+
+Uso:
+    python -m benchmarks.translator_bench --sizes 100 1000 10000 100000
+    python -m benchmarks.translator_bench --save-baseline benchmarks/baseline.json
+    python -m benchmarks.translator_bench --baseline benchmarks/baseline.json --max-regression 0.25
+
+Sale con código 1 si alguna talla es más lenta (filas/s) que el baseline
+por encima del umbral de regresión.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from translator import (  # noqa: E402
+    CUBRO_COLORS_ORDER,
+    EXPECTED_COLS,
+    AlvicCatalogIndex,
+    _build_output,
+    _choose_project_id_column,
+    _translate_lac_columnar,
+    detect_is_lac_mask,
+    extract_filename_suffix,
+    final_safety_min_dims_on_output,
+    load_alvic_db,
+    load_input_csv,
+    machined_rules_mask,
+)
+
+DEFAULT_DB = REPO_ROOT / "data" / "base_datos_alvic_2026.csv"
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000]
+STAGES = ["csv_load", "lac_detection", "mec_rules", "matching", "output_build", "final_safety"]
+
+
+def generate_cubro_input(n_rows: int, db_csv_path: Path = DEFAULT_DB, seed: int = 0) -> pd.DataFrame:
+    """Input CUBRO realista: medidas del catálogo real (con holguras, giros y
+    piezas pequeñas), colores de `CUBRO_COLORS_ORDER` y ~30 piezas por proyecto
+    con muchas medidas repetidas, como en una cocina."""
+    rng = np.random.default_rng(seed)
+    db = load_alvic_db(str(db_csv_path))
+    dims = db[["Ancho", "Alto"]].drop_duplicates().to_numpy(dtype=int)
+
+    n_projects = max(1, n_rows // 30)
+    project = rng.integers(0, n_projects, n_rows)
+    # Cada proyecto usa un color y una docena de medidas de frente.
+    project_color = rng.integers(0, len(CUBRO_COLORS_ORDER), n_projects)
+    project_sizes = rng.integers(0, len(dims), (n_projects, 12))
+    size_idx = project_sizes[project, rng.integers(0, 12, n_rows)]
+
+    ancho = dims[size_idx, 0].astype(float)
+    alto = dims[size_idx, 1].astype(float)
+    ancho -= rng.choice([0, 0, 0, 1, 3], n_rows)
+    alto -= rng.choice([0, 0, 0, 1, 3], n_rows)
+    rotated = rng.random(n_rows) < 0.15
+    ancho[rotated], alto[rotated] = alto[rotated], ancho[rotated].copy()
+    small = rng.random(n_rows) < 0.03
+    ancho[small] = rng.integers(60, 240, small.sum())
+    custom = rng.random(n_rows) < 0.05
+    alto[custom] = rng.integers(100, 2600, custom.sum())
+
+    colors = np.array(CUBRO_COLORS_ORDER, dtype=object)[project_color[project]]
+    gama = np.where(rng.random(n_rows) < 0.85, "LAC", "WOO")
+    mecanizado = np.where(rng.random(n_rows) < 0.1, "x", "")
+    tirador = rng.choice(["", "", "", "Round", "Square", "Pill", "Knob"], n_rows)
+
+    data = {
+        "ID de Proyecto": [f"SP-{10000 + p:05d} Cliente{p}" for p in project],
+        "SKU": [f"SKU{i}" for i in range(n_rows)],
+        "ID de pieza": [f"P{i}" for i in range(n_rows)],
+        "Tipología de pieza": rng.choice(["Puerta", "Cajón", "Costado", "Balda"], n_rows),
+        "Ancho": ancho.astype(int),
+        "Alto": alto.astype(int),
+        "Material": "MDF",
+        "Gama": gama,
+        "Acabado": colors,
+        "Mecanizado o sin mecanizar (vacío)": mecanizado,
+        "Modelo de tirador": tirador,
+    }
+    df = pd.DataFrame(data)
+    for col in EXPECTED_COLS:
+        if col not in df.columns:
+            df[col] = ""
+    return df[EXPECTED_COLS]
+
+
+def run_stages(input_csv: Path, catalog: AlvicCatalogIndex) -> dict:
+    """Ejecuta el pipeline de `translate_dataframe` etapa a etapa y mide cada una."""
+    timings: dict = {}
+
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        timings[stage] = time.perf_counter() - start
+        return value
+
+    inp = timed("csv_load", load_input_csv, str(input_csv))
+    lac_df = timed("lac_detection", lambda df: df[detect_is_lac_mask(df)], inp)
+    mec_rules = timed("mec_rules", machined_rules_mask, lac_df)
+    # El motor reutiliza las reglas MEC ya medidas: `matching` no las vuelve a contar.
+    out = timed("matching", lambda df: _translate_lac_columnar(df, catalog, mec_rules=mec_rules), lac_df)
+
+    project_id_col = _choose_project_id_column(inp)
+    suffix = extract_filename_suffix(input_csv.name)
+
+    def build(out_df):
+        machined = out_df[out_df["Is_Mec_Final"] == True].reset_index(drop=True)
+        non_machined = out_df[out_df["Is_Mec_Final"] == False].reset_index(drop=True)
+        return (
+            (_build_output(machined, True, project_id_col, suffix), machined),
+            (_build_output(non_machined, False, project_id_col, suffix), non_machined),
+        )
+
+    built = timed("output_build", build, out)
+    timed(
+        "final_safety",
+        lambda parts: [final_safety_min_dims_on_output(o, cuttable_axis=d["Cuttable_Axis_Side"]) for o, d in parts],
+        built,
+    )
+    return {"rows": len(inp), "lac_rows": len(lac_df), "stages": timings, "total": sum(timings.values())}
+
+
+def bench_size(n_rows: int, catalog: AlvicCatalogIndex, workdir: Path, measure_memory: bool = True) -> dict:
+    input_csv = workdir / f"PRJ_bench_{n_rows}.csv"
+    generate_cubro_input(n_rows, seed=n_rows).to_csv(input_csv, index=False)
+
+    catalog.clear_match_cache()
+    result = run_stages(input_csv, catalog)
+    result["rows_per_sec"] = result["rows"] / result["total"] if result["total"] else float("inf")
+
+    if measure_memory:
+        # Pasada aparte: tracemalloc ralentiza y falsearía los tiempos.
+        catalog.clear_match_cache()
+        tracemalloc.start()
+        run_stages(input_csv, catalog)
+        result["peak_mem_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result
+
+
+def check_regressions(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    failures = []
+    for size, res in results.items():
+        base = baseline.get(str(size))
+        if not base:
+            continue
+        floor = base["rows_per_sec"] * (1 - max_regression)
+        if res["rows_per_sec"] < floor:
+            failures.append(
+                f"{size} filas: {res['rows_per_sec']:.0f} filas/s < {floor:.0f} "
+                f"(baseline {base['rows_per_sec']:.0f}, umbral {max_regression:.0%})"
+            )
+    return failures
+
+
+def format_report(results: dict, catalog_load_s: float) -> str:
+    lines = [f"Carga catálogo: {catalog_load_s * 1000:.1f} ms"]
+    header = f"{'filas':>8} {'filas/s':>10} {'pico MB':>8} " + " ".join(f"{s:>13}" for s in STAGES)
+    lines.append(header)
+    for size, res in results.items():
+        stages = " ".join(f"{res['stages'][s] * 1000:>10.1f} ms" for s in STAGES)
+        peak = f"{res['peak_mem_mb']:>8.1f}" if "peak_mem_mb" in res else f"{'-':>8}"
+        lines.append(f"{size:>8} {res['rows_per_sec']:>10.0f} {peak} {stages}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del Traductor ALVIC")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB)
+    parser.add_argument("--no-memory", action="store_true", help="No medir pico de memoria")
+    parser.add_argument("--baseline", type=Path, help="JSON de un run anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Caída máxima de filas/s (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", type=Path, help="Guarda los resultados como baseline")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    catalog = AlvicCatalogIndex.from_csv(str(args.db))
+    catalog_load_s = time.perf_counter() - start
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            results[size] = bench_size(size, catalog, Path(tmp), measure_memory=not args.no_memory)
+
+    print(format_report(results, catalog_load_s))
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps({str(k): v for k, v in results.items()}, indent=2), encoding="utf-8")
+        print(f"Baseline guardado en {args.save_baseline}")
+
+    if args.baseline:
+        failures = check_regressions(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.max_regression)
+        for failure in failures:
+            print(f"REGRESIÓN: {failure}")
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+"""Motor de nesting (guillotina) de la Nesting App."""
+
+from .models import (
+    FreeRect,
+    GroupLayout,
+    Heuristic,
+    Leftover,
+    NestingResult,
+    Offcut,
+    OffcutUse,
+    PieceItem,
+    PlacedPiece,
+)
+from .rules import (
+    BOARD_RULES,
+    EDGE_MARGIN,
+    GAMA_DISPLAY,
+    GAP_BETWEEN,
+    get_board_rule,
+    normalize_acabado,
+    normalize_gama,
+    normalize_material,
+)
+from .loader import BytesUploadedFile, csv_content_hash, load_pieces_v5, read_csv_robust
+from .packer import (
+    DEFAULT_HEURISTIC,
+    FIT_SCORES,
+    ORDERINGS,
+    clear_pack_cache,
+    pack_cache_info,
+    pack_group_cached,
+    pack_group_with_positions,
+)
+from .portfolio import DEFAULT_PORTFOLIO, PortfolioResult, pack_portfolio
+from .bounds import area_lower_bound, bin_packing_l2, board_lower_bound
+from .search import SearchProgress, SearchResult, improve_layout
+from .runner import iter_packed_jobs
+from .offcuts import fill_offcuts, mark_offcuts_used, offcuts_by_group, offcuts_from_df
+from .leftovers import (
+    DEFAULT_LEFTOVER_MIN,
+    board_leftovers,
+    group_leftovers,
+    leftover_sheet_rows,
+    maximal_free_rects,
+)
+from .engine import nest_group, nest_pieces
+from .batch import batch_content_hash, batch_savings, download_many, load_pieces_batch
+
+__all__ = [
+    "FreeRect",
+    "GroupLayout",
+    "Heuristic",
+    "Leftover",
+    "NestingResult",
+    "Offcut",
+    "OffcutUse",
+    "PieceItem",
+    "PlacedPiece",
+    "BOARD_RULES",
+    "EDGE_MARGIN",
+    "GAMA_DISPLAY",
+    "GAP_BETWEEN",
+    "get_board_rule",
+    "normalize_acabado",
+    "normalize_gama",
+    "normalize_material",
+    "BytesUploadedFile",
+    "csv_content_hash",
+    "load_pieces_v5",
+    "read_csv_robust",
+    "DEFAULT_HEURISTIC",
+    "FIT_SCORES",
+    "ORDERINGS",
+    "clear_pack_cache",
+    "pack_cache_info",
+    "pack_group_cached",
+    "pack_group_with_positions",
+    "DEFAULT_PORTFOLIO",
+    "PortfolioResult",
+    "pack_portfolio",
+    "area_lower_bound",
+    "bin_packing_l2",
+    "board_lower_bound",
+    "SearchProgress",
+    "SearchResult",
+    "improve_layout",
+    "iter_packed_jobs",
+    "fill_offcuts",
+    "mark_offcuts_used",
+    "offcuts_by_group",
+    "offcuts_from_df",
+    "DEFAULT_LEFTOVER_MIN",
+    "board_leftovers",
+    "group_leftovers",
+    "leftover_sheet_rows",
+    "maximal_free_rects",
+    "nest_group",
+    "nest_pieces",
+    "batch_content_hash",
+    "batch_savings",
+    "download_many",
+    "load_pieces_batch",
+]
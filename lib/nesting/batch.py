@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from lib.nesting.loader import BytesUploadedFile, csv_content_hash, load_pieces_v5
+from lib.nesting.models import NestingResult
+
+# Columna con el CSV de origen de cada pieza en un lote.
+SOURCE_COL = "Archivo"
+# Las descargas son I/O de red: más hilos que núcleos, pero sin saturar la API de Drive.
+DOWNLOAD_MAX_WORKERS = 8
+SAVINGS_KEYS = ["Material", "Gama", "Acabado"]
+
+CsvFile = Tuple[str, bytes]
+
+
+def download_many(
+    file_ids: Sequence[str],
+    download: Callable[[str], bytes],
+    max_workers: Optional[int] = None,
+) -> List[bytes]:
+    """Descarga `file_ids` con `download(file_id)` en un pool de hilos; devuelve los bytes en el mismo orden.
+
+    `download` debe poder llamarse desde varios hilos a la vez (p.ej. un
+    cliente de Drive por llamada).
+    """
+    if not file_ids:
+        return []
+    workers = min(max_workers or DOWNLOAD_MAX_WORKERS, len(file_ids))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(download, file_ids))
+
+
+def batch_content_hash(files: Sequence[CsvFile]) -> str:
+    """Huella de un lote de CSV (no depende del orden en que se seleccionaron)."""
+    parts = sorted(f"{name}\t{csv_content_hash(data)}" for name, data in files)
+    return csv_content_hash("\n".join(parts).encode("utf-8"))
+
+
+def load_pieces_batch(files: Sequence[CsvFile]) -> pd.DataFrame:
+    """Piezas de varios CSV (`(nombre, bytes)`) leídos con `load_pieces_v5` y concatenados.
+
+    Los archivos se leen ordenados por nombre para que el lote dé siempre el
+    mismo nesting; la columna `Archivo` guarda el CSV de origen de cada pieza.
+    """
+    if not files:
+        raise ValueError("El lote no tiene ningún CSV.")
+    frames = []
+    for name, data in sorted(files, key=lambda f: f[0]):
+        try:
+            pieces = load_pieces_v5(BytesUploadedFile(data, name=name))
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}") from e
+        frames.append(pieces.assign(**{SOURCE_COL: name}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def batch_savings(nesting: NestingResult) -> pd.DataFrame:
+    """Tableros por Material + Gama + Acabado nesteando cada proyecto por separado frente a todos juntos.
+
+    Sale de las tablas por proyecto y global del mismo `NestingResult`, así
+    que no hace falta empaquetar nada más. Las tablas por proyecto no usan
+    retales: el ahorro se mide contra el nesting conjunto sin retales y los
+    tableros que cubren los retales van aparte.
+    """
+    columns = SAVINGS_KEYS + ["Proyectos", "Tableros por proyecto", "Tableros en conjunto", "Tableros ahorrados"]
+    with_offcuts = "Tableros sin retales" in nesting.by_finish.columns
+    if with_offcuts:
+        columns += ["Tableros tras retales", "Tableros cubiertos por retales"]
+    if nesting.by_finish.empty:
+        return pd.DataFrame(columns=columns)
+    by_project = nesting.by_project.groupby(SAVINGS_KEYS)
+    by_finish = nesting.by_finish.groupby(SAVINGS_KEYS)
+    parts = [
+        by_project["ProjectID"].nunique().rename("Proyectos"),
+        by_project["Tableros"].sum().rename("Tableros por proyecto"),
+        by_finish["Tableros sin retales" if with_offcuts else "Tableros"].sum().rename("Tableros en conjunto"),
+    ]
+    if with_offcuts:
+        parts.append(by_finish["Tableros"].sum().rename("Tableros tras retales"))
+    out = pd.concat(parts, axis=1).fillna(0).astype(int).reset_index()
+    out["Tableros ahorrados"] = out["Tableros por proyecto"] - out["Tableros en conjunto"]
+    if with_offcuts:
+        out["Tableros cubiertos por retales"] = out["Tableros en conjunto"] - out["Tableros tras retales"]
+    return out[columns].sort_values(SAVINGS_KEYS).reset_index(drop=True)
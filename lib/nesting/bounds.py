@@ -0,0 +1,86 @@
+import math
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import List, Sequence, Tuple
+
+from lib.nesting.models import PieceItem
+from lib.nesting.rules import GAP_BETWEEN
+
+# Tolerancia para que errores de coma flotante no suban la cota un tablero.
+_EPS = 1e-9
+
+
+def area_lower_bound(items: List[PieceItem], usable_w: float, usable_h: float) -> int:
+    """Cota inferior por área: cada pieza ocupa (w + GAP) × (h + GAP) del área útil."""
+    if not items:
+        return 0
+    total = sum((it.w + GAP_BETWEEN) * (it.h + GAP_BETWEEN) for it in items)
+    return max(1, math.ceil(total / (usable_w * usable_h) - _EPS))
+
+
+def _orientations(it: PieceItem, usable_w: float, usable_h: float, allow_rotate: bool) -> List[Tuple[float, float]]:
+    """Orientaciones (ancho, alto) efectivas —con GAP— en las que la pieza cabe en un tablero vacío."""
+    w_eff, h_eff = it.w + GAP_BETWEEN, it.h + GAP_BETWEEN
+    options = [(w_eff, h_eff)]
+    if allow_rotate:
+        options.append((h_eff, w_eff))
+    return [(ow, oh) for ow, oh in options if ow <= usable_w and oh <= usable_h]
+
+
+def bin_packing_l2(sizes: Sequence[float], capacity: float) -> int:
+    """Cota L2 de Martello-Toth para bin packing 1D (ordenando una vez: O(n log n)).
+
+    Para cada umbral `alpha` <= C/2: los elementos > C - alpha van solos, los de
+    (C/2, C - alpha] no comparten contenedor entre sí, y los de [alpha, C/2]
+    solo caben en el hueco que dejan éstos o en contenedores nuevos.
+    """
+    sizes = sorted(s for s in sizes if s > 0)
+    if not sizes:
+        return 0
+    prefix = [0.0, *accumulate(sizes)]
+    half = capacity / 2
+    n_le_half = bisect_right(sizes, half)
+
+    def total(lo: int, hi: int) -> float:
+        return prefix[hi] - prefix[lo]
+
+    best = 0
+    for alpha in {0.0, *sizes[:n_le_half]}:
+        big = bisect_right(sizes, capacity - alpha)  # índice del primer elemento de J1
+        j1 = len(sizes) - big
+        j2_lo = n_le_half
+        j2 = big - j2_lo
+        j3_lo = bisect_left(sizes, alpha)
+        spare = j2 * capacity - total(j2_lo, big)
+        extra = math.ceil((total(j3_lo, n_le_half) - spare) / capacity - _EPS)
+        best = max(best, j1 + j2 + max(0, extra))
+    return best
+
+
+def board_lower_bound(items: List[PieceItem], usable_w: float, usable_h: float, allow_rotate: bool) -> int:
+    """Cota inferior de tableros para un grupo, respetando rotación, GAP y margen.
+
+    Máximo de la cota por área y de dos cotas de franja: las piezas más anchas
+    que medio tablero (en toda orientación permitida) no pueden ir lado a lado,
+    así que sus altos se apilan en cada tablero como un bin packing 1D de
+    capacidad `usable_h` (cota L2); igual con las más altas que medio tablero.
+    Las piezas que no caben en un tablero vacío se ignoran (van a no colocadas).
+    """
+    fitting: List[PieceItem] = []
+    stacked_heights: List[float] = []
+    side_widths: List[float] = []
+    for it in items:
+        options = _orientations(it, usable_w, usable_h, allow_rotate)
+        if not options:
+            continue
+        fitting.append(it)
+        if all(ow > usable_w / 2 for ow, _oh in options):
+            stacked_heights.append(min(oh for _ow, oh in options))
+        if all(oh > usable_h / 2 for _ow, oh in options):
+            side_widths.append(min(ow for ow, _oh in options))
+
+    return max(
+        area_lower_bound(fitting, usable_w, usable_h),
+        bin_packing_l2(stacked_heights, usable_h),
+        bin_packing_l2(side_widths, usable_w),
+    )
@@ -0,0 +1,368 @@
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from lib.nesting.bounds import board_lower_bound
+from lib.nesting.models import GroupLayout, Heuristic, NestingResult, Offcut, OffcutUse, PieceItem
+from lib.nesting.leftovers import DEFAULT_LEFTOVER_MIN, group_leftovers
+from lib.nesting.offcuts import fill_offcuts, offcuts_by_group
+from lib.nesting.packer import DEFAULT_HEURISTIC, pack_cache_key, pack_group_cached
+from lib.nesting.portfolio import PackJob, pack_portfolio
+from lib.nesting.rules import EDGE_MARGIN, GAMA_DISPLAY, get_board_rule
+from lib.nesting.runner import iter_packed_jobs
+from lib.nesting.search import SearchProgress, improve_layout
+
+NORM_COLS = ["Material_norm", "Gama_norm", "Acabado_norm"]
+GROUP_COLS_GLOBAL = NORM_COLS + ["Material", "Gama", "Acabado"]
+GROUP_COLS_PROJECT = ["ProjectID"] + GROUP_COLS_GLOBAL
+
+
+def group_items(grp: pd.DataFrame) -> List[PieceItem]:
+    return [
+        PieceItem(piece_id=str(pid), typology=str(typ), w=float(w), h=float(h))
+        for pid, typ, w, h in zip(grp["PieceID"], grp["Typology"], grp["W"], grp["H"])
+    ]
+
+
+def _usable_area(rule: Dict) -> tuple:
+    return rule["board_w"] - 2 * EDGE_MARGIN, rule["board_h"] - 2 * EDGE_MARGIN
+
+
+def nest_group(
+    grp: pd.DataFrame,
+    mat_n: str,
+    gama_n: str,
+    acab_n: str,
+    gama_raw: str = "",
+    acab_raw: str = "",
+    project_id: Optional[str] = None,
+    portfolio: Optional[Sequence[Heuristic]] = None,
+    improved: Optional[Dict[tuple, Tuple]] = None,
+    offcuts: Optional[Sequence[Offcut]] = None,
+    offcut_fill: Optional[Tuple[List[OffcutUse], List[PieceItem]]] = None,
+) -> Optional[GroupLayout]:
+    """Empaqueta un grupo (memoizado por contenido). None si la gama no tiene regla de tablero.
+
+    Con `portfolio` se prueban varias heurísticas y se queda la de menos tableros;
+    `improved` (clave de contenido -> layout) aporta los resultados de la búsqueda local.
+    Con `offcuts` (retales del mismo material / gama / acabado) se rellenan
+    primero los retales y solo las piezas restantes van a tableros nuevos;
+    `offcut_fill` (resultado de `fill_offcuts`) evita repetir ese relleno.
+    """
+    rule = get_board_rule(gama_n, acab_n)
+    if rule is None:
+        return None
+
+    board_w, board_h, allow_rotate = rule["board_w"], rule["board_h"], rule["rotate"]
+    usable_w, usable_h = _usable_area(rule)
+    items = group_items(grp)
+    uses: List[OffcutUse] = []
+    nominal_area = float((grp["W"] * grp["H"]).sum())
+    if offcut_fill is None and offcuts:
+        offcut_fill = fill_offcuts(items, offcuts, allow_rotate)
+    if offcut_fill is not None:
+        uses, items = offcut_fill
+        nominal_area -= sum(p.w * p.h for use in uses for p in use.pieces)
+    improved_layout = (improved or {}).get(pack_cache_key(items, usable_w, usable_h, allow_rotate))
+    if improved_layout is not None:
+        boards, unplaced, heuristic = improved_layout
+    elif portfolio:
+        best = pack_portfolio([(items, usable_w, usable_h, allow_rotate)], portfolio, max_workers=1)[0]
+        boards, unplaced, heuristic = best.boards, best.unplaced, best.heuristic
+    else:
+        boards, unplaced = pack_group_cached(items, usable_w, usable_h, allow_rotate)
+        heuristic = DEFAULT_HEURISTIC.name
+
+    return GroupLayout(
+        material=mat_n,
+        gama=gama_n,
+        acabado=acab_n,
+        gama_raw=gama_raw,
+        acabado_raw=acab_raw,
+        board_w=board_w,
+        board_h=board_h,
+        usable_w=usable_w,
+        usable_h=usable_h,
+        allow_rotate=allow_rotate,
+        pieces=len(grp),
+        nominal_area=nominal_area,
+        boards=boards,
+        unplaced=unplaced,
+        project_id=project_id,
+        heuristic=heuristic,
+        lower_bound=board_lower_bound(items, usable_w, usable_h, allow_rotate),
+        offcuts=uses,
+    )
+
+
+def _group_jobs(pieces: pd.DataFrame) -> Dict[tuple, PackJob]:
+    """Jobs de packing distintos (por contenido) de todas las agrupaciones que pide `nest_pieces`."""
+    jobs: Dict[tuple, PackJob] = {}
+    for cols in (NORM_COLS, GROUP_COLS_PROJECT, GROUP_COLS_GLOBAL):
+        for keys, grp in pieces.groupby(cols, dropna=False):
+            gama_n, acab_n = keys[cols.index("Gama_norm")], keys[cols.index("Acabado_norm")]
+            rule = get_board_rule(gama_n, acab_n)
+            if rule is None:
+                continue
+            job = (group_items(grp), *_usable_area(rule), rule["rotate"])
+            jobs.setdefault(pack_cache_key(*job), job)
+    return jobs
+
+
+def _prefetch_portfolio(pieces: pd.DataFrame, portfolio: Sequence[Heuristic], max_workers: Optional[int]) -> None:
+    """Optimiza de una vez (un solo pool) todos los grupos que va a pedir `nest_pieces`."""
+    pack_portfolio(list(_group_jobs(pieces).values()), portfolio, max_workers=max_workers)
+
+
+def _prefetch_groups(
+    pieces: pd.DataFrame,
+    max_workers: Optional[int],
+    on_group: Optional[Callable[[GroupLayout], None]],
+) -> None:
+    """Empaqueta en paralelo todos los grupos que va a pedir `nest_pieces` (quedan en el memo).
+
+    `on_group` recibe el layout de cada grupo global en cuanto termina su packing.
+    """
+    jobs = _group_jobs(pieces)
+    global_groups: Dict[tuple, List[tuple]] = {}
+    if on_group is not None:
+        for keys, grp in pieces.groupby(GROUP_COLS_GLOBAL, dropna=False):
+            mat_n, gama_n, acab_n, _mat_raw, gama_raw, acab_raw = keys
+            rule = get_board_rule(gama_n, acab_n)
+            if rule is None:
+                continue
+            key = pack_cache_key(group_items(grp), *_usable_area(rule), rule["rotate"])
+            global_groups.setdefault(key, []).append((grp, mat_n, gama_n, acab_n, gama_raw, acab_raw))
+
+    keys = list(jobs)
+    for i, _layout in iter_packed_jobs(list(jobs.values()), max_workers=max_workers):
+        for args in global_groups.get(keys[i], []):
+            on_group(nest_group(*args))
+
+
+def _global_offcut_fills(
+    pieces: pd.DataFrame, stock: Dict[Tuple[str, str, str], List[Offcut]]
+) -> Dict[tuple, Tuple[List[OffcutUse], List[PieceItem]]]:
+    """Relleno de retales de cada grupo global (clave `GROUP_COLS_GLOBAL`).
+
+    Los grupos con el mismo material / gama / acabado normalizados comparten
+    stock: cada retal se usa una sola vez, en el orden de los grupos.
+    """
+    remaining = {key: list(offcuts) for key, offcuts in stock.items()}
+    fills: Dict[tuple, Tuple[List[OffcutUse], List[PieceItem]]] = {}
+    for keys, grp in pieces.groupby(GROUP_COLS_GLOBAL, dropna=False):
+        mat_n, gama_n, acab_n = keys[:3]
+        rule = get_board_rule(gama_n, acab_n)
+        available = remaining.get((mat_n, gama_n, acab_n))
+        if rule is None or not available:
+            continue
+        uses, rest = fill_offcuts(group_items(grp), available, rule["rotate"])
+        if uses:
+            taken = {id(use.offcut) for use in uses}
+            remaining[(mat_n, gama_n, acab_n)] = [o for o in available if id(o) not in taken]
+        fills[keys] = (uses, rest)
+    return fills
+
+
+def _improve_groups(
+    pieces: pd.DataFrame,
+    portfolio: Optional[Sequence[Heuristic]],
+    search_seconds: float,
+    on_progress: Optional[Callable[[str, SearchProgress], None]],
+    fills: Optional[Dict[tuple, Tuple[List[OffcutUse], List[PieceItem]]]] = None,
+) -> Dict[tuple, Tuple]:
+    """Búsqueda local sobre los grupos globales (los que se cortan).
+
+    El presupuesto se reparte en proporción a las piezas; el tiempo que no usa
+    un grupo (p.ej. porque alcanza la cota inferior) pasa a los siguientes.
+    Con `fills` (retales ya rellenados) se busca solo sobre las piezas que
+    quedan para tableros nuevos, que es lo que `nest_group` empaqueta.
+    """
+    jobs = []
+    for keys, grp in pieces.groupby(GROUP_COLS_GLOBAL, dropna=False):
+        mat_n, gama_n, acab_n, _mat_raw, _gama_raw, acab_raw = keys
+        rule = get_board_rule(gama_n, acab_n)
+        if rule is None:
+            continue
+        items = fills[keys][1] if fills and keys in fills else group_items(grp)
+        if not items:
+            continue
+        label = f"{mat_n} / {GAMA_DISPLAY.get(gama_n, gama_n)} / {acab_raw}"
+        jobs.append((label, (items, *_usable_area(rule), rule["rotate"])))
+
+    improved: Dict[tuple, Tuple] = {}
+    deadline = time.perf_counter() + search_seconds
+    remaining_pieces = sum(len(job[0]) for _label, job in jobs)
+    for label, job in jobs:
+        key = pack_cache_key(*job)
+        if key in improved:
+            remaining_pieces -= len(job[0])
+            continue
+        heuristic = DEFAULT_HEURISTIC
+        if portfolio:
+            winner = pack_portfolio([job], portfolio, max_workers=1)[0].heuristic
+            heuristic = next(h for h in portfolio if h.name == winner)
+
+        budget = max(0.0, deadline - time.perf_counter()) * len(job[0]) / max(1, remaining_pieces)
+        remaining_pieces -= len(job[0])
+        result = improve_layout(
+            *job,
+            time_budget_s=budget,
+            heuristic=heuristic,
+            on_progress=(lambda progress, label=label: on_progress(label, progress)) if on_progress else None,
+        )
+        name = heuristic.name
+        if len(result.boards) < result.initial_boards:
+            name = f"{name} + búsqueda"
+        improved[key] = (result.boards, result.unplaced, name)
+    return improved
+
+
+def nest_pieces(
+    pieces: pd.DataFrame,
+    portfolio: Optional[Sequence[Heuristic]] = None,
+    max_workers: Optional[int] = None,
+    search_seconds: float = 0.0,
+    on_progress: Optional[Callable[[str, SearchProgress], None]] = None,
+    on_group: Optional[Callable[[GroupLayout], None]] = None,
+    offcuts: Optional[Sequence[Offcut]] = None,
+    leftover_min: Optional[Tuple[float, float]] = DEFAULT_LEFTOVER_MIN,
+) -> NestingResult:
+    """Nesting completo de un CSV: métricas, tablas por proyecto / globales y layouts.
+
+    Cada grupo se empaqueta una sola vez; las distintas agrupaciones que
+    coinciden en contenido reutilizan el layout memoizado. Con `portfolio`
+    (modo optimizador) cada grupo se resuelve con la mejor heurística de la
+    cartera, ejecutadas en paralelo en un pool de `max_workers` procesos; sin
+    cartera, los grupos se reparten igualmente en el pool (el resultado no
+    depende del número de procesos). `on_group(GroupLayout)` recibe cada grupo
+    global en cuanto está listo, para pintar progresivamente.
+    Con `search_seconds` > 0 se dedica ese tiempo (en total) a mejorar los
+    layouts de los grupos globales con búsqueda local; `on_progress(grupo,
+    SearchProgress)` recibe el avance.
+    Con `offcuts` (stock de retales) el resumen y los grupos globales llenan
+    primero los retales de su material / gama / acabado; los consumidos por
+    los grupos globales quedan en `offcuts_used` (la búsqueda local trabaja
+    sobre las piezas que no caben en retales). Las tablas por proyecto no
+    usan retales; `by_finish` añade "Tableros sin retales" para comparar.
+    Cada tablero de los grupos globales lista sus sobrantes reutilizables de
+    al menos `leftover_min` (lado corto, lado largo en mm; None = no calcular).
+    """
+    stock = offcuts_by_group(offcuts or [])
+    # Sin cartera, búsqueda ni retales, el layout final de cada grupo es el del prefetch: se emite al terminar.
+    streamed = on_group is not None and not portfolio and search_seconds <= 0 and not stock
+    if portfolio:
+        _prefetch_portfolio(pieces, portfolio, max_workers)
+    else:
+        _prefetch_groups(pieces, max_workers, on_group if streamed else None)
+    fills = _global_offcut_fills(pieces, stock) if stock else {}
+    improved = _improve_groups(pieces, portfolio, search_seconds, on_progress, fills) if search_seconds > 0 else None
+
+    # ---- Resumen rápido (material + gama + acabado normalizados) ----
+    boards_total = 0
+    lower_bound_total = 0
+    util_vals = []
+    for (mat_n, gama_n, acab_n), grp in pieces.groupby(NORM_COLS, dropna=False):
+        layout = nest_group(
+            grp, mat_n, gama_n, acab_n, portfolio=portfolio, improved=improved, offcuts=stock.get((mat_n, gama_n, acab_n))
+        )
+        if layout is None:
+            continue
+        boards_total += layout.boards_count
+        lower_bound_total += layout.lower_bound
+        util_vals.append(layout.utilization)
+    avg_util = (sum(util_vals) / len(util_vals)) if util_vals else 0.0
+
+    # ---- Por proyecto ----
+    rows: List[Dict] = []
+    issues: List[str] = []
+    for keys, grp in pieces.groupby(GROUP_COLS_PROJECT, dropna=False):
+        proj, mat_n, gama_n, acab_n, _mat_raw, gama_raw, acab_raw = keys
+        layout = nest_group(grp, mat_n, gama_n, acab_n, gama_raw, acab_raw, project_id=proj, portfolio=portfolio, improved=improved)
+        if layout is None:
+            issues.append(f"⚠️ Gama desconocida: '{gama_raw}' en proyecto {proj}. No se calcula.")
+            continue
+
+        if layout.unplaced:
+            issues.append(
+                f"⚠️ {proj} / {mat_n} / {gama_raw} / {acab_raw}: {len(layout.unplaced)} pieza(s) no caben y se omiten del layout."
+            )
+
+        rows.append(
+            {
+                "ProjectID": proj,
+                "Material": mat_n,
+                "Gama": GAMA_DISPLAY.get(gama_n, str(gama_raw)),
+                "Acabado": str(acab_raw),
+                "Tablero (mm)": f"{layout.board_w}×{layout.board_h}",
+                "Rotar": "Sí" if layout.allow_rotate else "No",
+                "Piezas": layout.pieces,
+                "Tableros": int(layout.boards_count),
+                "Aprovechamiento est.": f"{layout.utilization * 100:.1f}%",
+            }
+        )
+
+    by_project = pd.DataFrame(rows)
+    if not by_project.empty:
+        by_project = by_project.sort_values(["ProjectID", "Material", "Gama", "Acabado"]).reset_index(drop=True)
+
+    # ---- Global (material + gama + acabado): tabla y layouts visuales ----
+    rows2: List[Dict] = []
+    groups: List[GroupLayout] = []
+    offcuts_used: List[OffcutUse] = []
+    for keys, grp in pieces.groupby(GROUP_COLS_GLOBAL, dropna=False):
+        mat_n, gama_n, acab_n, _mat_raw, gama_raw, acab_raw = keys
+        layout = nest_group(
+            grp, mat_n, gama_n, acab_n, gama_raw, acab_raw, portfolio=portfolio, improved=improved, offcut_fill=fills.get(keys)
+        )
+        if layout is None:
+            continue
+        boards_without_offcuts = layout.boards_count
+        if layout.offcuts:
+            offcuts_used.extend(layout.offcuts)
+            # Mismo grupo sin retales: referencia para el ahorro de nestear proyectos juntos.
+            boards_without_offcuts = nest_group(
+                grp, mat_n, gama_n, acab_n, gama_raw, acab_raw, portfolio=portfolio, improved=improved
+            ).boards_count
+        if leftover_min:
+            layout.leftovers = group_leftovers(layout, leftover_min)
+        groups.append(layout)
+        if on_group is not None and not streamed:
+            on_group(layout)
+        rows2.append(
+            {
+                "Material": mat_n,
+                "Gama": layout.gama_display,
+                "Acabado": str(acab_raw),
+                "Tablero (mm)": f"{layout.board_w}×{layout.board_h}",
+                "Piezas": layout.pieces,
+                "Tableros": int(layout.boards_count),
+                "Cota inferior": int(layout.lower_bound),
+                "Gap": int(layout.optimality_gap),
+                "Aprovechamiento est.": f"{layout.utilization * 100:.1f}%",
+                **(
+                    {"Retales usados": len(layout.offcuts), "Tableros sin retales": int(boards_without_offcuts)}
+                    if offcuts
+                    else {}
+                ),
+                **({"Sobrantes reutilizables": len(layout.leftovers)} if leftover_min else {}),
+                **({"Heurística": layout.heuristic} if portfolio or improved else {}),
+            }
+        )
+
+    by_finish = pd.DataFrame(rows2)
+    if not by_finish.empty:
+        by_finish = by_finish.sort_values(["Material", "Gama", "Acabado"]).reset_index(drop=True)
+
+    return NestingResult(
+        total_pieces=len(pieces),
+        boards_total=boards_total,
+        avg_util=avg_util,
+        by_project=by_project,
+        by_finish=by_finish,
+        groups=groups,
+        issues=issues,
+        lower_bound_total=lower_bound_total,
+        offcuts_used=offcuts_used,
+    )
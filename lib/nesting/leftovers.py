@@ -0,0 +1,120 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.nesting.models import FreeRect, GroupLayout, Leftover, PlacedPiece
+from lib.nesting.offcuts import find_offcut_columns
+from lib.nesting.rules import GAP_BETWEEN
+
+# Tamaño mínimo (lado corto, lado largo en mm) de un sobrante para guardarlo como retal.
+DEFAULT_LEFTOVER_MIN = (200.0, 400.0)
+
+
+def _contained(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """[i, j] = el rectángulo a[i] está dentro de b[j] (filas x1, y1, x2, y2)."""
+    return (
+        (b[None, :, 0] <= a[:, None, 0])
+        & (b[None, :, 1] <= a[:, None, 1])
+        & (a[:, None, 2] <= b[None, :, 2])
+        & (a[:, None, 3] <= b[None, :, 3])
+    )
+
+
+def maximal_free_rects(board: Sequence[PlacedPiece], usable_w: float, usable_h: float) -> np.ndarray:
+    """Rectángulos vacíos maximales de un tablero (filas x1, y1, x2, y2 en la zona útil).
+
+    Cada pieza ocupa su medida más `GAP_BETWEEN` (el corte). Es el recorte de
+    huecos de MaxRects con numpy: por pieza se parten los huecos que toca en
+    hasta 4 maximales y se descartan los contenidos en otro.
+    """
+    frees = np.array([[0.0, 0.0, float(usable_w), float(usable_h)]])
+    for p in board:
+        px1, py1 = p.x, p.y
+        px2, py2 = min(usable_w, p.x + p.w + GAP_BETWEEN), min(usable_h, p.y + p.h + GAP_BETWEEN)
+        hit = (frees[:, 0] < px2) & (frees[:, 2] > px1) & (frees[:, 1] < py2) & (frees[:, 3] > py1)
+        if not hit.any():
+            continue
+        keep, split = frees[~hit], frees[hit]
+        x1, y1, x2, y2 = split.T
+        parts = np.concatenate(
+            [
+                np.column_stack([x1, y1, np.full_like(x1, px1), y2])[px1 > x1],
+                np.column_stack([np.full_like(x1, px2), y1, x2, y2])[px2 < x2],
+                np.column_stack([x1, y1, x2, np.full_like(y1, py1)])[py1 > y1],
+                np.column_stack([x1, np.full_like(y1, py2), x2, y2])[py2 < y2],
+            ]
+        )
+        if len(parts):
+            # Fuera los contenidos en un hueco que se mantiene o en otro nuevo (de iguales, queda el primero).
+            inside_new = _contained(parts, parts)
+            np.fill_diagonal(inside_new, False)
+            same = inside_new & inside_new.T
+            inside_new &= ~same | np.tri(len(parts), k=-1, dtype=bool)
+            drop = inside_new.any(axis=1)
+            if len(keep):
+                drop |= _contained(parts, keep).any(axis=1)
+            parts = parts[~drop]
+        frees = np.concatenate([keep, parts])
+    return frees
+
+
+def board_leftovers(
+    board: Sequence[PlacedPiece],
+    usable_w: float,
+    usable_h: float,
+    min_size: Tuple[float, float] = DEFAULT_LEFTOVER_MIN,
+) -> List[FreeRect]:
+    """Sobrantes reutilizables de un tablero: maximales de al menos `min_size`
+    (lado corto, lado largo), de mayor a menor área y sin solaparse entre sí
+    (cada trozo de tablero se da de alta como retal una sola vez)."""
+    frees = maximal_free_rects(board, usable_w, usable_h)
+    w, h = frees[:, 2] - frees[:, 0], frees[:, 3] - frees[:, 1]
+    big = (np.minimum(w, h) >= min_size[0]) & (np.maximum(w, h) >= min_size[1])
+    frees, area = frees[big], (w * h)[big]
+
+    chosen: List[np.ndarray] = []
+    for r in frees[np.argsort(-area, kind="stable")]:
+        if chosen:
+            c = np.array(chosen)
+            if ((c[:, 0] < r[2]) & (c[:, 2] > r[0]) & (c[:, 1] < r[3]) & (c[:, 3] > r[1])).any():
+                continue
+        chosen.append(r)
+    return [FreeRect(float(x1), float(y1), float(x2 - x1), float(y2 - y1)) for x1, y1, x2, y2 in chosen]
+
+
+def group_leftovers(layout: GroupLayout, min_size: Tuple[float, float] = DEFAULT_LEFTOVER_MIN) -> List[Leftover]:
+    """Sobrantes reutilizables de todos los tableros de un grupo."""
+    return [
+        Leftover(group_name=layout.group_name, board_index=bi, x=r.x, y=r.y, w=r.w, h=r.h)
+        for bi, board in enumerate(layout.boards, start=1)
+        for r in board_leftovers(board, layout.usable_w, layout.usable_h, min_size)
+    ]
+
+
+def leftover_sheet_rows(
+    groups: Sequence[GroupLayout],
+    columns: Sequence[str],
+    id_prefix: str = "",
+    extra: Optional[Dict[str, str]] = None,
+) -> List[List[str]]:
+    """Filas (en el orden de `columns`, las cabeceras del Sheet de retales) con
+    los sobrantes de `groups`, listas para añadirlas al stock de una vez.
+
+    Material / gama / acabado van como en el CSV para que `offcuts_from_df`
+    los normalice igual que las piezas; `extra` rellena otras columnas por nombre.
+    """
+    cols = find_offcut_columns(columns)
+    rows: List[List[str]] = []
+    for layout in groups:
+        for n, lo in enumerate(layout.leftovers, start=1):
+            values = {
+                cols.get("id"): f"{id_prefix}{layout.group_name}-T{lo.board_index:03d}-{n}",
+                cols.get("material"): str(layout.material),
+                cols.get("gama"): str(layout.gama_raw or layout.gama),
+                cols.get("acabado"): str(layout.acabado_raw or layout.acabado),
+                cols.get("w"): f"{lo.w:g}",
+                cols.get("h"): f"{lo.h:g}",
+                **(extra or {}),
+            }
+            rows.append([values.get(c, "") for c in columns])
+    return rows
@@ -0,0 +1,116 @@
+import csv
+import hashlib
+import io
+
+import pandas as pd
+
+from lib.nesting.rules import normalize_acabado, normalize_gama, normalize_material
+
+
+class BytesUploadedFile:
+    def __init__(self, data: bytes, name: str = "drive.csv"):
+        self._data = data
+        self.name = name
+
+    def getvalue(self):
+        return self._data
+
+
+def csv_content_hash(data: bytes) -> str:
+    """Huella del contenido del CSV (clave de las cachés de la página)."""
+    return hashlib.sha1(data or b"").hexdigest()
+
+
+def read_csv_robust(uploaded_file) -> pd.DataFrame:
+    raw = uploaded_file.getvalue()
+    if raw is None or len(raw) == 0:
+        raise ValueError("El archivo está vacío (0 bytes).")
+
+    text = None
+    for enc in ["utf-8-sig", "utf-8", "latin-1"]:
+        try:
+            text = raw.decode(enc)
+            break
+        except Exception:
+            pass
+    if text is None:
+        raise ValueError("No pude decodificar el archivo. Prueba guardarlo como CSV UTF-8.")
+
+    lines = [ln for ln in text.splitlines() if ln.strip() != ""]
+    if not lines:
+        raise ValueError("El archivo solo contiene líneas vacías.")
+
+    sample = "\n".join(lines[:60])
+
+    sep_candidates = []
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        sep_candidates.append(dialect.delimiter)
+    except Exception:
+        pass
+    for s in [";", ",", "\t"]:
+        if s not in sep_candidates:
+            sep_candidates.append(s)
+
+    last_err = None
+    for sep in sep_candidates:
+        try:
+            df = pd.read_csv(
+                io.StringIO("\n".join(lines)),
+                sep=sep,
+                dtype=str,
+                engine="python",
+                keep_default_na=False,
+            )
+            if df.shape[1] <= 1:
+                continue
+            return df
+        except Exception as e:
+            last_err = e
+
+    raise ValueError(f"No pude interpretar el CSV con separadores ; , o tab. Error: {last_err}")
+
+
+def to_float_mm(x):
+    x = str(x).strip().replace(",", ".")
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+def load_pieces_v5(uploaded_file) -> pd.DataFrame:
+    df = read_csv_robust(uploaded_file)
+
+    if df.shape[1] < 9:
+        raise ValueError(f"El CSV tiene {df.shape[1]} columnas. Se esperan al menos 9 (A..I).")
+
+    out = pd.DataFrame(
+        {
+            "ProjectID": df.iloc[:, 0],
+            "PieceID": df.iloc[:, 2] if df.shape[1] > 2 else "",
+            "Typology": df.iloc[:, 3] if df.shape[1] > 3 else "",
+            "W": df.iloc[:, 4] if df.shape[1] > 4 else "",
+            "H": df.iloc[:, 5] if df.shape[1] > 5 else "",
+            "Material": df.iloc[:, 6] if df.shape[1] > 6 else "",
+            "Gama": df.iloc[:, 7] if df.shape[1] > 7 else "",
+            "Acabado": df.iloc[:, 8] if df.shape[1] > 8 else "",
+            "Machining": df.iloc[:, 9] if df.shape[1] > 9 else "",
+            "HandleModel": df.iloc[:, 10] if df.shape[1] > 10 else "",
+            "HandlePos": df.iloc[:, 11] if df.shape[1] > 11 else "",
+            "DoorOpen": df.iloc[:, 12] if df.shape[1] > 12 else "",
+            "HandleFinish": df.iloc[:, 13] if df.shape[1] > 13 else "",
+        }
+    )
+
+    out["W"] = out["W"].map(to_float_mm)
+    out["H"] = out["H"].map(to_float_mm)
+
+    out = out.dropna(subset=["ProjectID", "PieceID", "Typology", "Material", "Gama", "Acabado", "W", "H"])
+    out = out[(out["W"] > 0) & (out["H"] > 0)]
+
+    out["Material_norm"] = out["Material"].map(normalize_material)
+    out["Gama_norm"] = out["Gama"].map(normalize_gama)
+    out["Acabado_norm"] = out["Acabado"].map(normalize_acabado)
+
+    return out
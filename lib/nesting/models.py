@@ -0,0 +1,157 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import pandas as pd
+
+from lib.nesting.rules import GAMA_DISPLAY
+
+
+@dataclass(slots=True)
+class FreeRect:
+    x: float
+    y: float
+    w: float
+    h: float
+
+
+@dataclass(slots=True)
+class PlacedPiece:
+    piece_id: str
+    typology: str
+    x: float
+    y: float
+    w: float
+    h: float
+    rotated: bool
+
+
+@dataclass(slots=True)
+class PieceItem:
+    piece_id: str
+    typology: str
+    w: float
+    h: float
+
+
+@dataclass(slots=True)
+class Offcut:
+    """Retal del stock: medidas brutas (mm) y material / gama / acabado normalizados."""
+
+    offcut_id: str
+    material: str
+    gama: str
+    acabado: str
+    w: float
+    h: float
+    # Fila del DataFrame del stock de la que sale (para marcarlo como utilizado).
+    source_index: Optional[int] = None
+
+
+@dataclass(slots=True)
+class OffcutUse:
+    """Piezas colocadas en un retal (coordenadas dentro de su zona útil, como en un tablero)."""
+
+    offcut: Offcut
+    pieces: List[PlacedPiece]
+
+
+@dataclass(slots=True)
+class Leftover:
+    """Sobrante reutilizable de un tablero (mm, coordenadas de la zona útil como las piezas)."""
+
+    group_name: str
+    board_index: int  # empieza en 1
+    x: float
+    y: float
+    w: float
+    h: float
+
+
+@dataclass(frozen=True)
+class Heuristic:
+    """Orden de piezas + criterio de elección de hueco (ver `packer.ORDERINGS` / `packer.FIT_SCORES`)."""
+
+    order: str = "longest_side"
+    fit: str = "leftover_sum"
+
+    @property
+    def name(self) -> str:
+        return f"{self.order}/{self.fit}"
+
+
+@dataclass
+class GroupLayout:
+    """Resultado del nesting de un grupo Material + Gama + Acabado (opcionalmente por proyecto)."""
+
+    material: str
+    gama: str
+    acabado: str
+    gama_raw: str
+    acabado_raw: str
+    board_w: int
+    board_h: int
+    usable_w: float
+    usable_h: float
+    allow_rotate: bool
+    pieces: int
+    nominal_area: float
+    boards: List[List[PlacedPiece]]
+    unplaced: List[PieceItem]
+    project_id: Optional[str] = None
+    heuristic: str = Heuristic().name
+    # Cota inferior de tableros (ver `bounds.board_lower_bound`); 0 = sin calcular.
+    lower_bound: int = 0
+    # Retales del stock rellenados antes de abrir tableros nuevos (`boards` son solo los nuevos).
+    offcuts: List[OffcutUse] = field(default_factory=list)
+    # Sobrantes reutilizables de `boards` (ver `leftovers.group_leftovers`).
+    leftovers: List[Leftover] = field(default_factory=list)
+
+    @property
+    def boards_count(self) -> int:
+        return len(self.boards)
+
+    @property
+    def optimality_gap(self) -> int:
+        """Tableros por encima de la cota inferior (0 = óptimo demostrado)."""
+        return max(0, len(self.boards) - self.lower_bound)
+
+    @property
+    def utilization(self) -> float:
+        if not self.boards:
+            return 0.0
+        return self.nominal_area / (len(self.boards) * (self.usable_w * self.usable_h))
+
+    @property
+    def gama_display(self) -> str:
+        return GAMA_DISPLAY.get(self.gama, str(self.gama_raw))
+
+    @property
+    def group_name(self) -> str:
+        name = f"{self.material}__{self.gama_display}__{str(self.acabado_raw)}"
+        return name.replace("/", "-").replace("\\", "-").replace(":", "-")
+
+
+@dataclass
+class NestingResult:
+    """Todo lo que muestra la página, derivado de una sola pasada de packing por grupo."""
+
+    total_pieces: int
+    boards_total: int
+    avg_util: float
+    by_project: pd.DataFrame
+    by_finish: pd.DataFrame
+    groups: List[GroupLayout]
+    issues: List[str] = field(default_factory=list)
+    # Suma de las cotas inferiores de los grupos del resumen rápido.
+    lower_bound_total: int = 0
+    # Retales del stock consumidos por los grupos globales (los que se cortan).
+    offcuts_used: List[OffcutUse] = field(default_factory=list)
+
+    @property
+    def optimality_gap(self) -> int:
+        return max(0, self.boards_total - self.lower_bound_total)
+
+    @property
+    def leftovers(self) -> List[Leftover]:
+        """Sobrantes reutilizables de todos los grupos globales."""
+        return [lo for layout in self.groups for lo in layout.leftovers]
@@ -0,0 +1,192 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lib.nesting.loader import to_float_mm
+from lib.nesting.models import FreeRect, Heuristic, Offcut, OffcutUse, PieceItem
+from lib.nesting.packer import DEFAULT_HEURISTIC, _best_free_rect, _place, _placed_piece, _resolve_heuristic
+from lib.nesting.rules import EDGE_MARGIN, GAP_BETWEEN, normalize_acabado, normalize_gama, normalize_material
+
+# Cabeceras aceptadas en el Sheet de retales (sin acentos, espacios ni "mm").
+OFFCUT_COLUMNS = {
+    "id": ("id", "idretal", "retal", "codigo", "ref", "referencia"),
+    "material": ("material",),
+    "gama": ("gama",),
+    "acabado": ("acabado", "color"),
+    "w": ("ancho", "w"),
+    "h": ("largo", "alto", "h"),
+    "state": ("estado", "utilizado", "usado"),
+}
+REQUIRED_COLUMNS = ("material", "gama", "acabado", "w", "h")
+USED_VALUES = {"utilizado", "usado", "consumido", "si", "x", "true", "1"}
+USED_LABEL = "Utilizado"
+STATE_COLUMN = "Estado"
+
+
+def _header_key(header: str) -> str:
+    key = re.sub(r"[^a-z0-9]", "", normalize_acabado(str(header)))
+    return key[:-2] if key.endswith("mm") and len(key) > 2 else key
+
+
+def find_offcut_columns(columns: Sequence[str]) -> Dict[str, str]:
+    """Campo (`OFFCUT_COLUMNS`) -> columna del Sheet; gana la primera columna que encaja."""
+    found: Dict[str, str] = {}
+    for col in columns:
+        key = _header_key(col)
+        for field_name, candidates in OFFCUT_COLUMNS.items():
+            if field_name not in found and key in candidates:
+                found[field_name] = col
+                break
+    return found
+
+
+def offcuts_from_df(df: pd.DataFrame) -> List[Offcut]:
+    """Retales disponibles del stock (DataFrame de `worksheet_to_df`).
+
+    Se saltan los marcados como utilizados y las filas sin medidas válidas;
+    `source_index` guarda el índice de la fila en `df`.
+    """
+    cols = find_offcut_columns(df.columns)
+    missing = [f for f in REQUIRED_COLUMNS if f not in cols]
+    if missing:
+        raise ValueError(
+            f"Faltan columnas en el stock de retales: {', '.join(missing)}. Columnas: {', '.join(map(str, df.columns))}"
+        )
+
+    offcuts: List[Offcut] = []
+    for idx, row in df.iterrows():
+        if "state" in cols and normalize_acabado(str(row[cols["state"]])) in USED_VALUES:
+            continue
+        w, h = to_float_mm(row[cols["w"]]), to_float_mm(row[cols["h"]])
+        if not w or not h or w <= 0 or h <= 0:
+            continue
+        offcut_id = str(row[cols["id"]]).strip() if "id" in cols else ""
+        offcuts.append(
+            Offcut(
+                offcut_id=offcut_id or f"R{idx}",
+                material=normalize_material(str(row[cols["material"]])),
+                gama=normalize_gama(str(row[cols["gama"]])),
+                acabado=normalize_acabado(str(row[cols["acabado"]])),
+                w=w,
+                h=h,
+                source_index=idx,
+            )
+        )
+    return offcuts
+
+
+def mark_offcuts_used(df: pd.DataFrame, uses: Sequence[OffcutUse]) -> pd.DataFrame:
+    """Copia de `df` con los retales consumidos marcados como utilizados (añade `Estado` si no hay columna)."""
+    out = df.copy()
+    state_col = find_offcut_columns(out.columns).get("state", STATE_COLUMN)
+    if state_col not in out.columns:
+        out[state_col] = ""
+    rows = [u.offcut.source_index for u in uses if u.offcut.source_index is not None]
+    out.loc[rows, state_col] = USED_LABEL
+    return out
+
+
+def offcuts_by_group(offcuts: Sequence[Offcut]) -> Dict[Tuple[str, str, str], List[Offcut]]:
+    """Retales por (material, gama, acabado) normalizados: la clave de los grupos del nesting."""
+    by_group: Dict[Tuple[str, str, str], List[Offcut]] = {}
+    for o in offcuts:
+        by_group.setdefault((o.material, o.gama, o.acabado), []).append(o)
+    return by_group
+
+
+def fill_offcuts(
+    items: List[PieceItem],
+    offcuts: Sequence[Offcut],
+    allow_rotate: bool,
+    heuristic: Heuristic = DEFAULT_HEURISTIC,
+) -> Tuple[List[OffcutUse], List[PieceItem]]:
+    """Rellena retales antes de abrir tableros (best fit decreasing).
+
+    Las piezas, de mayor a menor según `heuristic.order`, van al mejor hueco
+    (`heuristic.fit`) de los retales ya empezados; si no caben en ninguno se
+    empieza el retal libre más pequeño en el que quepan. Cada retal pierde
+    `EDGE_MARGIN` por lado, como un tablero. Devuelve (retales usados, piezas
+    que quedan para tableros nuevos, en su orden original).
+
+    Los huecos libres de todos los retales empezados viven en arrays numpy,
+    así que con cientos de retales en stock cada pieza filtra de una vez los
+    retales en los que cabe y solo recorre los huecos de esos.
+    """
+    order_key, score = _resolve_heuristic(heuristic)
+    usable = [(o.w - 2 * EDGE_MARGIN, o.h - 2 * EDGE_MARGIN) for o in offcuts]
+    stock = [i for i, (uw, uh) in enumerate(usable) if uw > 0 and uh > 0]
+    if not items or not stock:
+        return [], list(items)
+
+    stock_w = np.array([usable[i][0] for i in stock], dtype=float)
+    stock_h = np.array([usable[i][1] for i in stock], dtype=float)
+    stock_area = stock_w * stock_h
+    stock_free = np.ones(len(stock), dtype=bool)
+
+    # Retales empezados (índice en `stock`), sus huecos y las piezas colocadas.
+    opened: List[int] = []
+    frees: List[List[FreeRect]] = []
+    placed: List[list] = []
+    # Todos los huecos de todos los retales empezados: medidas, retal y si siguen vivos.
+    cap = 4 * len(stock)
+    rect_w, rect_h = np.zeros(cap), np.zeros(cap)
+    rect_bin = np.zeros(cap, dtype=np.int64)
+    rect_alive = np.zeros(cap, dtype=bool)
+    bin_rects: List[List[int]] = []
+    n_rects = 0
+
+    def fits(w_arr: np.ndarray, h_arr: np.ndarray, ew: float, eh: float) -> np.ndarray:
+        mask = (w_arr >= ew) & (h_arr >= eh)
+        if allow_rotate:
+            mask |= (w_arr >= eh) & (h_arr >= ew)
+        return mask
+
+    def set_frees(b: int, new_frees: List[FreeRect]) -> None:
+        nonlocal rect_w, rect_h, rect_bin, rect_alive, n_rects
+        rect_alive[bin_rects[b]] = False
+        if n_rects + len(new_frees) > len(rect_w):
+            grow = max(len(rect_w), len(new_frees))
+            rect_w, rect_h = np.concatenate([rect_w, np.zeros(grow)]), np.concatenate([rect_h, np.zeros(grow)])
+            rect_bin = np.concatenate([rect_bin, np.zeros(grow, dtype=np.int64)])
+            rect_alive = np.concatenate([rect_alive, np.zeros(grow, dtype=bool)])
+        idx = list(range(n_rects, n_rects + len(new_frees)))
+        for i, fr in zip(idx, new_frees):
+            rect_w[i], rect_h[i], rect_bin[i], rect_alive[i] = fr.w, fr.h, b, True
+        n_rects += len(new_frees)
+        frees[b], bin_rects[b] = new_frees, idx
+
+    leftover = set()
+    for pos in sorted(range(len(items)), key=lambda i: order_key(items[i]), reverse=True):
+        it = items[pos]
+        ew, eh = it.w + GAP_BETWEEN, it.h + GAP_BETWEEN
+        best: Optional[tuple] = None  # (colocación, retal empezado)
+        hit = rect_alive[:n_rects] & fits(rect_w[:n_rects], rect_h[:n_rects], ew, eh)
+        for b in np.unique(rect_bin[:n_rects][hit]):
+            cand = _best_free_rect(frees[b], it, allow_rotate, score)
+            if best is None or cand[0] < best[0][0]:
+                best = (cand, int(b))
+
+        if best is None:
+            mask = stock_free & fits(stock_w, stock_h, ew, eh)
+            if not mask.any():
+                leftover.add(pos)
+                continue
+            k = int(np.where(mask, stock_area, np.inf).argmin())
+            stock_free[k] = False
+            opened.append(k)
+            frees.append([])
+            placed.append([])
+            bin_rects.append([])
+            b = len(opened) - 1
+            set_frees(b, [FreeRect(0, 0, float(stock_w[k]), float(stock_h[k]))])
+            best = (_best_free_rect(frees[b], it, allow_rotate, score), b)
+
+        cand, b = best
+        new_frees, placed_eff = _place(list(frees[b]), cand)
+        set_frees(b, new_frees)
+        placed[b].append(_placed_piece(it, placed_eff, cand))
+
+    uses = [OffcutUse(offcut=offcuts[stock[k]], pieces=placed[b]) for b, k in enumerate(opened)]
+    return uses, [it for pos, it in enumerate(items) if pos in leftover]
@@ -0,0 +1,428 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lib.nesting.models import FreeRect, Heuristic, PieceItem, PlacedPiece
+from lib.nesting.rules import GAP_BETWEEN
+
+# Memo de layouts por contenido del grupo: el mismo grupo (mismas piezas, mismo
+# tablero) se empaqueta una sola vez aunque aparezca en varias tablas.
+PACK_CACHE_SIZE = 1024
+# Por debajo de este número de piezas el recorrido lineal es más rápido que el vectorizado.
+VECTOR_MIN_PIECES = 300
+
+FitScore = Callable[[FreeRect, float, float], Any]
+
+
+def _leftover_sum(fr: FreeRect, w: float, h: float) -> float:
+    return (fr.w - w) + (fr.h - h)
+
+
+# Claves de orden (se aplican de mayor a menor).
+ORDERINGS: Dict[str, Callable[[PieceItem], tuple]] = {
+    "longest_side": lambda p: (max(p.w, p.h), p.w * p.h),
+    "area": lambda p: (p.w * p.h, max(p.w, p.h)),
+    "width": lambda p: (p.w, p.h),
+    "height": lambda p: (p.h, p.w),
+    "perimeter": lambda p: (p.w + p.h, max(p.w, p.h)),
+}
+# Coste de colocar un rectángulo efectivo (w, h) en el hueco `fr` (menor = mejor).
+FIT_SCORES: Dict[str, FitScore] = {
+    "leftover_sum": _leftover_sum,
+    "short_side": lambda fr, w, h: min(fr.w - w, fr.h - h),
+    "long_side": lambda fr, w, h: max(fr.w - w, fr.h - h),
+    "area": lambda fr, w, h: fr.w * fr.h - w * h,
+    "bottom_left": lambda fr, w, h: (fr.y + h, fr.x),
+}
+DEFAULT_HEURISTIC = Heuristic()
+
+_pack_lock = threading.Lock()
+_pack_cache: "OrderedDict[tuple, Tuple[List[List[PlacedPiece]], List[PieceItem]]]" = OrderedDict()
+_pack_stats = {"hits": 0, "misses": 0}
+
+
+def rect_contains(a: FreeRect, b: FreeRect) -> bool:
+    return (b.x >= a.x and b.y >= a.y and (b.x + b.w) <= (a.x + a.w) and (b.y + b.h) <= (a.y + a.h))
+
+
+def prune_free_rects(frees: List[FreeRect]) -> List[FreeRect]:
+    pruned = []
+    for i, r in enumerate(frees):
+        contained = False
+        for j, s in enumerate(frees):
+            if i == j:
+                continue
+            if rect_contains(s, r):
+                contained = True
+                break
+        if not contained:
+            pruned.append(r)
+    return pruned
+
+
+def split_free_rect(fr: FreeRect, placed: FreeRect) -> List[FreeRect]:
+    res = []
+    rw = fr.w - placed.w
+    rh = placed.h
+    if rw > 0 and rh > 0:
+        res.append(FreeRect(fr.x + placed.w, fr.y, rw, rh))
+    uw = fr.w
+    uh = fr.h - placed.h
+    if uw > 0 and uh > 0:
+        res.append(FreeRect(fr.x, fr.y + placed.h, uw, uh))
+    return res
+
+
+def _pack_group_reference(
+    items: List[PieceItem],
+    usable_w: float,
+    usable_h: float,
+    allow_rotate: bool,
+) -> Tuple[List[List[PlacedPiece]], List[PieceItem]]:
+    """Implementación original (poda O(n²) tras cada colocación); referencia para tests y benchmark."""
+    unplaced: List[PieceItem] = []
+    work: List[PieceItem] = []
+
+    for it in items:
+        w_eff = it.w + GAP_BETWEEN
+        h_eff = it.h + GAP_BETWEEN
+        fits = (w_eff <= usable_w and h_eff <= usable_h) or (allow_rotate and h_eff <= usable_w and w_eff <= usable_h)
+        if not fits:
+            unplaced.append(it)
+        else:
+            work.append(it)
+
+    work.sort(key=lambda p: (max(p.w, p.h), p.w * p.h), reverse=True)
+    boards: List[List[PlacedPiece]] = []
+
+    while work:
+        frees = [FreeRect(0, 0, usable_w, usable_h)]
+        placed_this_board: List[PlacedPiece] = []
+        remaining: List[PieceItem] = []
+
+        for it in work:
+            best = None  # (score, free_index, ww_eff, hh_eff, rotated, ww_nom, hh_nom)
+            for fi, fr in enumerate(frees):
+                ww_eff = it.w + GAP_BETWEEN
+                hh_eff = it.h + GAP_BETWEEN
+                if ww_eff <= fr.w and hh_eff <= fr.h:
+                    score = (fr.w - ww_eff) + (fr.h - hh_eff)
+                    cand = (score, fi, ww_eff, hh_eff, False, it.w, it.h)
+                    if best is None or cand < best:
+                        best = cand
+
+                if allow_rotate:
+                    ww_eff_r = it.h + GAP_BETWEEN
+                    hh_eff_r = it.w + GAP_BETWEEN
+                    if ww_eff_r <= fr.w and hh_eff_r <= fr.h:
+                        score = (fr.w - ww_eff_r) + (fr.h - hh_eff_r)
+                        cand = (score, fi, ww_eff_r, hh_eff_r, True, it.h, it.w)
+                        if best is None or cand < best:
+                            best = cand
+
+            if best is None:
+                remaining.append(it)
+                continue
+
+            _, fi, ww_eff, hh_eff, rotated, ww_nom, hh_nom = best
+            fr = frees.pop(fi)
+
+            placed_eff = FreeRect(fr.x, fr.y, ww_eff, hh_eff)
+            frees.extend(split_free_rect(fr, placed_eff))
+            frees = prune_free_rects(frees)
+
+            placed_this_board.append(
+                PlacedPiece(
+                    piece_id=str(it.piece_id),
+                    typology=str(it.typology),
+                    x=placed_eff.x,
+                    y=placed_eff.y,
+                    w=ww_nom,
+                    h=hh_nom,
+                    rotated=rotated,
+                )
+            )
+
+        boards.append(placed_this_board)
+        work = remaining
+
+    return boards, unplaced
+
+
+def _insert_free_rects(frees: List[FreeRect], new: List[FreeRect]) -> List[FreeRect]:
+    """Equivalente a `prune_free_rects(frees + new)` cuando `frees` ya está podado.
+
+    En una lista podada ningún rectángulo contiene a otro, así que solo hay
+    que comprobar los pares en los que interviene un rectángulo nuevo: O(n)
+    por colocación en vez de O(n²).
+    """
+    bounds = [(n.x, n.y, n.x + n.w, n.y + n.h) for n in new]
+    kept_old = []
+    for o in frees:
+        ox, oy, ox2, oy2 = o.x, o.y, o.x + o.w, o.y + o.h
+        for nx, ny, nx2, ny2 in bounds:
+            if ox >= nx and oy >= ny and ox2 <= nx2 and oy2 <= ny2:
+                break
+        else:
+            kept_old.append(o)
+
+    kept_new = []
+    for k, (nx, ny, nx2, ny2) in enumerate(bounds):
+        contained = False
+        for s in frees:
+            if nx >= s.x and ny >= s.y and nx2 <= s.x + s.w and ny2 <= s.y + s.h:
+                contained = True
+                break
+        if not contained:
+            for j, (mx, my, mx2, my2) in enumerate(bounds):
+                if j != k and nx >= mx and ny >= my and nx2 <= mx2 and ny2 <= my2:
+                    contained = True
+                    break
+        if not contained:
+            kept_new.append(new[k])
+    return kept_old + kept_new
+
+
+def _rect_key(fr: FreeRect) -> Tuple[float, float, float, float]:
+    return (fr.x, fr.y, fr.w, fr.h)
+
+
+def _best_free_rect(frees: List[FreeRect], it: PieceItem, allow_rotate: bool, score: FitScore = _leftover_sum):
+    """Mejor hueco para `it`: menor `score`, desempate por índice de hueco (como el original)."""
+    ww_eff = it.w + GAP_BETWEEN
+    hh_eff = it.h + GAP_BETWEEN
+    best = None  # (score, free_index, ww_eff, hh_eff, rotated, ww_nom, hh_nom)
+    for fi, fr in enumerate(frees):
+        if ww_eff <= fr.w and hh_eff <= fr.h:
+            cand = (score(fr, ww_eff, hh_eff), fi, ww_eff, hh_eff, False, it.w, it.h)
+            if best is None or cand < best:
+                best = cand
+
+        if allow_rotate and hh_eff <= fr.w and ww_eff <= fr.h:
+            cand = (score(fr, hh_eff, ww_eff), fi, hh_eff, ww_eff, True, it.h, it.w)
+            if best is None or cand < best:
+                best = cand
+    return best
+
+
+def _place(frees: List[FreeRect], best) -> Tuple[List[FreeRect], FreeRect]:
+    _, fi, pw, ph, _rotated, _ww_nom, _hh_nom = best
+    fr = frees.pop(fi)
+    placed_eff = FreeRect(fr.x, fr.y, pw, ph)
+    return _insert_free_rects(frees, split_free_rect(fr, placed_eff)), placed_eff
+
+
+def _placed_piece(it: PieceItem, placed_eff: FreeRect, best) -> PlacedPiece:
+    _, _fi, _pw, _ph, rotated, ww_nom, hh_nom = best
+    return PlacedPiece(
+        piece_id=str(it.piece_id),
+        typology=str(it.typology),
+        x=placed_eff.x,
+        y=placed_eff.y,
+        w=ww_nom,
+        h=hh_nom,
+        rotated=rotated,
+    )
+
+
+def _pack_linear(
+    work: List[PieceItem], usable_w: float, usable_h: float, allow_rotate: bool, score: FitScore
+) -> List[List[PlacedPiece]]:
+    """Recorrido lineal: cada tablero prueba todas las piezas pendientes en orden."""
+    boards: List[List[PlacedPiece]] = []
+    while work:
+        frees = [FreeRect(0, 0, usable_w, usable_h)]
+        placed_this_board: List[PlacedPiece] = []
+        remaining: List[PieceItem] = []
+
+        for it in work:
+            best = _best_free_rect(frees, it, allow_rotate, score) if frees else None
+            if best is None:
+                remaining.append(it)
+                continue
+            frees, placed_eff = _place(frees, best)
+            placed_this_board.append(_placed_piece(it, placed_eff, best))
+
+        boards.append(placed_this_board)
+        work = remaining
+    return boards
+
+
+def _pack_masked(
+    work: List[PieceItem], usable_w: float, usable_h: float, allow_rotate: bool, score: FitScore
+) -> List[List[PlacedPiece]]:
+    """Igual que `_pack_linear`, pero cada hueco guarda (numpy) qué piezas caben en él
+    y la siguiente pieza a colocar se obtiene directamente."""
+    eff_w = np.array([it.w + GAP_BETWEEN for it in work], dtype=float)
+    eff_h = np.array([it.h + GAP_BETWEEN for it in work], dtype=float)
+    pending = np.ones(len(work), dtype=bool)
+
+    def fit_mask(lo: int, w: float, h: float) -> Tuple[int, np.ndarray]:
+        # Solo importan las piezas posteriores a la actual: máscara desde `lo`.
+        ew, eh = eff_w[lo:], eff_h[lo:]
+        mask = (ew <= w) & (eh <= h)
+        if allow_rotate:
+            mask |= (eh <= w) & (ew <= h)
+        return lo, mask
+
+    boards: List[List[PlacedPiece]] = []
+    while pending.any():
+        frees = [FreeRect(0, 0, usable_w, usable_h)]
+        # hueco (x, y, w, h) -> piezas que caben en él; todas las pendientes caben en el tablero vacío.
+        masks = {_rect_key(frees[0]): (0, pending.copy())}
+        placed_this_board: List[PlacedPiece] = []
+
+        idx = int(pending.argmax())
+        while idx >= 0:
+            it = work[idx]
+            best = _best_free_rect(frees, it, allow_rotate, score)
+            frees, placed_eff = _place(frees, best)
+            masks = {key: masks.get(key) for key in map(_rect_key, frees)}
+            pending[idx] = False
+            placed_this_board.append(_placed_piece(it, placed_eff, best))
+
+            # Siguiente pieza (en orden) que cabe en algún hueco: la misma que elegiría el recorrido lineal.
+            if not frees or idx + 1 >= len(work):
+                break
+            lo = idx + 1
+            fits_any = None
+            for key, entry in masks.items():
+                if entry is None:
+                    entry = masks[key] = fit_mask(lo, key[2], key[3])
+                start, mask = entry
+                if fits_any is None:
+                    fits_any = mask[lo - start :].copy()
+                else:
+                    fits_any |= mask[lo - start :]
+            candidates = fits_any & pending[lo:]
+            nxt = int(candidates.argmax())
+            idx = lo + nxt if candidates[nxt] else -1
+
+        boards.append(placed_this_board)
+    return boards
+
+
+def _resolve_heuristic(heuristic: Heuristic) -> Tuple[Callable[[PieceItem], tuple], FitScore]:
+    if heuristic.order not in ORDERINGS:
+        raise ValueError(f"Orden de piezas desconocido: {heuristic.order}")
+    if heuristic.fit not in FIT_SCORES:
+        raise ValueError(f"Criterio de hueco desconocido: {heuristic.fit}")
+    return ORDERINGS[heuristic.order], FIT_SCORES[heuristic.fit]
+
+
+def pack_group_with_positions(
+    items: List[PieceItem],
+    usable_w: float,
+    usable_h: float,
+    allow_rotate: bool,
+    heuristic: Heuristic = DEFAULT_HEURISTIC,
+) -> Tuple[List[List[PlacedPiece]], List[PieceItem]]:
+    """Guillotina tablero a tablero: piezas en el orden de `heuristic.order`
+    (descendente), cada una en el hueco de menor `heuristic.fit`.
+
+    Con la heurística por defecto produce exactamente los mismos layouts que
+    `_pack_group_reference`. Los grupos grandes usan máscaras numpy por hueco
+    (`_pack_masked`) en vez de recorrer todas las pendientes en cada tablero;
+    la poda de huecos es incremental.
+    """
+    order_key, _score = _resolve_heuristic(heuristic)
+    work, unplaced = split_unplaceable(items, usable_w, usable_h, allow_rotate)
+    work.sort(key=order_key, reverse=True)
+    return pack_in_order(work, usable_w, usable_h, allow_rotate, heuristic.fit), unplaced
+
+
+def split_unplaceable(
+    items: List[PieceItem], usable_w: float, usable_h: float, allow_rotate: bool
+) -> Tuple[List[PieceItem], List[PieceItem]]:
+    """(piezas que caben en un tablero vacío, piezas que no caben nunca)."""
+    work: List[PieceItem] = []
+    unplaced: List[PieceItem] = []
+    for it in items:
+        w_eff = it.w + GAP_BETWEEN
+        h_eff = it.h + GAP_BETWEEN
+        fits = (w_eff <= usable_w and h_eff <= usable_h) or (allow_rotate and h_eff <= usable_w and w_eff <= usable_h)
+        (work if fits else unplaced).append(it)
+    return work, unplaced
+
+
+def pack_in_order(
+    work: List[PieceItem],
+    usable_w: float,
+    usable_h: float,
+    allow_rotate: bool,
+    fit: str = DEFAULT_HEURISTIC.fit,
+) -> List[List[PlacedPiece]]:
+    """Empaqueta `work` en el orden dado (sin reordenar); todas las piezas deben caber
+    en un tablero vacío (ver `split_unplaceable`). Base de la búsqueda local."""
+    if fit not in FIT_SCORES:
+        raise ValueError(f"Criterio de hueco desconocido: {fit}")
+    pack = _pack_linear if len(work) < VECTOR_MIN_PIECES else _pack_masked
+    return pack(list(work), usable_w, usable_h, allow_rotate, FIT_SCORES[fit])
+
+
+def pack_cache_key(
+    items: List[PieceItem],
+    usable_w: float,
+    usable_h: float,
+    allow_rotate: bool,
+    heuristic: Heuristic = DEFAULT_HEURISTIC,
+) -> tuple:
+    return (
+        tuple((it.piece_id, it.typology, it.w, it.h) for it in items),
+        usable_w,
+        usable_h,
+        bool(allow_rotate),
+        heuristic,
+    )
+
+
+def cached_layout(key: tuple) -> Optional[Tuple[List[List[PlacedPiece]], List[PieceItem]]]:
+    with _pack_lock:
+        cached = _pack_cache.get(key)
+        if cached is not None:
+            _pack_cache.move_to_end(key)
+            _pack_stats["hits"] += 1
+        else:
+            _pack_stats["misses"] += 1
+        return cached
+
+
+def store_layout(key: tuple, result: Tuple[List[List[PlacedPiece]], List[PieceItem]]) -> None:
+    with _pack_lock:
+        _pack_cache[key] = result
+        while len(_pack_cache) > PACK_CACHE_SIZE:
+            _pack_cache.popitem(last=False)
+
+
+def pack_group_cached(
+    items: List[PieceItem],
+    usable_w: float,
+    usable_h: float,
+    allow_rotate: bool,
+    heuristic: Heuristic = DEFAULT_HEURISTIC,
+) -> Tuple[List[List[PlacedPiece]], List[PieceItem]]:
+    """`pack_group_with_positions` memoizado por contenido (piezas + tablero + heurística).
+
+    El resultado se comparte entre llamadas: trátalo como de solo lectura.
+    """
+    key = pack_cache_key(items, usable_w, usable_h, allow_rotate, heuristic)
+    cached = cached_layout(key)
+    if cached is not None:
+        return cached
+    result = pack_group_with_positions(items, usable_w, usable_h, allow_rotate, heuristic)
+    store_layout(key, result)
+    return result
+
+
+def pack_cache_info() -> Dict[str, int]:
+    with _pack_lock:
+        return {**_pack_stats, "size": len(_pack_cache), "maxsize": PACK_CACHE_SIZE}
+
+
+def clear_pack_cache() -> None:
+    with _pack_lock:
+        _pack_cache.clear()
+        _pack_stats["hits"] = 0
+        _pack_stats["misses"] = 0
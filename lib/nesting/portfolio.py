@@ -0,0 +1,145 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from lib.nesting.bounds import board_lower_bound
+from lib.nesting.models import Heuristic, PieceItem, PlacedPiece
+from lib.nesting.packer import (
+    DEFAULT_HEURISTIC,
+    cached_layout,
+    pack_cache_key,
+    pack_group_with_positions,
+    store_layout,
+)
+
+# Cartera por defecto del modo optimizador: la heurística clásica + variantes
+# que a menudo ahorran un tablero (best-short-side, best-area, bottom-left...).
+DEFAULT_PORTFOLIO: Tuple[Heuristic, ...] = (
+    DEFAULT_HEURISTIC,
+    Heuristic("longest_side", "short_side"),
+    Heuristic("longest_side", "area"),
+    Heuristic("area", "leftover_sum"),
+    Heuristic("area", "short_side"),
+    Heuristic("width", "bottom_left"),
+    Heuristic("height", "bottom_left"),
+    Heuristic("perimeter", "long_side"),
+)
+
+# Por debajo de estas piezas (sumando todas las ejecuciones) arrancar el pool cuesta más que empaquetar.
+PARALLEL_MIN_PIECES = 3000
+
+PackJob = Tuple[List[PieceItem], float, float, bool]
+
+
+@dataclass
+class PortfolioResult:
+    boards: List[List[PlacedPiece]]
+    unplaced: List[PieceItem]
+    heuristic: str
+    # nombre de heurística -> nº de tableros que obtuvo (las que cuentan para la elección)
+    runs: Dict[str, int] = field(default_factory=dict)
+
+
+def layout_rank(boards: List[List[PlacedPiece]], usable_w: float, usable_h: float) -> Tuple[int, float]:
+    """Clave de comparación (menor = mejor): nº de tableros y ocupación del tablero más vacío.
+
+    A igual número de tableros el aprovechamiento medio es el mismo; se prefiere
+    el layout que concentra el sobrante en un solo tablero (retal más grande).
+    """
+    if not boards:
+        return (0, 0.0)
+    fills = [sum(p.w * p.h for p in board) / (usable_w * usable_h) for board in boards]
+    return (len(boards), min(fills))
+
+
+def _run_heuristic(job: PackJob, heuristic: Heuristic):
+    items, usable_w, usable_h, allow_rotate = job
+    return pack_group_with_positions(items, usable_w, usable_h, allow_rotate, heuristic)
+
+
+def pack_portfolio(
+    jobs: Sequence[PackJob],
+    portfolio: Sequence[Heuristic] = DEFAULT_PORTFOLIO,
+    max_workers: Optional[int] = None,
+) -> List[PortfolioResult]:
+    """Ejecuta cada heurística de `portfolio` sobre cada grupo y se queda con la mejor.
+
+    Todas las combinaciones (grupo, heurística) se reparten en un único pool de
+    procesos, así que el tiempo total se acerca al de una sola pasada cuando hay
+    núcleos suficientes. Los layouts pasan por el memo del packer: repetir un
+    grupo ya optimizado no vuelve a empaquetar. En cuanto una heurística alcanza
+    la cota inferior del grupo (`board_lower_bound`) no se prueban las siguientes.
+
+    La elección no depende del memo ni de qué procesos terminen antes: gana la
+    primera heurística, en el orden de `portfolio`, que alcanza la cota; si
+    ninguna la alcanza, la mejor de todas por `layout_rank`. Los layouts de
+    heurísticas posteriores que ya estuvieran en el memo (o que el pool acabó
+    de todos modos) no cuentan.
+    """
+    portfolio = list(portfolio) or [DEFAULT_HEURISTIC]
+    layouts: Dict[tuple, Optional[Tuple[List[List[PlacedPiece]], List[PieceItem]]]] = {}
+    bounds: Dict[tuple, int] = {}
+    # grupo -> primera heurística (posición en `portfolio`) que alcanzó la cota: las siguientes sobran
+    solved: Dict[tuple, int] = {}
+    pending: List[Tuple[tuple, tuple, int, PackJob, Heuristic]] = []
+
+    def reached(job_key: tuple, rank: int, layout) -> None:
+        if len(layout[0]) <= bounds[job_key] and rank < solved.get(job_key, len(portfolio)):
+            solved[job_key] = rank
+
+    for job in jobs:
+        job_key = pack_cache_key(*job)
+        bounds.setdefault(job_key, board_lower_bound(*job))
+        for rank, heuristic in enumerate(portfolio):
+            key = pack_cache_key(*job, heuristic)
+            if key in layouts:
+                continue
+            cached = cached_layout(key)
+            layouts[key] = cached
+            if cached is None:
+                pending.append((key, job_key, rank, job, heuristic))
+            else:
+                reached(job_key, rank, cached)
+
+    def skip(job_key: tuple, rank: int) -> bool:
+        return solved.get(job_key, len(portfolio)) < rank
+
+    def finish(key: tuple, job_key: tuple, rank: int, layout) -> None:
+        layouts[key] = layout
+        store_layout(key, layout)
+        reached(job_key, rank, layout)
+
+    workers = max_workers or os.cpu_count() or 1
+    total_pieces = sum(len(job[0]) for _key, _job_key, _rank, job, _heuristic in pending)
+    if workers <= 1 or len(pending) <= 1 or total_pieces < PARALLEL_MIN_PIECES:
+        for key, job_key, rank, job, heuristic in pending:
+            if not skip(job_key, rank):
+                finish(key, job_key, rank, _run_heuristic(job, heuristic))
+    elif pending:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            futures = [
+                (key, job_key, rank, pool.submit(_run_heuristic, job, heuristic))
+                for key, job_key, rank, job, heuristic in pending
+            ]
+            for key, job_key, rank, future in futures:
+                if skip(job_key, rank) and future.cancel():
+                    continue
+                finish(key, job_key, rank, future.result())
+
+    results = []
+    for job in jobs:
+        _items, usable_w, usable_h, _rotate = job
+        last = solved.get(pack_cache_key(*job), len(portfolio) - 1)
+        best = None
+        runs: Dict[str, int] = {}
+        # Solo hasta la primera que alcanza la cota: todas las anteriores se han ejecutado seguro.
+        for heuristic in portfolio[: last + 1]:
+            boards, unplaced = layouts[pack_cache_key(*job, heuristic)]
+            runs[heuristic.name] = len(boards)
+            rank = layout_rank(boards, usable_w, usable_h)
+            if best is None or rank < best[0]:
+                best = (rank, heuristic, boards, unplaced)
+        _rank, heuristic, boards, unplaced = best
+        results.append(PortfolioResult(boards=boards, unplaced=unplaced, heuristic=heuristic.name, runs=runs))
+    return results
@@ -0,0 +1,130 @@
+import io
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import matplotlib
+from PIL import Image, ImageDraw, ImageFont
+
+from lib.nesting.models import PlacedPiece
+from lib.nesting.rules import EDGE_MARGIN
+
+# Tamaños en pulgadas / puntos equivalentes a los del render con matplotlib,
+# para que un PNG a un mismo dpi tenga aspecto y tamaño parecidos.
+BOARD_INCHES = 6.5  # lado largo del tablero dibujado
+PADDING_INCHES = 0.15
+TITLE_PT = 12
+LABEL_PT = 6
+LEGEND_PT = 7
+FALLBACK_COLOR = (0.7, 0.7, 0.7, 1.0)
+WHITE, BLACK = (255, 255, 255), (0, 0, 0)
+
+_FONT_PATH = Path(matplotlib.get_data_path()) / "fonts" / "ttf" / "DejaVuSans.ttf"
+
+
+@lru_cache(maxsize=32)
+def _font(size_px: int) -> ImageFont.ImageFont:
+    """DejaVu Sans (la misma fuente que usa matplotlib); si no está, la de Pillow."""
+    try:
+        return ImageFont.truetype(str(_FONT_PATH), size_px)
+    except OSError:
+        return ImageFont.load_default(size_px)
+
+
+def _rgb(color: Tuple[float, float, float, float], alpha: float = 1.0) -> Tuple[int, int, int]:
+    """Color RGBA (0-1) de matplotlib a RGB 0-255, mezclado con fondo blanco."""
+    r, g, b = color[:3]
+    return tuple(int(round(255 * (alpha * c + (1 - alpha)))) for c in (r, g, b))
+
+
+def _pt(points: float, dpi: int) -> int:
+    return max(1, int(round(points * dpi / 72)))
+
+
+def _dashed_rect(draw: ImageDraw.ImageDraw, box: Tuple[float, float, float, float], dash: int, width: int) -> None:
+    x0, y0, x1, y1 = box
+    for ax, ay, bx, by in ((x0, y0, x1, y0), (x1, y0, x1, y1), (x0, y1, x1, y1), (x0, y0, x0, y1)):
+        length = max(abs(bx - ax), abs(by - ay))
+        if length <= 0:
+            continue
+        start = 0.0
+        while start < length:
+            t0, t1 = start / length, min(length, start + dash) / length
+            draw.line((ax + (bx - ax) * t0, ay + (by - ay) * t0, ax + (bx - ax) * t1, ay + (by - ay) * t1), fill=1, width=width)
+            start += 2 * dash
+
+
+def render_board_png_pil(
+    board_w: int,
+    board_h: int,
+    usable_w: float,
+    usable_h: float,
+    pieces: List[PlacedPiece],
+    title: str,
+    color_by_typology: Dict[str, Tuple[float, float, float, float]],
+    legend_max_items: int = 30,
+    dpi: int = 200,
+) -> bytes:
+    """Mismo dibujo que `render.render_board_png` (tablero, margen, piezas, ids y
+    leyenda) pintado directamente con Pillow: ~10-20× más rápido que matplotlib."""
+    scale = BOARD_INCHES * dpi / max(board_w, board_h)
+    pad = int(PADDING_INCHES * dpi)
+    title_font, label_font, legend_font = _font(_pt(TITLE_PT, dpi)), _font(_pt(LABEL_PT, dpi)), _font(_pt(LEGEND_PT, dpi))
+
+    present_typologies = sorted({str(p.typology) for p in pieces})
+    legend_items = present_typologies[:legend_max_items]
+    more = len(present_typologies) - len(legend_items)
+    legend_lines = legend_items + ([f"+{more} tipologías más"] if more > 0 else [])
+    swatch = _pt(LEGEND_PT, dpi)
+    line_h = int(swatch * 1.6)
+    legend_w = (swatch + pad + max(int(legend_font.getlength(t)) for t in legend_lines)) if legend_lines else 0
+
+    title_h = _pt(TITLE_PT, dpi) * 2
+    board_px_w, board_px_h = int(round(board_w * scale)), int(round(board_h * scale))
+    width = max(pad + board_px_w + (2 * pad + legend_w if legend_w else 0) + pad, int(title_font.getlength(title)) + 2 * pad)
+    height = title_h + pad + max(board_px_h, len(legend_lines) * line_h) + pad
+
+    # Imagen con paleta (blanco, negro y los colores usados): codificar el PNG
+    # es lo más caro y con 1 byte por píxel cuesta ~3 veces menos que en RGB.
+    palette: Dict[Tuple[int, int, int], int] = {WHITE: 0, BLACK: 1}
+
+    def ink(rgb: Tuple[int, int, int]) -> int:
+        return palette.setdefault(rgb, len(palette))
+
+    img = Image.new("P", (width, height), 0)
+    draw = ImageDraw.Draw(img)
+    draw.text((width / 2, pad + title_h / 2), title, fill=1, font=title_font, anchor="mm")
+
+    ox, oy = pad, title_h + pad
+    draw.rectangle((ox, oy, ox + board_px_w, oy + board_px_h), outline=1, width=_pt(2, dpi))
+    m = EDGE_MARGIN * scale
+    _dashed_rect(
+        draw,
+        (ox + m, oy + m, ox + m + usable_w * scale, oy + m + usable_h * scale),
+        dash=_pt(3.7, dpi),
+        width=_pt(1, dpi),
+    )
+
+    edge = _pt(0.6, dpi)
+    for p in pieces:
+        x0 = ox + (EDGE_MARGIN + p.x) * scale
+        y0 = oy + (EDGE_MARGIN + p.y) * scale
+        x1, y1 = x0 + p.w * scale, y0 + p.h * scale
+        col = ink(_rgb(color_by_typology.get(str(p.typology), FALLBACK_COLOR), alpha=0.9))
+        draw.rectangle((x0, y0, x1, y1), fill=col, outline=1, width=edge)
+        draw.text(((x0 + x1) / 2, (y0 + y1) / 2), str(p.piece_id), fill=1, font=label_font, anchor="mm")
+
+    if legend_lines:
+        lx = ox + board_px_w + 2 * pad
+        ly = oy + max(0, (board_px_h - len(legend_lines) * line_h) // 2)
+        for i, text in enumerate(legend_lines):
+            y = ly + i * line_h
+            if i < len(legend_items):
+                col = ink(_rgb(color_by_typology.get(text, FALLBACK_COLOR)))
+                draw.rectangle((lx, y, lx + swatch, y + swatch), fill=col, outline=1, width=1)
+            draw.text((lx + swatch + pad // 2, y + swatch / 2), text, fill=1, font=legend_font, anchor="lm")
+
+    img.putpalette([channel for rgb in palette for channel in rgb])
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
@@ -0,0 +1,278 @@
+import hashlib
+import io
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
+
+from lib.nesting.models import GroupLayout, PlacedPiece
+from lib.nesting.rules import EDGE_MARGIN
+
+# Resoluciones: miniaturas para la vista previa, resolución completa para el ZIP.
+THUMBNAIL_DPI = 60
+FULL_DPI = 200
+# Memo LRU de PNGs por (hash del tablero, dpi), limitado por bytes.
+RENDER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Por debajo de estos tableros pendientes, arrancar el pool cuesta más que dibujar.
+RENDER_PARALLEL_MIN_BOARDS = 16
+
+_render_lock = threading.Lock()
+_render_cache: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+_render_stats = {"hits": 0, "misses": 0, "bytes": 0}
+
+
+def typology_color_map(typologies: List[str]) -> Dict[str, Tuple[float, float, float, float]]:
+    uniq = sorted({str(t) for t in typologies})
+    cmap = plt.get_cmap("tab20")
+    return {t: cmap(i % 20) for i, t in enumerate(uniq)}
+
+
+def render_board_png(
+    board_w: int,
+    board_h: int,
+    usable_w: float,
+    usable_h: float,
+    pieces: List[PlacedPiece],
+    title: str,
+    color_by_typology: Dict[str, Tuple[float, float, float, float]],
+    legend_max_items: int = 30,
+    dpi: int = FULL_DPI,
+) -> bytes:
+    fig_w = 12
+    fig_h = max(6, 10 * (board_h / board_w) * 0.35)
+
+    fig, ax = plt.subplots(figsize=(fig_w, fig_h))
+    fig.subplots_adjust(right=0.78)
+
+    ax.add_patch(Rectangle((0, 0), board_w, board_h, fill=False, linewidth=2))
+    ax.add_patch(Rectangle((EDGE_MARGIN, EDGE_MARGIN), usable_w, usable_h, fill=False, linestyle="--", linewidth=1))
+
+    for p in pieces:
+        x = EDGE_MARGIN + p.x
+        y = EDGE_MARGIN + p.y
+        col = color_by_typology.get(str(p.typology), (0.7, 0.7, 0.7, 1.0))
+
+        ax.add_patch(Rectangle((x, y), p.w, p.h, facecolor=col, edgecolor="black", linewidth=0.6, alpha=0.9))
+        ax.text(x + p.w / 2, y + p.h / 2, str(p.piece_id), ha="center", va="center", fontsize=6, color="black")
+
+    ax.set_title(title, fontsize=12)
+    ax.set_xlim(0, board_w)
+    ax.set_ylim(0, board_h)
+    ax.set_aspect("equal", adjustable="box")
+    ax.invert_yaxis()
+    ax.axis("off")
+
+    present_typologies = sorted({str(p.typology) for p in pieces})
+    legend_items = present_typologies[:legend_max_items]
+    if legend_items:
+        handles = [
+            Rectangle((0, 0), 1, 1, facecolor=color_by_typology.get(t, (0.7, 0.7, 0.7, 1.0)), edgecolor="black")
+            for t in legend_items
+        ]
+        ax.legend(
+            handles,
+            legend_items,
+            loc="center left",
+            bbox_to_anchor=(1.01, 0.5),
+            borderaxespad=0.0,
+            frameon=False,
+            fontsize=7,
+            ncol=1,
+        )
+
+        if len(present_typologies) > legend_max_items:
+            ax.text(
+                1.01,
+                0.02,
+                f"+{len(present_typologies) - legend_max_items} tipologías más",
+                transform=ax.transAxes,
+                fontsize=7,
+                ha="left",
+                va="bottom",
+            )
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+try:
+    from lib.nesting.raster import render_board_png_pil
+except ImportError:  # sin Pillow: solo matplotlib
+    render_board_png_pil = None
+
+RENDER_BACKENDS: Dict[str, Callable[..., bytes]] = {"matplotlib": render_board_png}
+if render_board_png_pil is not None:
+    RENDER_BACKENDS["pil"] = render_board_png_pil
+# Pillow dibuja ~10× más rápido; matplotlib queda como alternativa.
+DEFAULT_RENDER_BACKEND = "pil" if "pil" in RENDER_BACKENDS else "matplotlib"
+
+
+def unplaced_report(layout: GroupLayout) -> str:
+    txt = "PIEZAS QUE NO CABEN EN EL TABLERO (omitidas):\n\n"
+    for it in layout.unplaced:
+        txt += f"- PieceID: {it.piece_id} | Typology: {it.typology} | W:{it.w} | H:{it.h}\n"
+    return txt
+
+
+def board_title(layout: GroupLayout, board_index: int, app_title: str) -> str:
+    return f"{app_title} | {layout.group_name.replace('__', ' / ')} | Tablero {board_index}/{len(layout.boards)}"
+
+
+def board_image_key(
+    layout: GroupLayout,
+    board_index: int,
+    color_by_typology: Dict[str, Tuple[float, float, float, float]],
+    app_title: str,
+) -> str:
+    """Hash de todo lo que se ve en el PNG de un tablero (`board_index` empieza en 1)."""
+    pieces = layout.boards[board_index - 1]
+    typologies = sorted({str(p.typology) for p in pieces})
+    content = (
+        layout.board_w,
+        layout.board_h,
+        layout.usable_w,
+        layout.usable_h,
+        board_title(layout, board_index, app_title),
+        [(p.piece_id, p.typology, p.x, p.y, p.w, p.h) for p in pieces],
+        [(t, color_by_typology.get(t)) for t in typologies],
+    )
+    return hashlib.sha1(repr(content).encode("utf-8")).hexdigest()
+
+
+def _render_job(job: Tuple[str, dict]) -> bytes:
+    backend, kwargs = job
+    return RENDER_BACKENDS[backend](**kwargs)
+
+
+def _board_job(
+    layout: GroupLayout,
+    board_index: int,
+    color_by_typology: Dict[str, Tuple[float, float, float, float]],
+    app_title: str,
+    dpi: int,
+    backend: str,
+) -> Tuple[str, dict]:
+    if backend not in RENDER_BACKENDS:
+        raise ValueError(f"Backend de render desconocido: {backend}")
+    pieces = layout.boards[board_index - 1]
+    colors = {t: color_by_typology[t] for t in {str(p.typology) for p in pieces} if t in color_by_typology}
+    kwargs = dict(
+        board_w=layout.board_w,
+        board_h=layout.board_h,
+        usable_w=layout.usable_w,
+        usable_h=layout.usable_h,
+        pieces=pieces,
+        title=board_title(layout, board_index, app_title),
+        color_by_typology=colors,
+        dpi=dpi,
+    )
+    return backend, kwargs
+
+
+def _cache_get(key: Tuple[str, int, str]) -> Optional[bytes]:
+    with _render_lock:
+        cached = _render_cache.get(key)
+        if cached is not None:
+            _render_cache.move_to_end(key)
+            _render_stats["hits"] += 1
+        else:
+            _render_stats["misses"] += 1
+        return cached
+
+
+def _cache_put(key: Tuple[str, int, str], png_bytes: bytes) -> None:
+    with _render_lock:
+        if key not in _render_cache:
+            _render_cache[key] = png_bytes
+            _render_stats["bytes"] += len(png_bytes)
+        while _render_stats["bytes"] > RENDER_CACHE_MAX_BYTES and len(_render_cache) > 1:
+            _old_key, old = _render_cache.popitem(last=False)
+            _render_stats["bytes"] -= len(old)
+
+
+def render_board_cached(
+    layout: GroupLayout,
+    board_index: int,
+    color_by_typology: Dict[str, Tuple[float, float, float, float]],
+    app_title: str,
+    dpi: int = FULL_DPI,
+    backend: str = DEFAULT_RENDER_BACKEND,
+) -> bytes:
+    """PNG de un tablero a `dpi`, memoizado (LRU) por (hash del tablero, dpi, backend)."""
+    key = (board_image_key(layout, board_index, color_by_typology, app_title), int(dpi), backend)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    png_bytes = _render_job(_board_job(layout, board_index, color_by_typology, app_title, dpi, backend))
+    _cache_put(key, png_bytes)
+    return png_bytes
+
+
+def render_cache_info() -> Dict[str, int]:
+    with _render_lock:
+        return {**_render_stats, "size": len(_render_cache)}
+
+
+def clear_render_cache() -> None:
+    with _render_lock:
+        _render_cache.clear()
+        _render_stats.update(hits=0, misses=0, bytes=0)
+
+
+def build_layouts_zip(
+    groups: List[GroupLayout],
+    color_by_typology: Dict[str, Tuple[float, float, float, float]],
+    app_title: str,
+    dpi: int = FULL_DPI,
+    backend: str = DEFAULT_RENDER_BACKEND,
+    max_workers: Optional[int] = None,
+) -> bytes:
+    """ZIP con el PNG de cada tablero (a `dpi`) y el informe de piezas que no caben por grupo.
+
+    Los tableros que no están en el memo se dibujan en un pool de `max_workers`
+    procesos (por defecto, uno por núcleo) y se escriben en el ZIP en orden
+    según van llegando. Los PNG ya van comprimidos: se guardan sin deflate.
+    """
+    # (ruta en el ZIP, clave del memo o None, contenido; None = PNG pendiente de dibujar)
+    entries: List[Tuple[str, Optional[tuple], Optional[object]]] = []
+    jobs = []
+    for layout in groups:
+        for bi in range(1, len(layout.boards) + 1):
+            key = (board_image_key(layout, bi, color_by_typology, app_title), int(dpi), backend)
+            cached = _cache_get(key)
+            if cached is None:
+                jobs.append(_board_job(layout, bi, color_by_typology, app_title, dpi, backend))
+            entries.append((f"{layout.group_name}/TABLERO_{bi:03d}.png", key, cached))
+        if layout.unplaced:
+            entries.append((f"{layout.group_name}/_PIEZAS_NO_CABEN.txt", None, unplaced_report(layout)))
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers <= 1 or len(jobs) < RENDER_PARALLEL_MIN_BOARDS:
+        rendered = map(_render_job, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(jobs)))
+        rendered = pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (4 * workers)))
+
+    zip_buf = io.BytesIO()
+    try:
+        with zipfile.ZipFile(zip_buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, key, data in entries:
+                if key is None:
+                    zf.writestr(name, data)
+                    continue
+                if data is None:
+                    data = next(rendered)
+                    _cache_put(key, data)
+                zf.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return zip_buf.getvalue()
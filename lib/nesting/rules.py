@@ -0,0 +1,72 @@
+import unicodedata
+
+GAP_BETWEEN = 8  # mm separación obligatoria entre piezas
+EDGE_MARGIN = 7   # mm separación obligatoria a borde de tablero (mínimo)
+
+BOARD_RULES = {
+    "wood": {"board_w": 1250, "board_h": 3050, "rotate": False},
+    "laminado": {"board_w": 1300, "board_h": 3050, "rotate": True},
+    "linoleo": {"board_w": 1300, "board_h": 3050, "rotate": True},
+    "laca": {"board_w": 1220, "board_h": 2750, "rotate": True},
+}
+
+GAMA_SYNONYMS = {
+    "lac": "laca",
+    "woo": "wood",
+    "lin": "linoleo",
+    "lam": "laminado",
+    "laca": "laca",
+    "wood": "wood",
+    "madera": "wood",
+    "linoleo": "linoleo",
+    "linóleo": "linoleo",
+    "laminado": "laminado",
+}
+
+GAMA_DISPLAY = {
+    "laca": "Laca",
+    "wood": "Wood",
+    "linoleo": "Linóleo",
+    "laminado": "Laminado",
+}
+
+
+def _norm_text(s: str) -> str:
+    s = (s or "").strip().lower()
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return s
+
+
+def normalize_gama(gama: str) -> str:
+    g = _norm_text(gama)
+    return GAMA_SYNONYMS.get(g, g)
+
+
+def normalize_acabado(acabado: str) -> str:
+    return _norm_text(acabado)
+
+
+def normalize_material(material: str) -> str:
+    m = _norm_text(material).upper()
+    if m in ["MDF", "PLY"]:
+        return m
+    return m if m else "—"
+
+
+def get_board_rule(gama_norm: str, acabado_norm: str):
+    g = (gama_norm or "").strip().lower()
+    a = (acabado_norm or "").strip().lower()
+
+    if g not in BOARD_RULES:
+        return None
+
+    rule = BOARD_RULES[g].copy()
+
+    # Excepción: Laminado + Metal => 1220x3050 (rotación sí)
+    if g == "laminado" and a == "metal":
+        rule["board_w"] = 1220
+        rule["board_h"] = 3050
+        rule["rotate"] = True
+
+    return rule
@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from lib.nesting.models import Heuristic, PieceItem, PlacedPiece
+from lib.nesting.packer import DEFAULT_HEURISTIC, cached_layout, pack_cache_key, store_layout
+from lib.nesting.portfolio import PARALLEL_MIN_PIECES, PackJob, _run_heuristic
+
+Layout = Tuple[List[List[PlacedPiece]], List[PieceItem]]
+
+
+def iter_packed_jobs(
+    jobs: Sequence[PackJob],
+    heuristic: Heuristic = DEFAULT_HEURISTIC,
+    max_workers: Optional[int] = None,
+) -> Iterator[Tuple[int, Layout]]:
+    """Empaqueta grupos independientes y va entregando `(índice del job, layout)` según terminan.
+
+    Los jobs se reparten en un pool de `max_workers` procesos (por defecto, uno
+    por núcleo), los más grandes primero para que el tiempo total se acerque
+    al del grupo más lento. Los layouts ya memoizados se entregan al momento y
+    los nuevos se guardan en el memo del packer, así que el resultado final no
+    depende del número de procesos (solo cambia el orden de llegada).
+    Jobs repetidos (mismo contenido) se empaquetan una sola vez.
+    """
+    pending: Dict[tuple, Tuple[PackJob, List[int]]] = {}
+    for i, job in enumerate(jobs):
+        key = pack_cache_key(*job, heuristic)
+        if key in pending:
+            pending[key][1].append(i)
+            continue
+        cached = cached_layout(key)
+        if cached is not None:
+            yield i, cached
+            continue
+        pending[key] = (job, [i])
+
+    # Más piezas primero: el grupo más lento no queda para el final.
+    order = sorted(pending.items(), key=lambda entry: len(entry[1][0][0]), reverse=True)
+    workers = max_workers or os.cpu_count() or 1
+    total_pieces = sum(len(job[0]) for _key, (job, _idx) in order)
+    if workers <= 1 or len(order) <= 1 or total_pieces < PARALLEL_MIN_PIECES:
+        for key, (job, indices) in order:
+            layout = _run_heuristic(job, heuristic)
+            store_layout(key, layout)
+            for i in indices:
+                yield i, layout
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(order))) as pool:
+        futures = {pool.submit(_run_heuristic, job, heuristic): (key, indices) for key, (job, indices) in order}
+        for future in as_completed(futures):
+            key, indices = futures[future]
+            layout = future.result()
+            store_layout(key, layout)
+            for i in indices:
+                yield i, layout
@@ -0,0 +1,173 @@
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from lib.nesting.bounds import board_lower_bound
+from lib.nesting.models import Heuristic, PieceItem, PlacedPiece
+from lib.nesting.packer import DEFAULT_HEURISTIC, ORDERINGS, pack_in_order, split_unplaceable
+from lib.nesting.portfolio import layout_rank
+
+# Temperatura inicial del recocido, en unidades de "energía" (tableros + ocupación
+# del tablero más vacío): al principio se acepta empeorar ~2 puntos de ocupación.
+INITIAL_TEMPERATURE = 0.02
+
+
+@dataclass
+class SearchProgress:
+    elapsed: float
+    iterations: int
+    boards: int
+    utilization: float
+    lower_bound: int
+    improved: bool = False
+
+
+@dataclass
+class SearchResult:
+    boards: List[List[PlacedPiece]]
+    unplaced: List[PieceItem]
+    lower_bound: int
+    initial_boards: int
+    iterations: int
+    elapsed: float
+    history: List[SearchProgress] = field(default_factory=list)
+
+    @property
+    def reached_lower_bound(self) -> bool:
+        return len(self.boards) <= self.lower_bound
+
+
+def _energy(boards: List[List[PlacedPiece]], usable_w: float, usable_h: float) -> float:
+    count, emptiest_fill = layout_rank(boards, usable_w, usable_h)
+    return count + emptiest_fill
+
+
+def _utilization(boards: List[List[PlacedPiece]], usable_w: float, usable_h: float) -> float:
+    if not boards:
+        return 0.0
+    return sum(p.w * p.h for board in boards for p in board) / (len(boards) * usable_w * usable_h)
+
+
+def _mutate(order: List[PieceItem], boards: List[List[PlacedPiece]], rng: random.Random) -> List[PieceItem]:
+    order = list(order)
+    n = len(order)
+    move = rng.random()
+    if move < 0.5 and len(boards) > 1:
+        # Adelanta una pieza del tablero más vacío para intentar repartirla en los demás.
+        emptiest = min(boards, key=lambda board: sum(p.w * p.h for p in board))
+        position = {it.piece_id: i for i, it in enumerate(order)}
+        src = position[rng.choice(emptiest).piece_id]
+        if src > 0:
+            order.insert(rng.randrange(0, src), order.pop(src))
+    elif move < 0.8:
+        i, j = rng.randrange(n), rng.randrange(n)
+        order[i], order[j] = order[j], order[i]
+    else:
+        i = rng.randrange(n)
+        j = min(n, i + rng.randint(2, 8))
+        order[i:j] = reversed(order[i:j])
+    return order
+
+
+def improve_layout(
+    items: List[PieceItem],
+    usable_w: float,
+    usable_h: float,
+    allow_rotate: bool,
+    time_budget_s: float,
+    heuristic: Heuristic = DEFAULT_HEURISTIC,
+    seed: int = 0,
+    on_progress: Optional[Callable[[SearchProgress], None]] = None,
+    progress_interval_s: float = 0.25,
+) -> SearchResult:
+    """Mejora "anytime" de un layout durante `time_budget_s` segundos.
+
+    Parte del layout de `heuristic` y aplica recocido simulado sobre el orden
+    de las piezas (adelantar piezas del tablero más vacío, intercambios,
+    inversiones de tramos), re-empaquetando con `pack_in_order`. Siempre
+    conserva la mejor solución encontrada y para en cuanto alcanza la cota
+    inferior (`board_lower_bound`). `on_progress` recibe el estado cada `progress_interval_s`
+    y en cada mejora.
+    """
+    start = time.perf_counter()
+    work, unplaced = split_unplaceable(items, usable_w, usable_h, allow_rotate)
+    # Copias con id = índice: los ids originales pueden repetirse.
+    proxies = [PieceItem(piece_id=str(i), typology=it.typology, w=it.w, h=it.h) for i, it in enumerate(work)]
+    order = sorted(proxies, key=ORDERINGS[heuristic.order], reverse=True)
+    lower_bound = board_lower_bound(work, usable_w, usable_h, allow_rotate)
+
+    current = pack_in_order(order, usable_w, usable_h, allow_rotate, heuristic.fit)
+    current_energy = _energy(current, usable_w, usable_h)
+    best, best_energy = current, current_energy
+    initial_boards = len(current)
+
+    rng = random.Random(seed)
+    history: List[SearchProgress] = []
+    iterations = 0
+    last_report = start
+
+    def report(improved: bool) -> None:
+        progress = SearchProgress(
+            elapsed=time.perf_counter() - start,
+            iterations=iterations,
+            boards=len(best),
+            utilization=_utilization(best, usable_w, usable_h),
+            lower_bound=lower_bound,
+            improved=improved,
+        )
+        history.append(progress)
+        if on_progress is not None:
+            on_progress(progress)
+
+    report(False)
+    while len(proxies) > 1 and len(best) > lower_bound:
+        elapsed = time.perf_counter() - start
+        if elapsed >= time_budget_s:
+            break
+        iterations += 1
+        candidate_order = _mutate(order, current, rng)
+        candidate = pack_in_order(candidate_order, usable_w, usable_h, allow_rotate, heuristic.fit)
+        energy = _energy(candidate, usable_w, usable_h)
+
+        temperature = INITIAL_TEMPERATURE * max(1e-3, 1 - elapsed / time_budget_s)
+        delta = energy - current_energy
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            order, current, current_energy = candidate_order, candidate, energy
+
+        if energy < best_energy:
+            best, best_energy = candidate, energy
+            report(True)
+            last_report = time.perf_counter()
+        elif time.perf_counter() - last_report >= progress_interval_s:
+            report(False)
+            last_report = time.perf_counter()
+
+    # Devuelve las piezas con sus ids y tipologías originales.
+    boards = [
+        [
+            PlacedPiece(
+                piece_id=str(work[int(p.piece_id)].piece_id),
+                typology=str(work[int(p.piece_id)].typology),
+                x=p.x,
+                y=p.y,
+                w=p.w,
+                h=p.h,
+                rotated=p.rotated,
+            )
+            for p in board
+        ]
+        for board in best
+    ]
+    result = SearchResult(
+        boards=boards,
+        unplaced=unplaced,
+        lower_bound=lower_bound,
+        initial_boards=initial_boards,
+        iterations=iterations,
+        elapsed=time.perf_counter() - start,
+        history=history,
+    )
+    report(False)
+    return result
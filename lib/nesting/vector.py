@@ -0,0 +1,141 @@
+import io
+import re
+import zipfile
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+import ezdxf
+
+from lib.nesting.models import GroupLayout
+from lib.nesting.render import board_title, unplaced_report
+from lib.nesting.rules import EDGE_MARGIN
+
+# Capas fijas del DXF; las piezas van en una capa por tipología.
+BOARD_LAYER = "TABLERO"
+MARGIN_LAYER = "MARGEN"
+TITLE_LAYER = "TITULO"
+LABEL_HEIGHT_MM = 18
+FALLBACK_COLOR = (0.7, 0.7, 0.7, 1.0)
+
+# Caracteres no válidos en nombres de capa DXF.
+_LAYER_FORBIDDEN = re.compile(r'[<>/\\":;?*|=`]')
+
+
+def typology_layer(typology: str) -> str:
+    name = _LAYER_FORBIDDEN.sub("-", str(typology)).strip()
+    return name or "SIN_TIPOLOGIA"
+
+
+def _hex(color: Tuple[float, float, float, float]) -> str:
+    return "#" + "".join(f"{int(round(255 * c)):02x}" for c in color[:3])
+
+
+def board_svg(
+    layout: GroupLayout,
+    board_index: int,
+    color_by_typology: Dict[str, Tuple[float, float, float, float]],
+    app_title: str,
+) -> str:
+    """SVG de un tablero en milímetros (origen arriba a la izquierda, como los PNG).
+
+    Las piezas de cada tipología van en un `<g>` propio con su id como texto.
+    """
+    pieces = layout.boards[board_index - 1]
+    w, h = layout.board_w, layout.board_h
+    title = board_title(layout, board_index, app_title)
+    lines = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{w}mm" height="{h}mm" viewBox="0 0 {w} {h}">',
+        f"<title>{escape(title)}</title>",
+        f'<rect x="0" y="0" width="{w}" height="{h}" fill="white" stroke="black" stroke-width="4"/>',
+        f'<rect x="{EDGE_MARGIN}" y="{EDGE_MARGIN}" width="{layout.usable_w}" height="{layout.usable_h}" '
+        'fill="none" stroke="black" stroke-width="2" stroke-dasharray="12 8"/>',
+    ]
+    by_typology: Dict[str, list] = {}
+    for p in pieces:
+        by_typology.setdefault(str(p.typology), []).append(p)
+    for typology in sorted(by_typology):
+        fill = _hex(color_by_typology.get(typology, FALLBACK_COLOR))
+        lines.append(f"<g id={quoteattr(typology_layer(typology))} fill=\"{fill}\" stroke=\"black\" stroke-width=\"1\">")
+        for p in by_typology[typology]:
+            x, y = EDGE_MARGIN + p.x, EDGE_MARGIN + p.y
+            lines.append(f'<rect x="{x:g}" y="{y:g}" width="{p.w:g}" height="{p.h:g}" fill-opacity="0.9"/>')
+            lines.append(
+                f'<text x="{x + p.w / 2:g}" y="{y + p.h / 2:g}" font-size="{LABEL_HEIGHT_MM}" font-family="sans-serif" '
+                f'text-anchor="middle" dominant-baseline="middle" fill="black" stroke="none">{escape(str(p.piece_id))}</text>'
+            )
+        lines.append("</g>")
+    lines.append("</svg>")
+    return "\n".join(lines)
+
+
+def board_dxf(
+    layout: GroupLayout,
+    board_index: int,
+    color_by_typology: Dict[str, Tuple[float, float, float, float]],
+    app_title: str,
+) -> bytes:
+    """DXF (mm) de un tablero: contorno, margen y una capa por tipología con
+    cada pieza como LWPOLYLINE cerrada y su id como TEXT.
+
+    El eje Y del DXF va hacia arriba: se invierte para que el dibujo coincida con los PNG/SVG.
+    """
+    pieces = layout.boards[board_index - 1]
+    bh = layout.board_h
+    doc = ezdxf.new("R2010")
+    doc.units = ezdxf.units.MM
+    msp = doc.modelspace()
+
+    doc.layers.add(BOARD_LAYER, color=250)
+    doc.linetypes.add("DASHED", pattern=[20.0, 12.0, -8.0], description="Margen __ __ __")
+    doc.layers.add(MARGIN_LAYER, color=8, linetype="DASHED")
+    doc.layers.add(TITLE_LAYER, color=250)
+
+    def rect(x: float, y: float, w: float, h: float, layer: str) -> None:
+        top = bh - y
+        msp.add_lwpolyline([(x, top), (x + w, top), (x + w, top - h), (x, top - h)], close=True, dxfattribs={"layer": layer})
+
+    rect(0, 0, layout.board_w, bh, BOARD_LAYER)
+    rect(EDGE_MARGIN, EDGE_MARGIN, layout.usable_w, layout.usable_h, MARGIN_LAYER)
+    msp.add_text(
+        board_title(layout, board_index, app_title), height=2 * LABEL_HEIGHT_MM, dxfattribs={"layer": TITLE_LAYER}
+    ).set_placement((0, bh + LABEL_HEIGHT_MM))
+
+    for p in pieces:
+        layer = typology_layer(p.typology)
+        if layer not in doc.layers:
+            doc.layers.add(layer).rgb = tuple(
+                int(round(255 * c)) for c in color_by_typology.get(str(p.typology), FALLBACK_COLOR)[:3]
+            )
+        x, y = EDGE_MARGIN + p.x, EDGE_MARGIN + p.y
+        rect(x, y, p.w, p.h, layer)
+        msp.add_text(str(p.piece_id), height=LABEL_HEIGHT_MM, dxfattribs={"layer": layer}).set_placement(
+            (x + p.w / 2, bh - (y + p.h / 2)), align=ezdxf.enums.TextEntityAlignment.MIDDLE_CENTER
+        )
+
+    stream = io.StringIO()
+    doc.write(stream)
+    return stream.getvalue().encode("utf-8")
+
+
+def build_vector_zip(
+    groups: List[GroupLayout],
+    color_by_typology: Dict[str, Tuple[float, float, float, float]],
+    app_title: str,
+    formats: Tuple[str, ...] = ("svg", "dxf"),
+) -> bytes:
+    """ZIP con cada tablero en SVG y/o DXF (misma estructura de carpetas que el ZIP de PNGs)."""
+    unknown = set(formats) - {"svg", "dxf"}
+    if unknown:
+        raise ValueError(f"Formato vectorial desconocido: {', '.join(sorted(unknown))}")
+    zip_buf = io.BytesIO()
+    with zipfile.ZipFile(zip_buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for layout in groups:
+            group_name = layout.group_name
+            for bi in range(1, len(layout.boards) + 1):
+                if "svg" in formats:
+                    zf.writestr(f"{group_name}/TABLERO_{bi:03d}.svg", board_svg(layout, bi, color_by_typology, app_title))
+                if "dxf" in formats:
+                    zf.writestr(f"{group_name}/TABLERO_{bi:03d}.dxf", board_dxf(layout, bi, color_by_typology, app_title))
+            if layout.unplaced:
+                zf.writestr(f"{group_name}/_PIEZAS_NO_CABEN.txt", unplaced_report(layout))
+    return zip_buf.getvalue()
@@ -1,4 +1,3 @@
-import csv
 import io
 import os
 import sys
@@ -11,9 +10,26 @@ repo_root = Path(__file__).resolve().parents[1]
 if str(repo_root) not in sys.path:
     sys.path.append(str(repo_root))
 
-from tools.alvic_verifier import find_code, format_result, load_alvic_db, normalize_code, parse_codes
-from translator import build_mec_reference, build_non_mec_reference_from_mec, translate_and_split, load_input_csv, sanitize_no_spaces
+from tools.alvic_verifier import (
+    VerifierIndex,
+    find_code,
+    format_result,
+    load_alvic_db,
+    normalize_code,
+    parse_codes,
+    read_order_codes,
+)
+from translator import (
+    AlvicCatalogIndex,
+    SheetTabRef,
+    alvic_download_names,
+    load_input_csv,
+    load_input_gsheet,
+    translate_batch,
+    translate_dataframe,
+)
 from ui_theme import apply_shared_sidebar
+from utils.alvic_catalog_cache import source_fingerprint
 from utils.gsheets_raw import build_sheet_index, read_sheet_raw
 
 st.set_page_config(page_title="Traductor ALVIC", layout="wide")
@@ -53,17 +69,29 @@ with col_back:
     if st.button("⬅️ Volver al Pre Production Hub"):
         st.switch_page("Home.py")
 
-st.caption("Zenit 06 · 2 outputs: mecanizadas / sin mecanizar · mínimo 100mm por lado")
+st.caption("Zenit 06 / 08 Fingerpull / 09 22mm (según Gama/Material) · 2 outputs: mecanizadas / sin mecanizar · mínimo 100mm por lado")
 
 
 verifier_db_path = repo_root / "data" / "base_datos_alvic_2026.csv"
 
 
-@st.cache_data(show_spinner=False)
-def _get_alvic_db(path_str: str) -> pd.DataFrame:
+# La huella del CSV forma parte de la clave: si cambia el catálogo se recarga solo.
+@st.cache_resource(show_spinner=False)
+def _get_alvic_db(path_str: str, fingerprint: str) -> pd.DataFrame:
     return load_alvic_db(Path(path_str))
 
 
+@st.cache_resource(show_spinner=False)
+def _get_verifier_index(path_str: str, fingerprint: str) -> VerifierIndex:
+    return VerifierIndex.from_df(_get_alvic_db(path_str, fingerprint))
+
+
+@st.cache_resource(show_spinner=False)
+def _get_alvic_catalog(path_str: str, fingerprint: str) -> AlvicCatalogIndex:
+    # Índice de solo lectura compartido por todas las sesiones.
+    return AlvicCatalogIndex.from_csv(path_str)
+
+
 SOURCES = {
     "Fuente 1": "1WUgFlI1ea4OcWTyFGfJCcEKWBhaHIDj89GiXN02Fr2w",
     "Fuente 2": "1wa2WrV-iujiwxhiL-Q8rKYoPDcPU-eKR3k0Qc9jqxM0",
@@ -74,15 +102,22 @@ SOURCES = {
 }
 
 uploaded = None
+batch_uploads = []
 source_filter = "Todas"
 search_text = ""
 
 search_expander = st.sidebar.expander("👤 Búsqueda de proyecto", expanded=True)
 with search_expander:
-    input_mode = st.selectbox("Entrada", ["CSV (manual)", "Google Sheets"], key="input_mode")
+    input_mode = st.selectbox("Entrada", ["CSV (manual)", "Google Sheets", "Lote (varios proyectos)"], key="input_mode")
 
     if input_mode == "CSV (manual)":
         uploaded = st.file_uploader("Sube CSV de piezas CUBRO", type=["csv"])
+    elif input_mode == "Lote (varios proyectos)":
+        batch_uploads = st.file_uploader(
+            "CSVs de piezas CUBRO (opcional)",
+            type=["csv"],
+            accept_multiple_files=True,
+        )
     else:
         if st.button("🔄 Refrescar índice"):
             build_sheet_index.clear()
@@ -108,7 +143,7 @@ with st.sidebar.expander("🔎 Verificador códigos ALVIC", expanded=False):
         if not verifier_db_path.exists():
             st.error(f"No se encontró la base ALVIC en: {verifier_db_path}")
         else:
-            df_verifier = _get_alvic_db(str(verifier_db_path))
+            verifier_index = _get_verifier_index(str(verifier_db_path), source_fingerprint(verifier_db_path))
             codes = parse_codes(codes_text)
             if not codes:
                 st.warning("Pega al menos un código.")
@@ -116,16 +151,49 @@ with st.sidebar.expander("🔎 Verificador códigos ALVIC", expanded=False):
                 st.divider()
                 for c in codes:
                     code_norm = normalize_code(c)
-                    item = find_code(df_verifier, code_norm)
+                    item = find_code(verifier_index, code_norm)
                     st.markdown(format_result(item, code_norm))
                     st.divider()
 
+    st.caption("Verificación masiva: sube un pedido ALVIC (CSV con columna `acod`) o una lista de códigos.")
+    order_file = st.file_uploader("Pedido ALVIC", type=["csv", "txt"], key="verify_alvic_order")
+    if order_file is not None and verifier_db_path.exists():
+        verifier_index = _get_verifier_index(str(verifier_db_path), source_fingerprint(verifier_db_path))
+        try:
+            order_codes = read_order_codes(io.BytesIO(order_file.getvalue()))
+        except Exception as exc:
+            st.error(f"No se pudo leer el pedido: {exc}")
+        else:
+            report = verifier_index.verify_codes(order_codes)
+            missing = report[~report["encontrado"]]
+            st.metric("Códigos no encontrados", f"{len(missing)} / {len(report)}")
+            st.dataframe(missing if not missing.empty else report, use_container_width=True, height=240)
+            st.download_button(
+                "⬇️ Informe de verificación",
+                report.to_csv(index=False).encode("utf-8-sig"),
+                file_name=f"verificacion_{Path(order_file.name).stem}.csv",
+                mime="text/csv",
+            )
+
+    search_query = st.text_input(
+        "Buscar código parcial o con erratas",
+        placeholder="Ej: 380601381197 o LGPUL9146",
+        key="search_alvic_code",
+    )
+    if search_query.strip() and verifier_db_path.exists():
+        verifier_index = _get_verifier_index(str(verifier_db_path), source_fingerprint(verifier_db_path))
+        matches = verifier_index.search(search_query, k=10)
+        if matches:
+            st.dataframe(pd.DataFrame(matches), use_container_width=True, hide_index=True)
+        else:
+            st.info("Sin coincidencias.")
+
 DEFAULT_DB = "data/base_datos_alvic_2026.csv"
 db_path = DEFAULT_DB
 
 if st.button("Probar base de datos"):
     try:
-        df_db = _get_alvic_db(str(verifier_db_path))
+        df_db = _get_alvic_db(str(verifier_db_path), source_fingerprint(verifier_db_path))
         if df_db.empty:
             raise ValueError("empty_db")
         st.success("✅ Base de datos ALVIC OK.")
@@ -146,35 +214,76 @@ def _clear_alvic_results() -> None:
         "alvic_diag",
         "alvic_csv_m_bytes",
         "alvic_csv_nm_bytes",
+        "alvic_download_names",
     ]:
         st.session_state.pop(key, None)
     st.session_state["alvic_done"] = False
 
 
-def _to_alvic_csv_bytes(df: pd.DataFrame) -> bytes:
-    export_df = df.copy()
-    for col in ["alargo", "aancho", "agrueso"]:
-        if col in export_df.columns:
-            export_df[col] = pd.to_numeric(
-                export_df[col].astype(str).str.strip().str.replace(",", ".", regex=False),
-                errors="coerce",
-            )
-    csv_buffer = io.BytesIO()
-    export_df.to_csv(
-        csv_buffer,
-        index=False,
-        sep="|",
-        decimal=",",
-        float_format="%.3f",
-        lineterminator="\n",
-        encoding="utf-8-sig",
-        quoting=csv.QUOTE_NONE,
-        escapechar="\\",
-    )
-    return csv_buffer.getvalue()
+if input_mode == "Lote (varios proyectos)":
+    st.subheader("Traducción por lotes")
+    st.caption("Traduce varios proyectos a la vez (CSVs y/o pestañas de Google Sheets) y descarga un ZIP.")
 
+    batch_tabs = []
+    try:
+        sheets_index = build_sheet_index(SOURCES)
+    except RuntimeError as exc:
+        st.warning(f"Google Sheets no disponible: {exc}")
+        sheets_index = None
+
+    if sheets_index is not None and not sheets_index.empty:
+        tab_options = {
+            f"{row.sheet_title} — {row.source_name}": SheetTabRef(str(row.spreadsheet_id), str(row.sheet_title))
+            for row in sheets_index.sort_values(["source_name", "sheet_title"]).itertuples()
+        }
+        selected_tabs = st.multiselect("Pestañas de proyecto", options=list(tab_options.keys()))
+        batch_tabs = [tab_options[label] for label in selected_tabs]
+
+    batch_inputs = [(f.name, f.getvalue()) for f in (batch_uploads or [])] + batch_tabs
+    st.caption(f"Proyectos en el lote: {len(batch_inputs)}")
+
+    if st.button("✂️ Traducir lote", type="primary", disabled=not batch_inputs):
+        if not os.path.exists(db_path):
+            st.error(f"No existe el archivo de base ALVIC en: {db_path}")
+            st.stop()
+        with st.spinner(f"Traduciendo {len(batch_inputs)} proyectos…"):
+            st.session_state["alvic_batch"] = translate_batch(batch_inputs, db_path)
+
+    batch = st.session_state.get("alvic_batch")
+    if batch is not None:
+        b1, b2, b3, b4, b5 = st.columns(5)
+        b1.metric("Proyectos OK", batch.summary["projects_ok"])
+        b2.metric("Con error", batch.summary["projects_failed"])
+        b3.metric("Total MEC", batch.summary.get("total_mec", 0))
+        b4.metric("Total SIN MEC", batch.summary.get("total_sin_mec", 0))
+        b5.metric("Total NO_MATCH", batch.summary.get("total_no_match", 0))
+
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Proyecto": p.name,
+                        "Estado": "OK" if p.ok else "ERROR",
+                        "MEC": p.result.summary["total_mec"] if p.ok else None,
+                        "SIN MEC": p.result.summary["total_sin_mec"] if p.ok else None,
+                        "NO_MATCH": p.result.summary["total_no_match"] if p.ok else None,
+                        "Error": p.error,
+                    }
+                    for p in batch.projects
+                ]
+            ),
+            use_container_width=True,
+        )
+        if batch.failed:
+            st.warning(f"{len(batch.failed)} proyecto(s) no se pudieron traducir; el resto del lote es válido.")
+        st.download_button(
+            "⬇️ Descargar ZIP del lote",
+            batch.zip_bytes,
+            file_name="alvic_lote.zip",
+            mime="application/zip",
+        )
+    st.stop()
 
-tmp_in = "input_cubro.csv"
 df = st.session_state.get("input_df")
 input_filename = st.session_state.get("input_filename", "input_cubro.csv")
 
@@ -188,10 +297,7 @@ if input_mode == "CSV (manual)":
         _clear_alvic_results()
         st.session_state["alvic_input_sig"] = input_sig
 
-    with open(tmp_in, "wb") as f:
-        f.write(uploaded.getbuffer())
-
-    df = load_input_csv(tmp_in)
+    df = load_input_csv(io.BytesIO(uploaded.getvalue()))
     st.session_state["input_df"] = df
     st.session_state["input_filename"] = uploaded.name
     input_filename = uploaded.name
@@ -255,7 +361,6 @@ if df is None or df.empty:
     st.info("Carga un CSV o una pestaña de Google Sheets para continuar.")
     st.stop()
 
-df.to_csv(tmp_in, index=False)
 st.subheader("Preview input")
 st.dataframe(df.head(50), use_container_width=True, height=320)
 st.caption(f"Filas: {len(df)} | Columnas: {len(df.columns)}")
@@ -273,34 +378,39 @@ if run_translate:
         st.error(f"No existe el archivo de base ALVIC en: {db_path}")
         st.stop()
 
-    out_m = "output_mecanizadas.csv"
-    out_nm = "output_sin_mecanizar.csv"
-
-    try:
-        machined_df, non_machined_df, summary, no_match_df, diag_df = translate_and_split(
-            tmp_in,
-            db_path,
-            out_m,
-            out_nm,
-            input_filename=input_filename,
-        )
-    except TypeError as exc:
-        if "unexpected keyword argument 'input_filename'" not in str(exc):
-            raise
-        machined_df, non_machined_df, summary, no_match_df, diag_df = translate_and_split(
-            tmp_in,
-            db_path,
-            out_m,
-            out_nm,
-        )
+    if input_mode == "CSV (manual)":
+        input_norm = df
+    else:
+        try:
+            input_norm = load_input_gsheet(df.astype(object).where(df.notna(), None).values.tolist())
+        except ValueError as exc:
+            st.error(str(exc))
+            st.stop()
+
+    # Diagnóstico de la última traducción de este mismo proyecto: solo se
+    # re-traducen las filas añadidas o editadas desde entonces.
+    prev_key = (input_mode, input_filename)
+    prev_run = st.session_state.get("alvic_prev_diag")
+    previous_diag = prev_run[1] if prev_run and prev_run[0] == prev_key else None
+
+    result = translate_dataframe(
+        input_norm,
+        _get_alvic_catalog(db_path, source_fingerprint(db_path)),
+        input_filename=input_filename,
+        previous_diag=previous_diag,
+        profile=True,
+    )
+    st.session_state["alvic_prev_diag"] = (prev_key, result.diag)
+    machined_df, non_machined_df, summary, no_match_df, diag_df = result.as_tuple()
     # Persistencia en session_state para evitar perder resultados tras downloads.
     st.session_state["alvic_out_m"] = machined_df
     st.session_state["alvic_out_nm"] = non_machined_df
     st.session_state["alvic_summary"] = summary
     st.session_state["alvic_no_match"] = no_match_df
     st.session_state["alvic_diag"] = diag_df
-    st.session_state["alvic_csv_m_bytes"] = _to_alvic_csv_bytes(machined_df)
-    st.session_state["alvic_csv_nm_bytes"] = _to_alvic_csv_bytes(non_machined_df)
+    st.session_state["alvic_csv_m_bytes"] = result.machined_csv
+    st.session_state["alvic_csv_nm_bytes"] = result.non_machined_csv
+    st.session_state["alvic_download_names"] = alvic_download_names(result, df, input_filename)
     st.session_state["alvic_done"] = True
 
 if st.session_state.get("alvic_done"):
@@ -341,43 +451,7 @@ if st.session_state.get("alvic_done"):
                 height=min(280, 60 + 36 * len(display_warn)),
             )
 
-    project_id = ""
-    for id_col in ["ID de Proyecto", "ProjectID"]:
-        if id_col in df.columns:
-            series = df[id_col].dropna()
-            if not series.empty:
-                project_id = str(series.iloc[0]).strip()
-                break
-
-    project_id = project_id.replace("/", "-").replace("\\", "-")
-    input_base_name = input_filename
-    if input_base_name.lower().endswith(".csv"):
-        input_base_name = input_base_name[:-4]
-    filename_suffix = ""
-    if "_" in input_base_name:
-        _, filename_suffix = input_base_name.split("_", 1)
-
-    ref_base = f"{project_id}_{filename_suffix}" if filename_suffix else project_id
-
-    mec_ref = ""
-    mec_out = st.session_state.get("alvic_out_m")
-    if mec_out is not None and not mec_out.empty and "referencia" in mec_out.columns:
-        mec_ref = str(mec_out.iloc[0]["referencia"]).strip()
-    if not mec_ref:
-        mec_ref = build_mec_reference(ref_base)
-
-    non_mec_ref = ""
-    non_mec_out = st.session_state.get("alvic_out_nm")
-    if non_mec_out is not None and not non_mec_out.empty and "referencia" in non_mec_out.columns:
-        non_mec_ref = str(non_mec_out.iloc[0]["referencia"]).strip()
-    if not non_mec_ref:
-        non_mec_ref = build_non_mec_reference_from_mec(mec_ref)
-
-    mec_download_name = f"{mec_ref}.csv" if mec_ref else "MEC.csv"
-    non_mec_download_name = f"{non_mec_ref}.csv" if non_mec_ref else "sin_mecanizar.csv"
-
-    mec_download_name = sanitize_no_spaces(mec_download_name)
-    non_mec_download_name = sanitize_no_spaces(non_mec_download_name)
+    mec_download_name, non_mec_download_name = st.session_state["alvic_download_names"]
 
     st.subheader("Resumen")
     summary = st.session_state["alvic_summary"]
@@ -388,6 +462,12 @@ if st.session_state.get("alvic_done"):
     s4.metric("Total NO_MATCH", summary["total_no_match"])
     s5.metric("Total BAD_DIMS", summary["total_bad_dims"])
     s6.metric("Subidas a 250 mm", summary.get("total_raised_to_min_long", 0))
+    cache_hits = summary.get("match_cache_hits", 0)
+    cache_lookups = cache_hits + summary.get("match_cache_misses", 0)
+    if summary.get("rows_reused"):
+        st.caption(f"Filas sin cambios reutilizadas de la traducción anterior: {summary['rows_reused']}")
+    if cache_lookups:
+        st.caption(f"Matches reutilizados (memo): {cache_hits}/{cache_lookups} ({cache_hits / cache_lookups:.0%})")
 
     c1, c2 = st.columns(2)
     with c1:
@@ -427,6 +507,7 @@ if st.session_state.get("alvic_done"):
         "Es_Mecanizada",
         "Mec_reason",
         "Match_type",
+        "Modelo_ALVIC",
         "Codigo_ALVIC",
         "Long_Axis_Raised",
         "Original_Long_Axis_mm",
@@ -434,3 +515,20 @@ if st.session_state.get("alvic_done"):
     ]
     diag_cols = [c for c in diag_cols if c in diag_df.columns]
     st.dataframe(diag_df[diag_cols], use_container_width=True, height=360)
+
+    perf = summary.get("perf")
+    if perf:
+        with st.expander("⏱️ Rendimiento por etapa", expanded=False):
+            perf_df = pd.DataFrame(
+                [
+                    {"Etapa": name, "ms": round(stage["seconds"] * 1000, 1), "Filas": stage["rows"]}
+                    for name, stage in perf["stages"].items()
+                ]
+            )
+            st.dataframe(perf_df, use_container_width=True, hide_index=True)
+            lookups = perf["lookups"]
+            st.caption(
+                f"Total {perf['total_seconds'] * 1000:.0f} ms · motor {perf['engine']} · "
+                f"{lookups['rows_looked_up']} piezas buscadas, {lookups['catalog_queries']} consultas al catálogo "
+                f"(memo {lookups['memo_hit_rate']:.0%}) · memo {lookups['memo_size']}/{lookups['memo_max_size']}"
+            )
@@ -28,59 +28,50 @@ st.markdown("---")
 # =================================================
 
 import io
-import csv
-import zipfile
-import unicodedata
-from dataclasses import dataclass
 from typing import List, Dict, Tuple
 
 import pandas as pd
 import streamlit as st
 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-
 # Google Drive
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 
+from lib.nesting import (
+    DEFAULT_LEFTOVER_MIN,
+    DEFAULT_PORTFOLIO,
+    BytesUploadedFile,
+    NestingResult,
+    Offcut,
+    batch_content_hash,
+    batch_savings,
+    csv_content_hash,
+    download_many,
+    load_pieces_batch,
+    load_pieces_v5,
+    nest_pieces,
+)
+from lib.nesting.leftovers import leftover_sheet_rows
+from lib.nesting.offcuts import mark_offcuts_used, offcuts_from_df
+from lib.nesting.search import SearchProgress
+from lib.nesting.vector import build_vector_zip
+from lib.nesting.render import THUMBNAIL_DPI, build_layouts_zip, render_board_cached, typology_color_map
 from ui_theme import apply_shared_sidebar
+from utils.retales_sheet import (
+    append_retales_rows,
+    get_gspread_client,
+    open_retales_worksheet,
+    read_retales_sheet_cached,
+    update_sheet_from_df,
+    worksheet_to_df,
+)
 
 # =========================================================
 # CUBRO - Quick Nesting v5 (Drive dropdown + manual upload)
 # =========================================================
 APP_TITLE = "CUBRO - Quick Nesting v5"
 LAST_UPDATED = "08/02/2026 17:15"
-GAP_BETWEEN = 8  # mm separación obligatoria entre piezas
-EDGE_MARGIN = 7   # mm separación obligatoria a borde de tablero (mínimo)
-
-BOARD_RULES = {
-    "wood": {"board_w": 1250, "board_h": 3050, "rotate": False},
-    "laminado": {"board_w": 1300, "board_h": 3050, "rotate": True},
-    "linoleo": {"board_w": 1300, "board_h": 3050, "rotate": True},
-    "laca": {"board_w": 1220, "board_h": 2750, "rotate": True},
-}
-
-GAMA_SYNONYMS = {
-    "lac": "laca",
-    "woo": "wood",
-    "lin": "linoleo",
-    "lam": "laminado",
-    "laca": "laca",
-    "wood": "wood",
-    "madera": "wood",
-    "linoleo": "linoleo",
-    "linóleo": "linoleo",
-    "laminado": "laminado",
-}
-
-GAMA_DISPLAY = {
-    "laca": "Laca",
-    "wood": "Wood",
-    "linoleo": "Linóleo",
-    "laminado": "Laminado",
-}
 
 PREVIEW_WIDTH_PRESETS = {
     "XS (muy pequeño)": 220,
@@ -89,7 +80,6 @@ PREVIEW_WIDTH_PRESETS = {
 }
 DEFAULT_PREVIEW_PRESET = "S (pequeño)"
 
-
 # =========================================================
 # Drive helpers
 # =========================================================
@@ -148,57 +138,17 @@ def download_drive_file_as_bytes(file_id: str) -> bytes:
     return fh.getvalue()
 
 
-class BytesUploadedFile:
-    def __init__(self, data: bytes, name: str = "drive.csv"):
-        self._data = data
-        self.name = name
-
-    def getvalue(self):
-        return self._data
-
-
-# =========================================================
-# Normalización
-# =========================================================
-def _norm_text(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    return s
-
-
-def normalize_gama(gama: str) -> str:
-    g = _norm_text(gama)
-    return GAMA_SYNONYMS.get(g, g)
-
-
-def normalize_acabado(acabado: str) -> str:
-    return _norm_text(acabado)
-
-
-def normalize_material(material: str) -> str:
-    m = _norm_text(material).upper()
-    if m in ["MDF", "PLY"]:
-        return m
-    return m if m else "—"
-
-
-def get_board_rule(gama_norm: str, acabado_norm: str):
-    g = (gama_norm or "").strip().lower()
-    a = (acabado_norm or "").strip().lower()
-
-    if g not in BOARD_RULES:
-        return None
-
-    rule = BOARD_RULES[g].copy()
-
-    # Excepción: Laminado + Metal => 1220x3050 (rotación sí)
-    if g == "laminado" and a == "metal":
-        rule["board_w"] = 1220
-        rule["board_h"] = 3050
-        rule["rotate"] = True
 
-    return rule
+def load_offcut_stock() -> Tuple[str, Tuple[Offcut, ...], pd.DataFrame]:
+    """Retales disponibles del Sheet de "Stock de retales": (huella, retales, DataFrame del stock)."""
+    gdrive_cfg = dict(st.secrets.get("gdrive", {}))
+    sheet_id = gdrive_cfg.get("retales_sheet_id", "")
+    gid = int(gdrive_cfg.get("retales_gid", "0") or 0)
+    if not sheet_id or not gid:
+        raise ValueError("Falta configurar [gdrive].retales_sheet_id / retales_gid en Secrets.")
+    _, _, raw_values = read_retales_sheet_cached(sheet_id, gid)
+    stock_df = worksheet_to_df(raw_values)
+    return csv_content_hash(repr(raw_values).encode("utf-8")), tuple(offcuts_from_df(stock_df)), stock_df
 
 
 def auto_preview_cols(preview_width_px: int) -> int:
@@ -209,314 +159,114 @@ def auto_preview_cols(preview_width_px: int) -> int:
     return 4
 
 
-# =========================================================
-# CSV robusto
-# =========================================================
-def read_csv_robust(uploaded_file) -> pd.DataFrame:
-    raw = uploaded_file.getvalue()
-    if raw is None or len(raw) == 0:
-        raise ValueError("El archivo está vacío (0 bytes).")
-
-    text = None
-    for enc in ["utf-8-sig", "utf-8", "latin-1"]:
-        try:
-            text = raw.decode(enc)
-            break
-        except Exception:
-            pass
-    if text is None:
-        raise ValueError("No pude decodificar el archivo. Prueba guardarlo como CSV UTF-8.")
-
-    lines = [ln for ln in text.splitlines() if ln.strip() != ""]
-    if not lines:
-        raise ValueError("El archivo solo contiene líneas vacías.")
-
-    sample = "\n".join(lines[:60])
-
-    sep_candidates = []
-    try:
-        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
-        sep_candidates.append(dialect.delimiter)
-    except Exception:
-        pass
-    for s in [";", ",", "\t"]:
-        if s not in sep_candidates:
-            sep_candidates.append(s)
-
-    last_err = None
-    for sep in sep_candidates:
-        try:
-            df = pd.read_csv(
-                io.StringIO("\n".join(lines)),
-                sep=sep,
-                dtype=str,
-                engine="python",
-                keep_default_na=False,
-            )
-            if df.shape[1] <= 1:
-                continue
-            return df
-        except Exception as e:
-            last_err = e
-
-    raise ValueError(f"No pude interpretar el CSV con separadores ; , o tab. Error: {last_err}")
-
+def loaded_csv_files() -> Tuple[Tuple[str, bytes], ...]:
+    """CSV cargados como `(nombre, bytes)`: el lote de Drive si lo hay, si no el CSV único."""
+    batch = st.session_state.get("csv_batch")
+    if batch:
+        return tuple(batch)
+    if st.session_state["csv_bytes"] is None:
+        return ()
+    return ((st.session_state["csv_name"] or "data.csv", st.session_state["csv_bytes"]),)
 
-def to_float_mm(x):
-    x = str(x).strip().replace(",", ".")
-    try:
-        return float(x)
-    except Exception:
-        return None
-
-
-def load_pieces_v5(uploaded_file) -> pd.DataFrame:
-    df = read_csv_robust(uploaded_file)
-
-    if df.shape[1] < 9:
-        raise ValueError(f"El CSV tiene {df.shape[1]} columnas. Se esperan al menos 9 (A..I).")
-
-    out = pd.DataFrame(
-        {
-            "ProjectID": df.iloc[:, 0],
-            "PieceID": df.iloc[:, 2] if df.shape[1] > 2 else "",
-            "Typology": df.iloc[:, 3] if df.shape[1] > 3 else "",
-            "W": df.iloc[:, 4] if df.shape[1] > 4 else "",
-            "H": df.iloc[:, 5] if df.shape[1] > 5 else "",
-            "Material": df.iloc[:, 6] if df.shape[1] > 6 else "",
-            "Gama": df.iloc[:, 7] if df.shape[1] > 7 else "",
-            "Acabado": df.iloc[:, 8] if df.shape[1] > 8 else "",
-            "Machining": df.iloc[:, 9] if df.shape[1] > 9 else "",
-            "HandleModel": df.iloc[:, 10] if df.shape[1] > 10 else "",
-            "HandlePos": df.iloc[:, 11] if df.shape[1] > 11 else "",
-            "DoorOpen": df.iloc[:, 12] if df.shape[1] > 12 else "",
-            "HandleFinish": df.iloc[:, 13] if df.shape[1] > 13 else "",
-        }
-    )
-
-    out["W"] = out["W"].map(to_float_mm)
-    out["H"] = out["H"].map(to_float_mm)
 
-    out = out.dropna(subset=["ProjectID", "PieceID", "Typology", "Material", "Gama", "Acabado", "W", "H"])
-    out = out[(out["W"] > 0) & (out["H"] > 0)]
-
-    out["Material_norm"] = out["Material"].map(normalize_material)
-    out["Gama_norm"] = out["Gama"].map(normalize_gama)
-    out["Acabado_norm"] = out["Acabado"].map(normalize_acabado)
-
-    return out
+def load_csv_files(csv_files: Tuple[Tuple[str, bytes], ...]) -> pd.DataFrame:
+    if len(csv_files) == 1:
+        name, data = csv_files[0]
+        return load_pieces_v5(BytesUploadedFile(data, name=name))
+    return load_pieces_batch(csv_files)
 
 
 # =========================================================
-# Nesting (guillotine)
+# Nesting (cacheado por contenido del CSV)
 # =========================================================
-@dataclass
-class FreeRect:
-    x: float
-    y: float
-    w: float
-    h: float
-
-
-@dataclass
-class PlacedPiece:
-    piece_id: str
-    typology: str
-    x: float
-    y: float
-    w: float
-    h: float
-    rotated: bool
-
-
-@dataclass
-class PieceItem:
-    piece_id: str
-    typology: str
-    w: float
-    h: float
-
-
-def rect_contains(a: FreeRect, b: FreeRect) -> bool:
-    return (b.x >= a.x and b.y >= a.y and (b.x + b.w) <= (a.x + a.w) and (b.y + b.h) <= (a.y + a.h))
-
-
-def prune_free_rects(frees: List[FreeRect]) -> List[FreeRect]:
-    pruned = []
-    for i, r in enumerate(frees):
-        contained = False
-        for j, s in enumerate(frees):
-            if i == j:
-                continue
-            if rect_contains(s, r):
-                contained = True
-                break
-        if not contained:
-            pruned.append(r)
-    return pruned
-
-
-def split_free_rect(fr: FreeRect, placed: FreeRect) -> List[FreeRect]:
-    res = []
-    rw = fr.w - placed.w
-    rh = placed.h
-    if rw > 0 and rh > 0:
-        res.append(FreeRect(fr.x + placed.w, fr.y, rw, rh))
-    uw = fr.w
-    uh = fr.h - placed.h
-    if uw > 0 and uh > 0:
-        res.append(FreeRect(fr.x, fr.y + placed.h, uw, uh))
-    return res
-
-
-def pack_group_with_positions(
-    items: List[PieceItem],
-    usable_w: float,
-    usable_h: float,
-    allow_rotate: bool,
-) -> Tuple[List[List[PlacedPiece]], List[PieceItem]]:
-    unplaced: List[PieceItem] = []
-    work: List[PieceItem] = []
-
-    for it in items:
-        w_eff = it.w + GAP_BETWEEN
-        h_eff = it.h + GAP_BETWEEN
-        fits = (w_eff <= usable_w and h_eff <= usable_h) or (allow_rotate and h_eff <= usable_w and w_eff <= usable_h)
-        if not fits:
-            unplaced.append(it)
-        else:
-            work.append(it)
-
-    work.sort(key=lambda p: (max(p.w, p.h), p.w * p.h), reverse=True)
-    boards: List[List[PlacedPiece]] = []
-
-    while work:
-        frees = [FreeRect(0, 0, usable_w, usable_h)]
-        placed_this_board: List[PlacedPiece] = []
-        remaining: List[PieceItem] = []
-
-        for it in work:
-            best = None  # (score, free_index, ww_eff, hh_eff, rotated, ww_nom, hh_nom)
-            for fi, fr in enumerate(frees):
-                ww_eff = it.w + GAP_BETWEEN
-                hh_eff = it.h + GAP_BETWEEN
-                if ww_eff <= fr.w and hh_eff <= fr.h:
-                    score = (fr.w - ww_eff) + (fr.h - hh_eff)
-                    cand = (score, fi, ww_eff, hh_eff, False, it.w, it.h)
-                    if best is None or cand < best:
-                        best = cand
-
-                if allow_rotate:
-                    ww_eff_r = it.h + GAP_BETWEEN
-                    hh_eff_r = it.w + GAP_BETWEEN
-                    if ww_eff_r <= fr.w and hh_eff_r <= fr.h:
-                        score = (fr.w - ww_eff_r) + (fr.h - hh_eff_r)
-                        cand = (score, fi, ww_eff_r, hh_eff_r, True, it.h, it.w)
-                        if best is None or cand < best:
-                            best = cand
-
-            if best is None:
-                remaining.append(it)
-                continue
-
-            _, fi, ww_eff, hh_eff, rotated, ww_nom, hh_nom = best
-            fr = frees.pop(fi)
-
-            placed_eff = FreeRect(fr.x, fr.y, ww_eff, hh_eff)
-            frees.extend(split_free_rect(fr, placed_eff))
-            frees = prune_free_rects(frees)
-
-            placed_this_board.append(
-                PlacedPiece(
-                    piece_id=str(it.piece_id),
-                    typology=str(it.typology),
-                    x=placed_eff.x,
-                    y=placed_eff.y,
-                    w=ww_nom,
-                    h=hh_nom,
-                    rotated=rotated,
-                )
-            )
+@st.cache_data(show_spinner=False, max_entries=16)
+def run_nesting(
+    csv_hash: str,
+    _csv_files: Tuple[Tuple[str, bytes], ...],
+    optimize: bool = False,
+    offcuts_key: str = "",
+    _offcuts: Tuple[Offcut, ...] = (),
+    leftover_min: Tuple[float, float] = DEFAULT_LEFTOVER_MIN,
+) -> Tuple[pd.DataFrame, NestingResult]:
+    # `csv_hash` / `offcuts_key` son la clave de caché; los bytes no se vuelven a hashear en cada rerun.
+    # Con varios CSV (lote) las piezas de todos se nestean juntas por grupo.
+    pieces = load_csv_files(_csv_files)
+
+    # Los grupos se empaquetan en paralelo; se informa de cada uno según termina.
+    # (El placeholder se crea aquí dentro para que st.cache_data pueda reproducirlo.)
+    done_groups = st.empty()
+    finished: List[str] = []
+
+    def on_group(layout) -> None:
+        finished.append(layout.group_name)
+        done_groups.caption(f"Grupos listos: {len(finished)} · último: {layout.group_name} ({layout.boards_count} tableros)")
+
+    nesting = nest_pieces(
+        pieces,
+        portfolio=DEFAULT_PORTFOLIO if optimize else None,
+        on_group=on_group,
+        offcuts=_offcuts or None,
+        leftover_min=leftover_min,
+    )
+    done_groups.empty()
+    return pieces, nesting
 
-        boards.append(placed_this_board)
-        work = remaining
-
-    return boards, unplaced
-
-
-def typology_color_map(typologies: List[str]) -> Dict[str, Tuple[float, float, float, float]]:
-    uniq = sorted({str(t) for t in typologies})
-    cmap = plt.get_cmap("tab20")
-    return {t: cmap(i % 20) for i, t in enumerate(uniq)}
-
-
-def render_board_png(
-    board_w: int,
-    board_h: int,
-    usable_w: float,
-    usable_h: float,
-    pieces: List[PlacedPiece],
-    title: str,
-    color_by_typology: Dict[str, Tuple[float, float, float, float]],
-    legend_max_items: int = 30,
-) -> bytes:
-    fig_w = 12
-    fig_h = max(6, 10 * (board_h / board_w) * 0.35)
-
-    fig, ax = plt.subplots(figsize=(fig_w, fig_h))
-    fig.subplots_adjust(right=0.78)
-
-    ax.add_patch(Rectangle((0, 0), board_w, board_h, fill=False, linewidth=2))
-    ax.add_patch(Rectangle((EDGE_MARGIN, EDGE_MARGIN), usable_w, usable_h, fill=False, linestyle="--", linewidth=1))
-
-    for p in pieces:
-        x = EDGE_MARGIN + p.x
-        y = EDGE_MARGIN + p.y
-        col = color_by_typology.get(str(p.typology), (0.7, 0.7, 0.7, 1.0))
-
-        ax.add_patch(Rectangle((x, y), p.w, p.h, facecolor=col, edgecolor="black", linewidth=0.6, alpha=0.9))
-        ax.text(x + p.w / 2, y + p.h / 2, str(p.piece_id), ha="center", va="center", fontsize=6, color="black")
-
-    ax.set_title(title, fontsize=12)
-    ax.set_xlim(0, board_w)
-    ax.set_ylim(0, board_h)
-    ax.set_aspect("equal", adjustable="box")
-    ax.invert_yaxis()
-    ax.axis("off")
-
-    present_typologies = sorted({str(p.typology) for p in pieces})
-    legend_items = present_typologies[:legend_max_items]
-    if legend_items:
-        handles = [
-            Rectangle((0, 0), 1, 1, facecolor=color_by_typology.get(t, (0.7, 0.7, 0.7, 1.0)), edgecolor="black")
-            for t in legend_items
-        ]
-        ax.legend(
-            handles,
-            legend_items,
-            loc="center left",
-            bbox_to_anchor=(1.01, 0.5),
-            borderaxespad=0.0,
-            frameon=False,
-            fontsize=7,
-            ncol=1,
-        )
 
-        if len(present_typologies) > legend_max_items:
-            ax.text(
-                1.01,
-                0.02,
-                f"+{len(present_typologies) - legend_max_items} tipologías más",
-                transform=ax.transAxes,
-                fontsize=7,
-                ha="left",
-                va="bottom",
-            )
+def group_expander(label: str, key: str):
+    """Expander de un grupo y si está abierto (solo entonces se renderizan sus tableros).
+
+    Con Streamlit sin estado de expander se pide abrirlo con una casilla explícita.
+    """
+    try:
+        exp = st.expander(label, expanded=False, key=key, on_change="rerun")
+        return exp, bool(exp.open)
+    except TypeError:
+        exp = st.expander(label, expanded=False)
+        return exp, exp.toggle("Mostrar tableros", key=key)
+
+
+def run_nesting_search(
+    csv_hash: str,
+    csv_files: Tuple[Tuple[str, bytes], ...],
+    optimize: bool,
+    seconds: int,
+    offcuts_key: str = "",
+    offcuts: Tuple[Offcut, ...] = (),
+    leftover_min: Tuple[float, float] = DEFAULT_LEFTOVER_MIN,
+) -> Tuple[pd.DataFrame, NestingResult]:
+    """Nesting con búsqueda local de `seconds` segundos, mostrando el avance en vivo.
+
+    No usa st.cache_data (necesita pintar progreso); el resultado se guarda en
+    session_state para que los reruns no repitan la búsqueda.
+    """
+    key = (csv_hash, optimize, seconds, offcuts_key, leftover_min)
+    cached = st.session_state.get("nesting_search")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    pieces = load_csv_files(csv_files)
+    bar = st.progress(0.0, text="Optimizando layouts...")
+    status = st.empty()
+
+    def on_progress(group: str, p: SearchProgress) -> None:
+        bar.progress(min(1.0, p.elapsed / seconds), text=f"Optimizando {group}...")
+        status.caption(
+            f"{group}: {p.boards} tableros (cota inferior {p.lower_bound}) · "
+            f"aprovechamiento {p.utilization * 100:.1f}% · {p.iterations} iteraciones"
+        )
 
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", dpi=200, bbox_inches="tight")
-    plt.close(fig)
-    return buf.getvalue()
+    nesting = nest_pieces(
+        pieces,
+        portfolio=DEFAULT_PORTFOLIO if optimize else None,
+        search_seconds=float(seconds),
+        on_progress=on_progress,
+        offcuts=offcuts or None,
+        leftover_min=leftover_min,
+    )
+    bar.empty()
+    status.empty()
+    st.session_state["nesting_search"] = (key, (pieces, nesting))
+    return pieces, nesting
 
 
 # =========================================================
@@ -528,6 +278,8 @@ if "csv_bytes" not in st.session_state:
     st.session_state["csv_bytes"] = None
 if "csv_name" not in st.session_state:
     st.session_state["csv_name"] = None
+if "csv_batch" not in st.session_state:
+    st.session_state["csv_batch"] = None
 
 st.markdown(
     """
@@ -573,8 +325,28 @@ if source == "Google Drive (carpeta)":
         f'{f["name"]}  —  {str(f.get("modifiedTime",""))[:10]}': (f["id"], f["name"])
         for f in files
     }
-    chosen_label = st.sidebar.selectbox("Selecciona un CSV de Drive", list(options.keys()))
-    chosen_id, chosen_name = options[chosen_label]
+    drive_mode = st.sidebar.radio(
+        "Modo",
+        ["Un CSV", "Lote (varios CSV)"],
+        horizontal=True,
+        help="Lote: nestea juntos los proyectos de varios CSV (p.ej. una semana de corte) por Material + Gama + Acabado.",
+        key="drive_mode",
+    )
+
+    if drive_mode == "Un CSV":
+        chosen_label = st.sidebar.selectbox("Selecciona un CSV de Drive", list(options.keys()))
+        chosen_id, chosen_name = options[chosen_label]
+    else:
+        name_filter = st.sidebar.text_input(
+            "Seleccionar por nombre (p.ej. semana)", value="", key="drive_batch_filter"
+        ).strip().lower()
+        matching = [label for label, (_fid, name) in options.items() if name_filter and name_filter in name.lower()]
+        chosen_labels = st.sidebar.multiselect(
+            "CSV del lote",
+            list(options.keys()),
+            default=matching,
+            key=f"drive_batch_files_{name_filter}",
+        )
 
     b1, b2 = st.sidebar.columns(2)
     with b1:
@@ -582,12 +354,22 @@ if source == "Google Drive (carpeta)":
             list_csv_files_in_folder.clear()
             st.rerun()
     with b2:
-        if st.button("Cargar CSV"):
-            with st.spinner("Descargando CSV desde Drive..."):
-                data = download_drive_file_as_bytes(chosen_id)
-                st.session_state["csv_bytes"] = data
-                st.session_state["csv_name"] = chosen_name
-            st.sidebar.success(f"Cargado: {chosen_name}")
+        if drive_mode == "Un CSV":
+            if st.button("Cargar CSV"):
+                with st.spinner("Descargando CSV desde Drive..."):
+                    data = download_drive_file_as_bytes(chosen_id)
+                    st.session_state["csv_bytes"] = data
+                    st.session_state["csv_name"] = chosen_name
+                    st.session_state["csv_batch"] = None
+                st.sidebar.success(f"Cargado: {chosen_name}")
+        elif st.button("Cargar lote", disabled=not chosen_labels):
+            chosen = [options[label] for label in chosen_labels]
+            with st.spinner(f"Descargando {len(chosen)} CSV desde Drive..."):
+                datas = download_many([fid for fid, _name in chosen], download_drive_file_as_bytes)
+            st.session_state["csv_batch"] = [(name, data) for (_fid, name), data in zip(chosen, datas)]
+            st.session_state["csv_bytes"] = None
+            st.session_state["csv_name"] = None
+            st.sidebar.success(f"Lote cargado: {len(chosen)} CSV")
 
 else:
     up = st.sidebar.file_uploader("Subir CSV", type=["csv"])
@@ -595,6 +377,7 @@ else:
         # Persistir bytes en session_state para que no se pierda en reruns
         st.session_state["csv_bytes"] = up.getvalue()
         st.session_state["csv_name"] = getattr(up, "name", "upload.csv")
+        st.session_state["csv_batch"] = None
         st.sidebar.success(f"Cargado: {st.session_state['csv_name']}")
 
 st.sidebar.subheader("Opciones de visualización")
@@ -613,19 +396,69 @@ preview_max_boards_per_group = st.sidebar.number_input(
     key="sidebar_preview_max_boards",
 )
 
+st.sidebar.subheader("Nesting")
+optimize_nesting = st.sidebar.checkbox(
+    "Modo optimizador (varias heurísticas)",
+    value=False,
+    help=f"Prueba {len(DEFAULT_PORTFOLIO)} heurísticas de orden/encaje por grupo en paralelo y se queda con la de menos tableros.",
+)
+search_seconds = st.sidebar.number_input(
+    "Optimizar N segundos (0 = no)",
+    min_value=0,
+    max_value=600,
+    value=0,
+    step=5,
+    help="Búsqueda local sobre el orden de las piezas: mejora el layout mientras quede tiempo "
+    "y se detiene antes si alcanza la cota inferior de tableros.",
+    key="sidebar_search_seconds",
+)
+use_offcuts = st.sidebar.checkbox(
+    "Usar retales del stock primero",
+    value=False,
+    help="Lee el Sheet de Stock de retales y coloca primero las piezas en los retales disponibles "
+    "del mismo material / gama / acabado (el más pequeño en el que quepan); el resto va a tableros nuevos.",
+    key="sidebar_use_offcuts",
+)
+offcuts_key, offcuts, offcuts_df = "", (), None
+if use_offcuts:
+    try:
+        offcuts_key, offcuts, offcuts_df = load_offcut_stock()
+        st.sidebar.caption(f"{len(offcuts)} retales disponibles en stock.")
+    except Exception as e:
+        st.sidebar.warning(f"No pude leer el stock de retales; se nestea sin retales. Error: {e}")
+
+with st.sidebar.expander("Sobrantes reutilizables", expanded=False):
+    leftover_short = st.number_input(
+        "Lado corto mínimo (mm)", min_value=0, max_value=3000, value=int(DEFAULT_LEFTOVER_MIN[0]), step=50,
+        key="sidebar_leftover_short",
+    )
+    leftover_long = st.number_input(
+        "Lado largo mínimo (mm)", min_value=0, max_value=3000, value=int(DEFAULT_LEFTOVER_MIN[1]), step=50,
+        key="sidebar_leftover_long",
+    )
+leftover_min = (float(leftover_short), float(leftover_long))
+
 with st.sidebar.expander("Notas (para export)", expanded=False):
     nota_titulo = st.text_input("Título / referencia", value="")
     nota_texto = st.text_area("Notas", value="", height=90)
 
-# ---- Usar SIEMPRE el CSV persistido ----
-if st.session_state["csv_bytes"] is None:
+# ---- Usar SIEMPRE el CSV (o lote de CSV) persistido ----
+csv_files = loaded_csv_files()
+if not csv_files:
     st.info("Carga un CSV desde Drive o súbelo manualmente desde el panel lateral.")
     st.stop()
 
-uploaded = BytesUploadedFile(st.session_state["csv_bytes"], name=st.session_state["csv_name"] or "data.csv")
+is_batch = len(csv_files) > 1
+csv_hash = batch_content_hash(csv_files) if is_batch else csv_content_hash(csv_files[0][1])
 
 try:
-    pieces = load_pieces_v5(uploaded)
+    if search_seconds > 0:
+        pieces, nesting = run_nesting_search(
+            csv_hash, csv_files, optimize_nesting, int(search_seconds), offcuts_key, offcuts, leftover_min
+        )
+    else:
+        with st.spinner("Optimizando nesting..." if optimize_nesting else "Calculando nesting..."):
+            pieces, nesting = run_nesting(csv_hash, csv_files, optimize_nesting, offcuts_key, offcuts, leftover_min)
 except Exception as e:
     st.error(str(e))
     st.stop()
@@ -639,37 +472,14 @@ if filtered.empty:
     st.stop()
 
 # ---- Resumen rápido ----
-total_pieces = len(filtered)
-
-boards_total_global = 0
-util_vals = []
-
-for keys, grp in filtered.groupby(["Material_norm", "Gama_norm", "Acabado_norm"], dropna=False):
-    _mat_n, gama_n, acab_n = keys
-    rule = get_board_rule(gama_n, acab_n)
-    if rule is None:
-        continue
-
-    board_w, board_h, allow_rotate = rule["board_w"], rule["board_h"], rule["rotate"]
-    usable_w = board_w - 2 * EDGE_MARGIN
-    usable_h = board_h - 2 * EDGE_MARGIN
-
-    items = [
-        PieceItem(piece_id=str(r["PieceID"]), typology=str(r["Typology"]), w=float(r["W"]), h=float(r["H"]))
-        for _, r in grp.iterrows()
-    ]
-    boards, _ = pack_group_with_positions(items, usable_w, usable_h, allow_rotate)
-    bcount = len(boards)
-    boards_total_global += bcount
-
-    total_nom_area = float((grp["W"] * grp["H"]).sum())
-    usable_area = usable_w * usable_h
-    util = total_nom_area / (bcount * usable_area) if bcount > 0 else 0.0
-    util_vals.append(util)
-
-avg_util = (sum(util_vals) / len(util_vals)) if util_vals else 0.0
+# Todo (métricas, tablas y layouts) sale de una única pasada de nesting por grupo.
+total_pieces = nesting.total_pieces
+boards_total_global = nesting.boards_total
+avg_util = nesting.avg_util
 
 project_display_name = (st.session_state.get("csv_name") or "Proyecto sin nombre")
+if is_batch:
+    project_display_name = f"Lote de {len(csv_files)} CSV ({len(projects)} proyectos)"
 if project_display_name.lower().endswith(".csv"):
     project_display_name = project_display_name[:-4]
 project_display_name = project_display_name.replace("_", " ")
@@ -677,8 +487,105 @@ project_display_name = project_display_name.replace("_", " ")
 m0, m1, m2, m3 = st.columns([1.8, 1, 1, 1])
 m0.metric("Proyecto", project_display_name)
 m1.metric("Piezas", f"{total_pieces}")
-m2.metric("Tableros (est.)", f"{boards_total_global}")
+m2.metric(
+    "Tableros (est.)",
+    f"{boards_total_global}",
+    delta=f"gap {nesting.optimality_gap} (cota ≥ {nesting.lower_bound_total})",
+    delta_color="off",
+    help="Gap = tableros por encima de la cota inferior (área + piezas que no pueden ir lado a lado, "
+    "con rotación, separación y margen). Gap 0 = no se puede hacer con menos tableros.",
+)
 m3.metric("Aprovechamiento medio", f"{avg_util*100:.1f}%")
+
+# ---- Ahorro de nestear los proyectos juntos ----
+if len(projects) > 1:
+    savings = batch_savings(nesting)
+    separate_total = int(savings["Tableros por proyecto"].sum())
+    saved_total = int(savings["Tableros ahorrados"].sum())
+    s0, s1, s2 = st.columns([1.8, 1, 1])
+    s0.metric("Tableros proyecto a proyecto", f"{separate_total}")
+    s1.metric(
+        "Tableros ahorrados",
+        f"{saved_total}",
+        delta=f"{saved_total / separate_total * 100:.1f}%" if separate_total else None,
+        help="Tableros de nestear cada proyecto por separado menos los de nestearlos juntos por Material + Gama + Acabado "
+        "(ambos sin retales).",
+    )
+    if "Tableros cubiertos por retales" in savings.columns:
+        s2.metric("Tableros cubiertos por retales", f"{int(savings['Tableros cubiertos por retales'].sum())}")
+    with st.expander("Ahorro por grupo (proyectos juntos vs por separado)", expanded=False):
+        if is_batch:
+            st.caption("CSV del lote: " + ", ".join(sorted(name for name, _data in csv_files)))
+        st.dataframe(savings, use_container_width=True)
+
+# ---- Retales del stock usados ----
+if nesting.offcuts_used:
+    used_pieces = sum(len(use.pieces) for use in nesting.offcuts_used)
+    with st.expander(f"Retales del stock usados ({len(nesting.offcuts_used)} · {used_pieces} piezas)", expanded=False):
+        st.caption("Estas piezas se cortan de retales; los tableros de arriba son solo los nuevos.")
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Retal": use.offcut.offcut_id,
+                        "Material": use.offcut.material,
+                        "Gama": use.offcut.gama,
+                        "Acabado": use.offcut.acabado,
+                        "Medida (mm)": f"{use.offcut.w:g}×{use.offcut.h:g}",
+                        "Piezas": len(use.pieces),
+                        "PieceIDs": ", ".join(p.piece_id for p in use.pieces),
+                    }
+                    for use in nesting.offcuts_used
+                ]
+            ),
+            use_container_width=True,
+        )
+        if offcuts_df is not None and st.button("Marcar estos retales como utilizados en el stock"):
+            try:
+                ws = open_retales_worksheet(get_gspread_client())
+                update_sheet_from_df(ws, mark_offcuts_used(offcuts_df, nesting.offcuts_used))
+                read_retales_sheet_cached.clear()
+                st.success("Retales marcados como utilizados ✅")
+            except Exception as e:
+                st.error(f"No se pudo actualizar el stock de retales ({type(e).__name__}): {e}")
+
+# ---- Sobrantes reutilizables (candidatos a retal) ----
+leftovers = nesting.leftovers
+if leftovers:
+    with st.expander(f"Sobrantes reutilizables ({len(leftovers)})", expanded=False):
+        st.caption(
+            f"Rectángulos libres de al menos {leftover_min[0]:g}×{leftover_min[1]:g} mm (lado corto × largo) "
+            "que quedan en los tableros, sin solaparse. Añádelos al stock cuando el corte esté confirmado."
+        )
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Grupo": lo.group_name.replace("__", " / "),
+                        "Tablero": lo.board_index,
+                        "X (mm)": f"{lo.x:g}",
+                        "Y (mm)": f"{lo.y:g}",
+                        "Ancho (mm)": f"{lo.w:g}",
+                        "Largo (mm)": f"{lo.h:g}",
+                    }
+                    for lo in leftovers
+                ]
+            ),
+            use_container_width=True,
+        )
+        leftovers_key = (csv_hash, optimize_nesting, int(search_seconds), offcuts_key, leftover_min)
+        if st.session_state.get("leftovers_added") == leftovers_key:
+            st.success("Sobrantes ya añadidos al stock de retales ✅")
+        elif st.button("Añadir al stock de retales"):
+            try:
+                stock_df = offcuts_df if offcuts_df is not None else load_offcut_stock()[2]
+                rows = leftover_sheet_rows(nesting.groups, list(stock_df.columns), id_prefix=f"{project_display_name} ")
+                # Una sola llamada a la API para todo el lote de sobrantes.
+                append_retales_rows(open_retales_worksheet(get_gspread_client()), rows)
+                st.session_state["leftovers_added"] = leftovers_key
+                st.success(f"{len(rows)} sobrantes añadidos al stock de retales ✅")
+            except Exception as e:
+                st.error(f"No se pudo escribir en el stock de retales ({type(e).__name__}): {e}")
 st.divider()
 
 # ---- Vista previa ----
@@ -706,90 +613,8 @@ with st.expander("Vista previa (filtrable)", expanded=False):
     st.dataframe(preview_df[cols_selected].head(250), use_container_width=True)
 
 # ---- Tablas resultados ----
-rows = []
-issues = []
-
-group_cols_project = ["ProjectID", "Material_norm", "Gama_norm", "Acabado_norm", "Material", "Gama", "Acabado"]
-for keys, grp in filtered.groupby(group_cols_project, dropna=False):
-    proj, mat_n, gama_n, acab_n, _mat_raw, gama_raw, acab_raw = keys
-
-    rule = get_board_rule(gama_n, acab_n)
-    if rule is None:
-        issues.append(f"⚠️ Gama desconocida: '{gama_raw}' en proyecto {proj}. No se calcula.")
-        continue
-
-    board_w, board_h, allow_rotate = rule["board_w"], rule["board_h"], rule["rotate"]
-    usable_w = board_w - 2 * EDGE_MARGIN
-    usable_h = board_h - 2 * EDGE_MARGIN
-
-    items = [
-        PieceItem(piece_id=str(r["PieceID"]), typology=str(r["Typology"]), w=float(r["W"]), h=float(r["H"]))
-        for _, r in grp.iterrows()
-    ]
-    boards, unplaced = pack_group_with_positions(items, usable_w, usable_h, allow_rotate)
-
-    if unplaced:
-        issues.append(f"⚠️ {proj} / {mat_n} / {gama_raw} / {acab_raw}: {len(unplaced)} pieza(s) no caben y se omiten del layout.")
-
-    boards_count = len(boards)
-    total_nom_area = float((grp["W"] * grp["H"]).sum())
-    util = total_nom_area / (boards_count * (usable_w * usable_h)) if boards_count > 0 else 0.0
-
-    rows.append(
-        {
-            "ProjectID": proj,
-            "Material": mat_n,
-            "Gama": GAMA_DISPLAY.get(gama_n, str(gama_raw)),
-            "Acabado": str(acab_raw),
-            "Tablero (mm)": f"{board_w}×{board_h}",
-            "Rotar": "Sí" if allow_rotate else "No",
-            "Piezas": len(grp),
-            "Tableros": int(boards_count),
-            "Aprovechamiento est.": f"{util * 100:.1f}%",
-        }
-    )
-
-by_project_df = pd.DataFrame(rows)
-if not by_project_df.empty:
-    by_project_df = by_project_df.sort_values(["ProjectID", "Material", "Gama", "Acabado"]).reset_index(drop=True)
-
-rows2 = []
-group_cols_global = ["Material_norm", "Gama_norm", "Acabado_norm", "Material", "Gama", "Acabado"]
-for keys, grp in filtered.groupby(group_cols_global, dropna=False):
-    mat_n, gama_n, acab_n, _mat_raw, gama_raw, acab_raw = keys
-    rule = get_board_rule(gama_n, acab_n)
-    if rule is None:
-        continue
-
-    board_w, board_h, allow_rotate = rule["board_w"], rule["board_h"], rule["rotate"]
-    usable_w = board_w - 2 * EDGE_MARGIN
-    usable_h = board_h - 2 * EDGE_MARGIN
-
-    items = [
-        PieceItem(piece_id=str(r["PieceID"]), typology=str(r["Typology"]), w=float(r["W"]), h=float(r["H"]))
-        for _, r in grp.iterrows()
-    ]
-    boards, _ = pack_group_with_positions(items, usable_w, usable_h, allow_rotate)
-    boards_count = len(boards)
-
-    total_nom_area = float((grp["W"] * grp["H"]).sum())
-    util = total_nom_area / (boards_count * (usable_w * usable_h)) if boards_count > 0 else 0.0
-
-    rows2.append(
-        {
-            "Material": mat_n,
-            "Gama": GAMA_DISPLAY.get(gama_n, str(gama_raw)),
-            "Acabado": str(acab_raw),
-            "Tablero (mm)": f"{board_w}×{board_h}",
-            "Piezas": len(grp),
-            "Tableros": int(boards_count),
-            "Aprovechamiento est.": f"{util * 100:.1f}%",
-        }
-    )
-
-by_finish_df = pd.DataFrame(rows2)
-if not by_finish_df.empty:
-    by_finish_df = by_finish_df.sort_values(["Material", "Gama", "Acabado"]).reset_index(drop=True)
+by_finish_df = nesting.by_finish
+issues = nesting.issues
 
 with st.expander("Resumen global (material + gama + acabado)", expanded=True):
     st.dataframe(by_finish_df, use_container_width=True)
@@ -817,84 +642,67 @@ st.divider()
 
 # ---- Nesting visual ----
 st.subheader("Nesting visual")
-st.caption("Se generan PNGs por tablero para cada grupo Material + Gama + Acabado (según el filtro de proyectos).")
+st.caption(
+    "Abre un grupo Material + Gama + Acabado para ver sus tableros; "
+    "los PNGs a resolución completa se generan al pedir el ZIP."
+)
 
-colors = typology_color_map(filtered["Typology"].astype(str).tolist())
 preview_width_px = PREVIEW_WIDTH_PRESETS.get(preview_preset, 280)
 cols_n = auto_preview_cols(int(preview_width_px))
 
-preview_images: List[Tuple[str, int, bytes]] = []
-zip_buf = io.BytesIO()
-
-with st.spinner("Generando layouts automáticamente..."):
-    with zipfile.ZipFile(zip_buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for keys, grp in filtered.groupby(
-            ["Material_norm", "Gama_norm", "Acabado_norm", "Material", "Gama", "Acabado"], dropna=False
-        ):
-            mat_n, gama_n, acab_n, _mat_raw, gama_raw, acab_raw = keys
-            rule = get_board_rule(gama_n, acab_n)
-            if rule is None:
-                continue
-
-            board_w, board_h, _allow_rotate = rule["board_w"], rule["board_h"], rule["rotate"]
-            usable_w = board_w - 2 * EDGE_MARGIN
-            usable_h = board_h - 2 * EDGE_MARGIN
-
-            items = [
-                PieceItem(piece_id=str(r["PieceID"]), typology=str(r["Typology"]), w=float(r["W"]), h=float(r["H"]))
-                for _, r in grp.iterrows()
-            ]
-            boards, unplaced = pack_group_with_positions(items, usable_w, usable_h, rule["rotate"])
-
-            gama_disp = GAMA_DISPLAY.get(gama_n, str(gama_raw))
-            group_name = f"{mat_n}__{gama_disp}__{str(acab_raw)}".replace("/", "-").replace("\\", "-").replace(":", "-")
-
-            for bi, placed_list in enumerate(boards, start=1):
-                title = f"{APP_TITLE} | {group_name.replace('__', ' / ')} | Tablero {bi}/{len(boards)}"
-                png_bytes = render_board_png(
-                    board_w=board_w,
-                    board_h=board_h,
-                    usable_w=usable_w,
-                    usable_h=usable_h,
-                    pieces=placed_list,
-                    title=title,
-                    color_by_typology=colors,
-                )
-                zf.writestr(f"{group_name}/TABLERO_{bi:03d}.png", png_bytes)
-
-                if preview_max_boards_per_group == 0 or bi <= int(preview_max_boards_per_group):
-                    preview_images.append((group_name, bi, png_bytes))
-
-            if unplaced:
-                txt = "PIEZAS QUE NO CABEN EN EL TABLERO (omitidas):\n\n"
-                for it in unplaced:
-                    txt += f"- PieceID: {it.piece_id} | Typology: {it.typology} | W:{it.w} | H:{it.h}\n"
-                zf.writestr(f"{group_name}/_PIEZAS_NO_CABEN.txt", txt)
-
-zip_buf.seek(0)
-
-if preview_images:
-    st.markdown("### Previsualización")
-    groups: Dict[str, List[Tuple[int, bytes]]] = {}
-    for g, bi, png in preview_images:
-        groups.setdefault(g, []).append((bi, png))
-
-    for group_name, imgs in groups.items():
-        imgs.sort(key=lambda x: x[0])
-        with st.expander(group_name.replace("__", " / "), expanded=False):
-            cols = st.columns(cols_n)
-            for idx, (bi, pngbytes) in enumerate(imgs):
-                with cols[idx % cols_n]:
-                    st.image(pngbytes, caption=f"Tablero {bi}", width=int(preview_width_px))
-
-st.success("ZIP generado automáticamente al cargar el CSV.")
-st.download_button(
-    "Descargar ZIP de layouts (PNGs)",
-    data=zip_buf.getvalue(),
-    file_name="CUBRO_QuickNesting_v5_layouts.zip",
-    mime="application/zip",
-    use_container_width=True,
-)
+color_by_typology = typology_color_map(pieces["Typology"].astype(str).tolist())
+layouts_key = (csv_hash, optimize_nesting, int(search_seconds), offcuts_key)
+
+# Miniaturas bajo demanda: solo se dibujan los tableros de los grupos abiertos.
+st.markdown("### Previsualización")
+for gi, layout in enumerate(nesting.groups):
+    n_boards = layout.boards_count
+    if preview_max_boards_per_group:
+        n_boards = min(n_boards, int(preview_max_boards_per_group))
+    if n_boards == 0:
+        continue
+    exp, is_open = group_expander(
+        f"{layout.group_name.replace('__', ' / ')} ({layout.boards_count} tableros)", key=f"preview_group_{gi}"
+    )
+    if not is_open:
+        continue
+    with exp:
+        cols = st.columns(cols_n)
+        for idx, bi in enumerate(range(1, n_boards + 1)):
+            png_bytes = render_board_cached(layout, bi, color_by_typology, APP_TITLE, dpi=THUMBNAIL_DPI)
+            with cols[idx % cols_n]:
+                st.image(png_bytes, caption=f"Tablero {bi}", width=int(preview_width_px))
+
+# Exportación bajo demanda: PNGs a resolución completa o SVG + DXF (una capa por tipología).
+EXPORT_FORMATS = {
+    "PNG (imágenes)": ("png", "CUBRO_QuickNesting_v5_layouts.zip", "Descargar ZIP de layouts (PNGs)"),
+    "SVG + DXF (vectorial)": ("vector", "CUBRO_QuickNesting_v5_layouts_vectorial.zip", "Descargar ZIP de layouts (SVG + DXF)"),
+}
+export_label = st.radio("Formato del ZIP de layouts", list(EXPORT_FORMATS), horizontal=True, key="layouts_export_format")
+export_kind, export_file_name, download_label = EXPORT_FORMATS[export_label]
+zip_key = (*layouts_key, export_kind)
+if export_kind == "vector":
+    st.caption("Los DXF se pueden abrir y previsualizar en el Lector DXF.")
+
+zip_state = st.session_state.get("layouts_zip")
+if zip_state is None or zip_state[0] != zip_key:
+    if st.button("Generar ZIP de layouts", use_container_width=True):
+        with st.spinner("Generando layouts..."):
+            if export_kind == "vector":
+                data = build_vector_zip(nesting.groups, color_by_typology, APP_TITLE)
+            else:
+                data = build_layouts_zip(nesting.groups, color_by_typology, APP_TITLE)
+        zip_state = (zip_key, data)
+        st.session_state["layouts_zip"] = zip_state
+
+if zip_state is not None and zip_state[0] == zip_key:
+    st.download_button(
+        download_label,
+        data=zip_state[1],
+        file_name=export_file_name,
+        mime="application/zip",
+        use_container_width=True,
+    )
 
 # =================================================
 # 👆👆👆 AQUÍ TERMINA TU NESTING APP REAL 👆👆👆
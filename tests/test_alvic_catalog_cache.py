@@ -0,0 +1,30 @@
+import pandas as pd
+
+from utils.alvic_catalog_cache import DERIVED_COLS, compile_catalog, load_catalog_frame
+
+
+def _write_catalog(path, rows):
+    pd.DataFrame(rows, columns=["ARTICULO", "Modelo", "Color", "Alto", "Ancho"]).to_csv(path, index=False)
+
+
+def test_compiled_catalog_roundtrip_and_rebuild_on_change(tmp_path):
+    csv_path = tmp_path / "catalogo.csv"
+    cache_dir = tmp_path / "cache"
+    _write_catalog(csv_path, [["A1", "06 zenit ", "blanco sm", 797, 597], ["A2", "06 ZENIT", None, 1197, 447]])
+
+    first = compile_catalog(csv_path, cache_dir=cache_dir)
+    frame = load_catalog_frame(csv_path, cache_dir=cache_dir)
+    raw = frame.drop(columns=DERIVED_COLS)
+    # El texto vuelve como `category` (códigos del .npy + diccionario), con los mismos valores.
+    assert all(isinstance(raw[c].dtype, pd.CategoricalDtype) for c in ["ARTICULO", "Modelo", "Color"])
+    pd.testing.assert_frame_equal(raw.astype(object), pd.read_csv(csv_path).astype(object))
+    assert frame["__modelo_norm"].tolist() == ["06 ZENIT", "06 ZENIT"]
+    assert frame["__color_norm"].iloc[0] == "BLANCO SM"
+    assert frame["__color_norm"].isna().tolist() == [False, True]
+    assert frame["__valid"].tolist() == [True, False]
+
+    _write_catalog(csv_path, [["A3", "06 ZENIT", "NEGRO SM", 2498, 1197]])
+    second = compile_catalog(csv_path, cache_dir=cache_dir)
+    assert second != first
+    assert not first.exists()
+    assert load_catalog_frame(csv_path, cache_dir=cache_dir)["ARTICULO"].tolist() == ["A3"]
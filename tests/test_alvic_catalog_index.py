@@ -0,0 +1,62 @@
+import random
+from pathlib import Path
+
+import pandas as pd
+
+from translator import AlvicCatalogIndex, _filter_db_by_color, find_best_match, load_alvic_db
+
+DB_PATH = Path(__file__).resolve().parents[1] / "data" / "base_datos_alvic_2026.csv"
+
+
+def _small_db() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "ARTICULO": ["A1", "A2", "A3", "A4", "A5", "A6"],
+            "Color_raw": ["BLANCO SM", "BLANCO SM", "BLANCO SM", "BLANCO SM", "NEGRO SM", "BLANCO SM"],
+            "Ancho": [597, 1197, 447, 597, 597, 597],
+            "Alto": [797, 2498, 797, 797, 797, 1197],
+        }
+    )
+
+
+def test_index_matches_dataframe_scan_on_tolerance_edges():
+    db = _small_db()
+    index = AlvicCatalogIndex(db)
+    for w, h in [(597, 797), (797, 597), (600, 800), (1199, 2498), (1197, 2501), (1197, 2500), (450, 700), (2000, 2000)]:
+        d_color, mode = _filter_db_by_color(db, "BLANCO SM", None)
+        expected, expected_type = find_best_match(d_color, w, h)
+        got, got_type, got_mode = index.find_best_match(w, h, color_text="BLANCO SM")
+        assert (got_type, got_mode) == (expected_type, mode)
+        if expected is None:
+            assert got is None
+        else:
+            assert got["ARTICULO"] == expected["ARTICULO"]
+
+
+def test_index_matches_dataframe_scan_on_real_catalog():
+    db = load_alvic_db(str(DB_PATH))
+    index = AlvicCatalogIndex(db)
+    rnd = random.Random(7)
+    colors = [None, "BLANCO SM", "NEGRO SM", "ARENA SM", "NO EXISTE"]
+    for _ in range(200):
+        w, h = rnd.randint(50, 1300), rnd.randint(50, 2600)
+        color = rnd.choice(colors)
+        d_color, mode = _filter_db_by_color(db, color, None)
+        expected, expected_type = find_best_match(d_color, w, h)
+        got, got_type, got_mode = index.find_best_match(w, h, color_text=color)
+        assert (got_type, got_mode) == (expected_type, mode)
+        assert (got is None) == (expected is None)
+        if expected is not None:
+            assert got.name == expected.name
+
+
+def test_match_memo_is_bounded_and_counts_hits():
+    index = AlvicCatalogIndex(_small_db(), match_cache_size=2)
+    first = index.lookup(597, 797, color_text="BLANCO SM")
+    assert first[3] is False
+    assert index.lookup(597, 797, color_text="BLANCO SM") == (*first[:3], True)
+    index.lookup(1197, 2498, color_text="BLANCO SM")
+    index.lookup(450, 700, color_text="BLANCO SM")
+    assert len(index._match_cache) == 2
+    assert index.lookup(597, 797, color_text="BLANCO SM")[3] is False
+    assert (index.cache_hits, index.cache_misses) == (1, 4)
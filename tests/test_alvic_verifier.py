@@ -0,0 +1,62 @@
+import io
+from pathlib import Path
+
+import pandas as pd
+
+from tools.alvic_verifier import VerifierIndex, find_code, load_alvic_db, read_order_codes
+from translator import to_alvic_csv_bytes
+
+DB_PATH = Path(__file__).resolve().parents[1] / "data" / "base_datos_alvic_2026.csv"
+
+
+def test_index_lookup_matches_find_code():
+    df = load_alvic_db(DB_PATH)
+    index = VerifierIndex.from_df(df)
+    codes = df["articulo"].iloc[::997].tolist() + ["  lgpul91460278397\t", "NO-EXISTE"]
+    for code in codes:
+        assert index.lookup(code) == find_code(df, code)
+        assert find_code(index, code) == find_code(df, code)
+
+
+def test_bulk_verification_of_alvic_order():
+    df = load_alvic_db(DB_PATH)
+    index = VerifierIndex.from_df(df)
+    known = df["articulo"].iloc[[0, 5000, 12000]].tolist()
+    order = pd.DataFrame(
+        {
+            "referencia": "MEC_SP-12345",
+            "acod": [known[0], known[1], "FALSO123", known[0], known[2]],
+            "alargo": "0,797",
+        }
+    )
+
+    codes = read_order_codes(io.BytesIO(to_alvic_csv_bytes(order)))
+    report = index.verify_codes(codes)
+
+    assert report["code"].tolist() == [known[0], known[1], "FALSO123", known[2]]
+    assert report["lineas"].tolist() == [2, 1, 1, 1]
+    assert report["encontrado"].tolist() == [True, True, False, True]
+    assert report.loc[2, "color"] is None
+    assert report.loc[3, "modelo"] == index.lookup(known[2])["modelo"]
+
+
+def test_search_finds_partial_and_mistyped_codes():
+    index = VerifierIndex.from_df(load_alvic_db(DB_PATH))
+
+    exact = index.search("lgfcj07160138297", k=3)
+    assert exact[0]["code"] == "LGFCJ07160138297" and exact[0]["match"] == "exact"
+    assert exact[0] == {**index.lookup("LGFCJ07160138297"), "match": "exact", "score": 1.0}
+
+    prefix = index.search("LGPUL9146", k=5)
+    assert len(prefix) == 5 and all(r["code"].startswith("LGPUL9146") for r in prefix)
+
+    # Falta el prefijo LGFCL (línea 09 ZENIT - 22MM).
+    missing_prefix = index.search("85860138297", k=3)
+    assert missing_prefix[0]["code"] == "LGFCL85860138297"
+    assert missing_prefix[0]["match"] == "substring"
+
+    # Dígitos transpuestos.
+    typo = [r["code"] for r in index.search("LGPUL91460728397", k=5)]
+    assert "LGPUL91460278397" in typo
+
+    assert index.search("", k=5) == []
@@ -0,0 +1,8 @@
+from benchmarks.nesting_bench import bench_size, format_report
+
+
+def test_bench_reports_identical_layouts():
+    result = bench_size(350, repeats=1)
+    assert result["identical"]
+    assert result["boards"] > 0 and result["reference_s"] > 0
+    assert "350" in format_report([result])
@@ -0,0 +1,465 @@
+import io
+import zipfile
+
+import pandas as pd
+
+from lib.nesting import (
+    EDGE_MARGIN,
+    GAP_BETWEEN,
+    BytesUploadedFile,
+    PieceItem,
+    PlacedPiece,
+    clear_pack_cache,
+    get_board_rule,
+    load_pieces_v5,
+    nest_pieces,
+    pack_cache_info,
+    pack_group_with_positions,
+)
+from lib.nesting.render import build_layouts_zip, typology_color_map
+
+
+def _csv_bytes() -> bytes:
+    rows = []
+    for i in range(60):
+        gama, acabado = [("LAC", "Blanco"), ("WOO", "Roble"), ("LAM", "Metal"), ("XXX", "Raro")][i % 4]
+        rows.append(["SP-1 Cocina", f"SKU{i}", f"P{i}", f"T{i % 5}", 300 + 37 * (i % 13), 200 + 91 * (i % 17), "MDF", gama, acabado])
+    rows.append(["SP-1 Cocina", "SKU-XL", "PXL", "T0", 4000, 500, "MDF", "LAC", "Blanco"])
+    df = pd.DataFrame(rows, columns=["Proyecto", "SKU", "Pieza", "Tipologia", "Ancho", "Alto", "Material", "Gama", "Acabado"])
+    return df.to_csv(sep=";", index=False).encode("utf-8")
+
+
+def test_nesting_result_packs_each_group_once_and_matches_direct_packing():
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes(), name="SP-1.csv"))
+    clear_pack_cache()
+    result = nest_pieces(pieces)
+
+    # 3 grupos con regla (la gama XXX no tiene tablero): un único packing por grupo.
+    assert len(result.groups) == 3
+    assert pack_cache_info()["misses"] == 3
+    assert any("Gama desconocida" in msg for msg in result.issues)
+    assert any("no caben" in msg for msg in result.issues)
+
+    for layout in result.groups:
+        rule = get_board_rule(layout.gama, layout.acabado)
+        grp = pieces[(pieces["Gama_norm"] == layout.gama) & (pieces["Acabado_norm"] == layout.acabado)]
+        items = [PieceItem(str(r["PieceID"]), str(r["Typology"]), float(r["W"]), float(r["H"])) for _, r in grp.iterrows()]
+        boards, unplaced = pack_group_with_positions(
+            items, rule["board_w"] - 2 * EDGE_MARGIN, rule["board_h"] - 2 * EDGE_MARGIN, rule["rotate"]
+        )
+        assert layout.boards == boards and layout.unplaced == unplaced
+
+    assert result.boards_total == sum(layout.boards_count for layout in result.groups)
+    assert result.by_finish["Tableros"].sum() == result.by_project["Tableros"].sum() == result.boards_total
+
+
+def test_layouts_zip_contains_every_board():
+    from lib.nesting.render import THUMBNAIL_DPI, clear_render_cache, render_board_cached, render_cache_info
+
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes()))
+    result = nest_pieces(pieces)
+    lac = [g for g in result.groups if g.gama == "laca"]
+    colors = typology_color_map(pieces["Typology"].tolist())
+
+    clear_render_cache()
+    zip_bytes = build_layouts_zip(lac, colors, "Test")
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+        names = zf.namelist()
+        first_png = zf.read(f"{lac[0].group_name}/TABLERO_001.png")
+    assert sum(n.endswith(".png") for n in names) == lac[0].boards_count
+    assert f"{lac[0].group_name}/_PIEZAS_NO_CABEN.txt" in names
+
+    # Miniatura y PNG completo se cachean por separado (hash del tablero, dpi).
+    assert render_cache_info()["misses"] == lac[0].boards_count
+    thumb = render_board_cached(lac[0], 1, colors, "Test", dpi=THUMBNAIL_DPI)
+    assert len(thumb) < len(first_png)
+    assert render_board_cached(lac[0], 1, colors, "Test") == first_png
+    assert render_board_cached(lac[0], 1, colors, "Test", dpi=THUMBNAIL_DPI) is thumb
+    assert render_cache_info()["hits"] == 2
+
+
+def test_pil_backend_and_parallel_zip_match_serial_export(monkeypatch):
+    from PIL import Image
+
+    from lib.nesting import render
+    from lib.nesting.render import clear_render_cache, render_board_cached
+
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes()))
+    groups = nest_pieces(pieces).groups
+    colors = typology_color_map(pieces["Typology"].tolist())
+
+    png = render_board_cached(groups[0], 1, colors, "Test", backend="pil")
+    with Image.open(io.BytesIO(png)) as img:
+        assert img.format == "PNG" and img.height > 1000
+    assert render_board_cached(groups[0], 1, colors, "Test", backend="matplotlib") != png
+
+    clear_render_cache()
+    serial = build_layouts_zip(groups, colors, "Test", max_workers=1)
+    monkeypatch.setattr(render, "RENDER_PARALLEL_MIN_BOARDS", 0)
+    clear_render_cache()
+    parallel = build_layouts_zip(groups, colors, "Test", max_workers=2)
+    # Las fechas de las entradas del ZIP dependen del segundo en que se escriben: se compara el contenido.
+    with zipfile.ZipFile(io.BytesIO(serial)) as zs, zipfile.ZipFile(io.BytesIO(parallel)) as zp:
+        assert zs.namelist() == zp.namelist()
+        assert all(zs.read(name) == zp.read(name) for name in zs.namelist())
+
+
+def test_packer_matches_reference_layouts():
+    from benchmarks.nesting_bench import generate_group
+    from lib.nesting.packer import _pack_group_reference
+
+    for n_pieces, rotate in [(40, True), (450, True), (450, False)]:
+        items = generate_group(n_pieces, seed=n_pieces, custom_ratio=0.4)
+        items.append(PieceItem("XL", "Puerta", 4000, 200))
+        expected = _pack_group_reference(items, 1286, 3036, rotate)
+        assert pack_group_with_positions(items, 1286, 3036, rotate) == expected
+
+
+def _assert_valid_layout(boards, items, usable_w, usable_h):
+    placed = [p for board in boards for p in board]
+    assert sorted(p.piece_id for p in placed) == sorted(it.piece_id for it in items)
+    for board in boards:
+        rects = [(p.x, p.y, p.x + p.w + GAP_BETWEEN, p.y + p.h + GAP_BETWEEN) for p in board]
+        for i, (x1, y1, x2, y2) in enumerate(rects):
+            assert x1 >= 0 and y1 >= 0 and x2 <= usable_w and y2 <= usable_h
+            for ox1, oy1, ox2, oy2 in rects[i + 1 :]:
+                assert x2 <= ox1 or ox2 <= x1 or y2 <= oy1 or oy2 <= y1
+
+
+def test_portfolio_keeps_fewest_boards_and_reports_winner(monkeypatch):
+    from benchmarks.nesting_bench import generate_group
+    from lib.nesting import DEFAULT_PORTFOLIO, pack_portfolio
+    from lib.nesting import portfolio as portfolio_mod
+
+    monkeypatch.setattr(portfolio_mod, "PARALLEL_MIN_PIECES", 0)
+    items = generate_group(500, seed=500)
+    clear_pack_cache()
+    result = pack_portfolio([(items, 1286, 3036, True)], DEFAULT_PORTFOLIO, max_workers=2)[0]
+
+    assert set(result.runs) == {h.name for h in DEFAULT_PORTFOLIO}
+    assert len(result.boards) == min(result.runs.values())
+    assert result.runs[result.heuristic] == len(result.boards)
+    assert len(result.boards) <= len(pack_group_with_positions(items, 1286, 3036, True)[0])
+    _assert_valid_layout(result.boards, items, 1286, 3036)
+
+
+def test_every_heuristic_produces_valid_layouts():
+    from benchmarks.nesting_bench import generate_group
+    from lib.nesting import FIT_SCORES, ORDERINGS, Heuristic
+
+    items = generate_group(120, seed=7, custom_ratio=0.5)
+    for order in ORDERINGS:
+        for fit in FIT_SCORES:
+            boards, unplaced = pack_group_with_positions(items, 1236, 3036, False, Heuristic(order, fit))
+            assert not unplaced
+            _assert_valid_layout(boards, items, 1236, 3036)
+
+
+def test_optimizer_mode_adds_winning_heuristic_to_global_table():
+    from lib.nesting import DEFAULT_PORTFOLIO
+
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes()))
+    plain = nest_pieces(pieces)
+    optimized = nest_pieces(pieces, portfolio=DEFAULT_PORTFOLIO)
+
+    assert "Heurística" not in plain.by_finish.columns
+    assert set(optimized.by_finish["Heurística"]) <= {h.name for h in DEFAULT_PORTFOLIO}
+    assert optimized.boards_total <= plain.boards_total
+
+
+def test_time_budgeted_search_improves_valid_layouts_and_stops_at_lower_bound():
+    from benchmarks.nesting_bench import generate_group
+    from lib.nesting import area_lower_bound, improve_layout
+
+    items = generate_group(60, seed=3)
+    initial, _ = pack_group_with_positions(items, 1286, 3036, True)
+    progress = []
+    result = improve_layout(items, 1286, 3036, True, time_budget_s=1.0, on_progress=progress.append)
+
+    assert result.initial_boards == len(initial)
+    assert result.lower_bound == area_lower_bound(items, 1286, 3036) <= len(result.boards) <= len(initial)
+    assert result.elapsed < 2.0 and progress and progress[-1].boards == len(result.boards)
+    _assert_valid_layout(result.boards, items, 1286, 3036)
+
+    # Con pocas piezas se alcanza la cota y la búsqueda para sin agotar el tiempo.
+    small = improve_layout(items[:3], 1286, 3036, True, time_budget_s=30.0)
+    assert small.reached_lower_bound and small.elapsed < 1.0
+
+
+def test_search_seconds_feeds_improved_layouts_into_result():
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes()))
+    plain = nest_pieces(pieces)
+    groups_seen = set()
+    searched = nest_pieces(pieces, search_seconds=0.6, on_progress=lambda group, p: groups_seen.add(group))
+
+    assert len(groups_seen) == 3
+    assert "Heurística" in searched.by_finish.columns
+    assert searched.boards_total <= plain.boards_total
+    for layout in searched.groups:
+        assert sum(len(b) for b in layout.boards) + len(layout.unplaced) == layout.pieces
+
+
+def test_board_lower_bound_is_valid_and_beats_area_for_wide_pieces():
+    from benchmarks.nesting_bench import generate_group
+    from lib.nesting import FIT_SCORES, ORDERINGS, Heuristic, area_lower_bound, bin_packing_l2, board_lower_bound
+
+    for seed, rotate in [(0, True), (1, False), (2, True)]:
+        items = generate_group(80, seed=seed, custom_ratio=0.5)
+        bound = board_lower_bound(items, 1286, 3036, rotate)
+        assert area_lower_bound(items, 1286, 3036) <= bound
+        for order in ORDERINGS:
+            for fit in FIT_SCORES:
+                assert bound <= len(pack_group_with_positions(items, 1286, 3036, rotate, Heuristic(order, fit))[0])
+
+    # Más anchas y más altas que medio tablero: una por tablero, aunque el área diga 2.
+    wide = [PieceItem(f"P{i}", "T0", 700, 1600) for i in range(5)]
+    assert area_lower_bound(wide, 1286, 3036) == 2
+    assert board_lower_bound(wide, 1286, 3036, False) == 5
+    assert board_lower_bound(wide + [PieceItem("XL", "T0", 5000, 100)], 1286, 3036, False) == 5
+    assert bin_packing_l2([60, 60, 60, 30, 30], 100) == 3
+
+
+def test_gap_is_reported_and_portfolio_stops_at_lower_bound():
+    from lib.nesting import DEFAULT_PORTFOLIO, pack_portfolio
+
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes()))
+    result = nest_pieces(pieces)
+    assert result.optimality_gap == result.boards_total - result.lower_bound_total >= 0
+    assert (result.by_finish["Tableros"] - result.by_finish["Cota inferior"] == result.by_finish["Gap"]).all()
+
+    # La heurística por defecto ya es óptima: no se prueba el resto de la cartera.
+    wide = [PieceItem(f"P{i}", "T0", 700, 1600) for i in range(5)]
+    clear_pack_cache()
+    best = pack_portfolio([(wide, 1286, 3036, False)], DEFAULT_PORTFOLIO)[0]
+    assert len(best.boards) == 5 and list(best.runs) == [DEFAULT_PORTFOLIO[0].name]
+
+
+def test_portfolio_choice_does_not_depend_on_memo():
+    from lib.nesting import DEFAULT_PORTFOLIO, pack_portfolio
+
+    wide = [PieceItem(f"P{i}", "T0", 700, 1600) for i in range(5)]
+    clear_pack_cache()
+    fresh = pack_portfolio([(wide, 1286, 3036, False)], DEFAULT_PORTFOLIO)[0]
+
+    # Con una heurística posterior que ya alcanza la cota en el memo, gana igualmente la primera.
+    clear_pack_cache()
+    pack_portfolio([(wide, 1286, 3036, False)], DEFAULT_PORTFOLIO[1:])
+    warm = pack_portfolio([(wide, 1286, 3036, False)], DEFAULT_PORTFOLIO)[0]
+    assert warm.heuristic == fresh.heuristic == DEFAULT_PORTFOLIO[0].name
+    assert warm.runs == fresh.runs and warm.boards == fresh.boards
+
+
+def test_parallel_group_runner_streams_groups_and_matches_sequential(monkeypatch):
+    from lib.nesting import runner
+
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes()))
+    clear_pack_cache()
+    sequential = nest_pieces(pieces, max_workers=1)
+
+    monkeypatch.setattr(runner, "PARALLEL_MIN_PIECES", 0)
+    clear_pack_cache()
+    streamed = []
+    parallel = nest_pieces(pieces, max_workers=2, on_group=streamed.append)
+
+    assert sorted(g.group_name for g in streamed) == sorted(g.group_name for g in parallel.groups)
+    assert [g.boards for g in parallel.groups] == [g.boards for g in sequential.groups]
+    pd.testing.assert_frame_equal(parallel.by_project, sequential.by_project)
+    pd.testing.assert_frame_equal(parallel.by_finish, sequential.by_finish)
+
+
+def test_vector_export_writes_svg_and_dxf_with_one_layer_per_typology():
+    from utils.dxf_reader import count_polylines_by_layer, load_dxf_from_bytes
+    from lib.nesting.vector import build_vector_zip, typology_layer
+
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes()))
+    groups = nest_pieces(pieces).groups
+    zip_bytes = build_vector_zip(groups, typology_color_map(pieces["Typology"].tolist()), "Test")
+
+    layout = groups[0]
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+        names = zf.namelist()
+        svg = zf.read(f"{layout.group_name}/TABLERO_001.svg").decode("utf-8")
+        dxf = zf.read(f"{layout.group_name}/TABLERO_001.dxf")
+    total_boards = sum(g.boards_count for g in groups)
+    assert sum(n.endswith(".svg") for n in names) == sum(n.endswith(".dxf") for n in names) == total_boards
+
+    board = layout.boards[0]
+    assert svg.count("<rect") == len(board) + 2
+    counts = count_polylines_by_layer(load_dxf_from_bytes(dxf)).set_index("Layer")["Polylines"].to_dict()
+    expected = pd.Series([typology_layer(p.typology) for p in board]).value_counts().to_dict()
+    assert counts == {**expected, "TABLERO": 1, "MARGEN": 1}
+
+
+def test_batch_loads_several_csvs_and_reports_boards_saved_by_joint_nesting():
+    from lib.nesting import batch_content_hash, batch_savings, download_many, load_pieces_batch
+
+    def project_csv(project: str, seed: int) -> bytes:
+        rows = [
+            [project, f"S{i}", f"{project}-P{i}", "T0", 300 + 37 * ((i + seed) % 13), 200 + 91 * ((i + seed) % 17), "MDF", "LAC", "Blanco"]
+            for i in range(20)
+        ]
+        return pd.DataFrame(rows).to_csv(sep=";", index=False).encode("utf-8")
+
+    drive = {f"id{k}": project_csv(f"SP-{k}", k) for k in range(3)}
+    datas = download_many(list(drive), drive.__getitem__, max_workers=3)
+    assert datas == list(drive.values())
+
+    files = [(f"SEM42_SP-{k}.csv", data) for k, data in enumerate(datas)]
+    assert batch_content_hash(files) == batch_content_hash(files[::-1])
+    pieces = load_pieces_batch(files[::-1])
+    assert len(pieces) == 60
+    assert pieces["Archivo"].tolist()[:20] == ["SEM42_SP-0.csv"] * 20
+
+    result = nest_pieces(pieces)
+    savings = batch_savings(result)
+    assert len(savings) == 1
+    row = savings.iloc[0]
+    assert row["Proyectos"] == 3
+    assert row["Tableros por proyecto"] == result.by_project["Tableros"].sum()
+    assert row["Tableros en conjunto"] == result.boards_total
+    assert row["Tableros ahorrados"] == row["Tableros por proyecto"] - row["Tableros en conjunto"] >= 0
+
+
+def test_offcuts_are_filled_best_fit_first_and_marked_used_in_the_stock():
+    from benchmarks.nesting_bench import generate_group
+    from lib.nesting import Offcut, fill_offcuts, mark_offcuts_used, offcuts_from_df
+
+    stock_df = pd.DataFrame(
+        {
+            "ID retal": ["R1", "R2", "R3", "R4"],
+            "Material": ["MDF", "MDF", "MDF", "MDF"],
+            "Gama": ["LAC", "LAC", "LAC", "WOO"],
+            "Acabado": ["Blanco", "Blanco", "Blanco", "Roble"],
+            "Ancho (mm)": ["1200", "450", "800,5", "600"],
+            "Largo (mm)": ["2000", "650", "900", "900"],
+            "Estado": ["", "", "Utilizado", ""],
+        }
+    )
+    offcuts = offcuts_from_df(stock_df)
+    assert [o.offcut_id for o in offcuts] == ["R1", "R2", "R4"]
+    assert (offcuts[0].gama, offcuts[0].acabado) == ("laca", "blanco")
+
+    # La pieza de 400×600 cabe en los dos retales de laca: va al más pequeño.
+    items = [PieceItem("big", "T0", 3000, 500), PieceItem("p1", "T0", 400, 600)]
+    uses, rest = fill_offcuts(items, offcuts[:2], allow_rotate=True)
+    assert [(u.offcut.offcut_id, [p.piece_id for p in u.pieces]) for u in uses] == [("R2", ["p1"])]
+    assert [it.piece_id for it in rest] == ["big"]
+
+    marked = mark_offcuts_used(stock_df, uses)
+    assert marked["Estado"].tolist() == ["", "Utilizado", "Utilizado", ""]
+    assert [o.offcut_id for o in offcuts_from_df(marked)] == ["R1", "R4"]
+
+    # Cientos de retales: todas las piezas acaban en un retal o en la lista para tableros, sin solapes.
+    many = [Offcut(f"S{i}", "MDF", "laca", "blanco", 300 + 7 * i % 900, 400 + 13 * i % 2300) for i in range(300)]
+    group = generate_group(800, seed=8)
+    uses, rest = fill_offcuts(group, many, allow_rotate=True)
+    assert sum(len(u.pieces) for u in uses) + len(rest) == len(group)
+    for use in uses:
+        uw, uh = use.offcut.w - 2 * EDGE_MARGIN, use.offcut.h - 2 * EDGE_MARGIN
+        _assert_valid_layout([use.pieces], [it for it in group if it.piece_id in {p.piece_id for p in use.pieces}], uw, uh)
+
+
+def test_nest_pieces_uses_offcuts_before_new_boards():
+    from lib.nesting import Offcut
+
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes(), name="SP-1.csv"))
+    base = nest_pieces(pieces)
+    offcuts = [Offcut(f"R{i}", "MDF", "laca", "blanco", 1220, 1400) for i in range(3)]
+    result = nest_pieces(pieces, offcuts=offcuts)
+
+    assert result.offcuts_used and len(result.offcuts_used) <= len(offcuts)
+    assert len({id(u.offcut) for u in result.offcuts_used}) == len(result.offcuts_used)
+    assert result.boards_total < base.boards_total
+    lac = next(g for g in result.groups if g.gama == "laca")
+    placed = sum(len(b) for b in lac.boards) + sum(len(u.pieces) for u in lac.offcuts) + len(lac.unplaced)
+    assert placed == lac.pieces
+    assert result.by_finish["Retales usados"].sum() == len(result.offcuts_used)
+
+
+def test_leftovers_are_empty_maximal_and_appended_to_the_stock_in_one_call():
+    from lib.nesting import board_leftovers, leftover_sheet_rows, maximal_free_rects, offcuts_from_df
+    from utils.retales_sheet import append_retales_rows
+
+    # Una pieza en la esquina de un tablero de 1000×2000: quedan dos maximales en L.
+    board = [PlacedPiece("P1", "T0", 0, 0, 392, 592, False)]
+    frees = sorted(map(tuple, maximal_free_rects(board, 1000, 2000).tolist()))
+    assert frees == [(0.0, 600.0, 1000.0, 2000.0), (400.0, 0.0, 1000.0, 2000.0)]
+    # Sin solaparse: el mayor entero y del otro nada; y el mínimo filtra por lado corto / largo.
+    assert [(r.x, r.y, r.w, r.h) for r in board_leftovers(board, 1000, 2000, (100, 100))] == [(0.0, 600.0, 1000.0, 1400.0)]
+    assert board_leftovers(board, 1000, 2000, (1200, 1500)) == []
+
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes(), name="SP-1.csv"))
+    result = nest_pieces(pieces, leftover_min=(150, 300))
+    assert result.leftovers and result.by_finish["Sobrantes reutilizables"].sum() == len(result.leftovers)
+    for layout in result.groups:
+        for lo in layout.leftovers:
+            assert min(lo.w, lo.h) >= 150 and max(lo.w, lo.h) >= 300
+            for p in layout.boards[lo.board_index - 1]:
+                px2, py2 = p.x + p.w + GAP_BETWEEN, p.y + p.h + GAP_BETWEEN
+                assert lo.x + lo.w <= p.x or px2 <= lo.x or lo.y + lo.h <= p.y or py2 <= lo.y
+    assert nest_pieces(pieces, leftover_min=None).leftovers == []
+
+    columns = ["ID retal", "Material", "Gama", "Acabado", "Ancho (mm)", "Largo (mm)", "Notas", "Estado"]
+    rows = leftover_sheet_rows(result.groups, columns, id_prefix="SP-1 ", extra={"Notas": "nesting"})
+    assert len(rows) == len(result.leftovers) and all(len(r) == len(columns) for r in rows)
+    back = offcuts_from_df(pd.DataFrame(rows, columns=columns))
+    assert [(o.w, o.h) for o in back] == [(lo.w, lo.h) for lo in result.leftovers]
+    assert {(o.material, o.gama, o.acabado) for o in back} <= {(g.material, g.gama, g.acabado) for g in result.groups}
+
+    class FakeWorksheet:
+        def __init__(self):
+            self.calls = []
+
+        def append_rows(self, values, **kwargs):
+            self.calls.append((values, kwargs))
+
+    ws = FakeWorksheet()
+    append_retales_rows(ws, rows)
+    append_retales_rows(ws, [])
+    assert len(ws.calls) == 1 and ws.calls[0][0] == rows
+
+
+def test_batch_savings_with_offcuts_keeps_offcut_boards_apart():
+    from lib.nesting import Offcut, batch_savings
+
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes(), name="SP-1.csv"))
+    pieces.loc[pieces.index[::3], "ProjectID"] = "SP-2"
+    offcuts = [Offcut(f"R{i}", "MDF", "laca", "blanco", 1220, 1400) for i in range(3)]
+
+    plain = batch_savings(nest_pieces(pieces)).set_index("Gama")
+    with_offcuts = batch_savings(nest_pieces(pieces, offcuts=offcuts)).set_index("Gama")
+
+    assert (with_offcuts["Proyectos"] == 2).all()
+    # Los retales no cambian el ahorro de nestear proyectos juntos: van en su propia columna.
+    assert with_offcuts["Tableros ahorrados"].tolist() == plain["Tableros ahorrados"].tolist()
+    assert with_offcuts["Tableros en conjunto"].tolist() == plain["Tableros en conjunto"].tolist()
+    assert with_offcuts.loc["Laca", "Tableros cubiertos por retales"] >= 1
+    assert (
+        with_offcuts["Tableros en conjunto"] - with_offcuts["Tableros tras retales"]
+        == with_offcuts["Tableros cubiertos por retales"]
+    ).all()
+
+
+def test_search_runs_on_pieces_left_after_offcuts(monkeypatch):
+    from lib.nesting import Offcut, engine
+    from lib.nesting.search import SearchResult
+
+    searched = []
+
+    def fake_improve(items, usable_w, usable_h, allow_rotate, time_budget_s, heuristic, on_progress=None):
+        searched.append([it.piece_id for it in items])
+        boards, unplaced = pack_group_with_positions(items, usable_w, usable_h, allow_rotate)
+        return SearchResult(boards, unplaced, 0, len(boards) + 1, 1, 0.0)
+
+    monkeypatch.setattr(engine, "improve_layout", fake_improve)
+    pieces = load_pieces_v5(BytesUploadedFile(_csv_bytes(), name="SP-1.csv"))
+    offcuts = [Offcut(f"R{i}", "MDF", "laca", "blanco", 1220, 1400) for i in range(3)]
+    result = nest_pieces(pieces, offcuts=offcuts, search_seconds=0.1)
+
+    lac = next(g for g in result.groups if g.gama == "laca")
+    in_offcuts = {p.piece_id for use in lac.offcuts for p in use.pieces}
+    on_boards = {p.piece_id for board in lac.boards for p in board} | {it.piece_id for it in lac.unplaced}
+    assert in_offcuts and on_boards in [set(ids) for ids in searched]
+    assert not any(in_offcuts & set(ids) for ids in searched)
+    # El layout buscado es el que se usa (antes se descartaba por no coincidir la clave).
+    assert lac.heuristic.endswith("+ búsqueda")
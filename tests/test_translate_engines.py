@@ -0,0 +1,257 @@
+import io
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import translator
+from translator import (
+    DEFAULT_ALVIC_MODEL,
+    EXPECTED_COLS,
+    AlvicCatalogIndex,
+    load_input_csv,
+    translate_and_split,
+    translate_and_split_streaming,
+    translate_batch,
+    translate_dataframe,
+)
+
+DB_PATH = Path(__file__).resolve().parents[1] / "data" / "base_datos_alvic_2026.csv"
+
+ROWS = [
+    # ancho, alto, material, gama, acabado, mecanizado, tirador
+    (597, 797, "MDF", "LAC", "Blanco", "", ""),
+    (797, 597, "MDF", "LAC", "Negro", "", ""),
+    (600, 800, "MDF", "LAC", "Tinta", "", "Round"),
+    (1199, 2498, "MDF", "LAC", "Seda", "", ""),
+    (2498, 1197, "MDF", "LAC", "Seda", "x", ""),
+    (80, 1500, "MDF", "LAC", "Pino", "", ""),
+    (150, 200, "MDF", "LAC", "Humo", "", ""),
+    (3000, 3000, "MDF", "LAC", "Curry", "", ""),
+    ("", 500, "MDF", "LAC", "Roto", "", ""),
+    ("597,5", 797, "MDF", "LAC", "Rosa", "", ""),
+    (597, 797, "PLY", "WOO", "Blanco", "", ""),
+    (300, 140, "MDF", "lac mate", " blanco ", "nan", "square"),
+]
+
+
+def _write_input(path: Path) -> None:
+    records = []
+    for i, (w, h, mat, gama, color, mec, handle) in enumerate(ROWS):
+        records.append(["SP-12345 Juan Perez", f"SKU{i}", f"P{i}", "Puerta", w, h, mat, gama, color, mec, handle, "", "", ""])
+    pd.DataFrame(records, columns=EXPECTED_COLS).to_csv(path, index=False)
+
+
+def test_engines_produce_identical_csvs(tmp_path):
+    input_path = tmp_path / "input.csv"
+    _write_input(input_path)
+
+    outputs = {}
+    for name in ("rows", "columnar"):
+        out_m = tmp_path / f"{name}_m.csv"
+        out_nm = tmp_path / f"{name}_nm.csv"
+        *_, summary, _no_match, diag = translate_and_split(
+            str(input_path), str(DB_PATH), str(out_m), str(out_nm),
+            input_filename="PRJ_cocina.csv", engine=name,
+        )
+        outputs[name] = (out_m.read_bytes(), out_nm.read_bytes(), summary, diag)
+
+    ref, got = outputs["rows"], outputs["columnar"]
+    assert got[0] == ref[0]
+    assert got[1] == ref[1]
+    assert got[2] == ref[2]
+    pd.testing.assert_frame_equal(got[3], ref[3])
+
+
+def test_in_memory_translation_matches_path_wrapper(tmp_path):
+    input_path = tmp_path / "input.csv"
+    _write_input(input_path)
+    out_m, out_nm = tmp_path / "m.csv", tmp_path / "nm.csv"
+    machined, non_machined, summary, _, _ = translate_and_split(
+        str(input_path), str(DB_PATH), str(out_m), str(out_nm), input_filename="PRJ_cocina.csv"
+    )
+
+    inp = load_input_csv(io.BytesIO(input_path.read_bytes()))
+    result = translate_dataframe(inp, AlvicCatalogIndex.from_csv(str(DB_PATH)), input_filename="PRJ_cocina.csv")
+
+    assert result.summary == summary
+    pd.testing.assert_frame_equal(result.machined, machined)
+    pd.testing.assert_frame_equal(result.non_machined, non_machined)
+    assert result.machined_csv.decode("utf-8-sig").splitlines()[0] == "|".join(machined.columns)
+    assert len(result.non_machined_csv.decode("utf-8-sig").splitlines()) == len(non_machined) + 1
+
+
+def test_batch_isolates_failures_and_matches_single_runs(tmp_path):
+    input_path = tmp_path / "PRJ_cocina.csv"
+    _write_input(input_path)
+    broken_path = tmp_path / "PRJ_roto.csv"
+    broken_path.write_text("a,b\n1,2\n", encoding="utf-8")
+
+    batch = translate_batch(
+        [str(input_path), str(broken_path), ("PRJ_bano.csv", input_path.read_bytes())],
+        str(DB_PATH),
+        max_workers=2,
+    )
+
+    ok, broken, uploaded = batch.projects
+    assert [p.name for p in batch.projects] == ["PRJ_cocina.csv", "PRJ_roto.csv", "PRJ_bano.csv"]
+    assert not broken.ok and broken.error.startswith("ValueError")
+    assert batch.summary["projects_ok"] == 2 and batch.summary["projects_failed"] == 1
+
+    single = translate_dataframe(load_input_csv(str(input_path)), AlvicCatalogIndex.from_csv(str(DB_PATH)), "PRJ_cocina.csv")
+    assert ok.result.machined_csv == single.machined_csv
+    assert ok.result.non_machined_csv == single.non_machined_csv
+    assert batch.summary["total_lac"] == 2 * single.summary["total_lac"]
+
+    with zipfile.ZipFile(io.BytesIO(batch.zip_bytes)) as zf:
+        names = zf.namelist()
+        assert f"MEC/{ok.mec_filename}" in names
+        assert zf.read(f"SIN_MEC/{uploaded.non_mec_filename}") == single.non_machined_csv
+        assert "resumen_lote.csv" in names
+
+
+def test_match_memo_is_reused_across_translations(tmp_path):
+    input_path = tmp_path / "input.csv"
+    _write_input(input_path)
+    inp = load_input_csv(str(input_path))
+    catalog = AlvicCatalogIndex.from_csv(str(DB_PATH))
+
+    first = translate_dataframe(inp, catalog)
+    second = translate_dataframe(inp, catalog)
+
+    lookups = first.summary["match_cache_hits"] + first.summary["match_cache_misses"]
+    assert first.summary["match_cache_misses"] > 0
+    assert second.summary["match_cache_misses"] == 0
+    assert second.summary["match_cache_hits"] == lookups
+    assert second.machined_csv == first.machined_csv
+
+
+@pytest.mark.parametrize("engine", ["columnar", "rows"])
+def test_incremental_retranslation_matches_full_run(tmp_path, engine):
+    input_path = tmp_path / "input.csv"
+    _write_input(input_path)
+    inp = load_input_csv(str(input_path))
+    catalog = AlvicCatalogIndex.from_csv(str(DB_PATH))
+    previous = translate_dataframe(inp, catalog, "PRJ_cocina.csv", engine=engine)
+
+    edited = inp.copy()
+    edited.loc[0, "Ancho"] = 447
+    edited.loc[1, "Acabado"] = "Seda"
+    edited = pd.concat([edited.drop(index=4), edited.iloc[[2]]], ignore_index=True)
+
+    full = translate_dataframe(edited, AlvicCatalogIndex.from_csv(str(DB_PATH)), "PRJ_cocina.csv", engine=engine)
+    incremental = translate_dataframe(edited, catalog, "PRJ_cocina.csv", engine=engine, previous_diag=previous.diag)
+
+    assert incremental.machined_csv == full.machined_csv
+    assert incremental.non_machined_csv == full.non_machined_csv
+    assert incremental.summary["rows_reused"] == len(full.diag) - 2
+    assert full.summary["rows_reused"] == 0
+    assert incremental.diag["Codigo_ALVIC"].tolist() == full.diag["Codigo_ALVIC"].tolist()
+
+
+def test_incremental_retranslation_ignores_diag_from_other_catalog(tmp_path):
+    input_path = tmp_path / "input.csv"
+    _write_input(input_path)
+    inp = load_input_csv(str(input_path))
+    catalog = AlvicCatalogIndex.from_csv(str(DB_PATH))
+    previous = translate_dataframe(inp, catalog).diag
+    previous.attrs["catalog_version"] = "otra-version"
+
+    result = translate_dataframe(inp, catalog, previous_diag=previous)
+    assert result.summary["rows_reused"] == 0
+
+
+@pytest.mark.parametrize("header", [True, False])
+def test_streaming_translation_matches_whole_file(tmp_path, monkeypatch, header):
+    input_path = tmp_path / "input.csv"
+    _write_input(input_path)
+    if not header:
+        lines = input_path.read_text(encoding="utf-8").splitlines()[1:]
+        input_path.write_text("\n".join(line.replace(",", ";") for line in lines) + "\n", encoding="utf-8")
+
+    full_m, full_nm = tmp_path / "m.csv", tmp_path / "nm.csv"
+    *_, summary, _, _ = translate_and_split(
+        str(input_path), str(DB_PATH), str(full_m), str(full_nm), input_filename="PRJ_cocina.csv"
+    )
+
+    # En formato plano no se generan bytes ALVIC por bloque.
+    alvic_exports = []
+    monkeypatch.setattr(translator, "to_alvic_csv_bytes", lambda df: alvic_exports.append(len(df)) or b"")
+
+    stream_m, stream_nm = tmp_path / "sm.csv", tmp_path / "snm.csv"
+    stream_summary = translate_and_split_streaming(
+        str(input_path), str(DB_PATH), str(stream_m), str(stream_nm),
+        input_filename="PRJ_cocina.csv", chunksize=5,
+    )
+
+    assert alvic_exports == []
+    assert stream_m.read_bytes() == full_m.read_bytes()
+    assert stream_nm.read_bytes() == full_nm.read_bytes()
+    for key in ["total_lac", "total_mec", "total_sin_mec", "total_no_match", "total_bad_dims"]:
+        assert stream_summary[key] == summary[key]
+
+
+@pytest.mark.parametrize("engine", ["columnar", "rows"])
+def test_pieces_are_routed_to_alvic_model_from_gama(engine):
+    records = [
+        ["SP-12345 Juan Perez", "SKU0", "P0", "Puerta", 297, 138, "MDF", "LAC", "Blanco", "", "", "", "", ""],
+        ["SP-12345 Juan Perez", "SKU1", "P1", "Puerta", 297, 138, "MDF", "LAC FINGERPULL", "Blanco", "", "", "", "", ""],
+        ["SP-12345 Juan Perez", "SKU2", "P2", "Puerta", 297, 138, "MDF 22MM", "LAC", "Negro", "", "", "", "", ""],
+    ]
+    inp = pd.DataFrame(records, columns=EXPECTED_COLS)
+    diag = translate_dataframe(inp, AlvicCatalogIndex.from_csv(str(DB_PATH)), engine=engine).diag
+
+    assert diag["Modelo_ALVIC"].tolist() == [DEFAULT_ALVIC_MODEL, "08 ZENIT - FINGERPULL", "09 ZENIT - 22MM"]
+    assert diag["Color_ALVIC_text"].tolist() == ["BLANCO SM", "BLANCO U.BLANCO SM", "NEGRO"]
+    assert diag.loc[1, "Codigo_ALVIC"] == "LGFCJ07160138297"
+    assert diag.loc[2, "Codigo_ALVIC"] == "LGFCL85860138297"
+    assert diag["Output_Grueso_mm"].tolist()[1:] == [22, 22]
+
+
+def test_profile_reports_stage_timings_only_when_requested(tmp_path):
+    input_path = tmp_path / "input.csv"
+    _write_input(input_path)
+    out_m, out_nm = tmp_path / "m.csv", tmp_path / "nm.csv"
+
+    *_, plain, _, _ = translate_and_split(str(input_path), str(DB_PATH), str(out_m), str(out_nm))
+    assert "perf" not in plain
+
+    *_, summary, _, diag = translate_and_split(str(input_path), str(DB_PATH), str(out_m), str(out_nm), profile=True)
+    perf = summary["perf"]
+    assert {"catalog_load", "csv_load", "lac_detection", "matching", "output_build", "final_safety", "csv_write"} <= set(perf["stages"])
+    assert perf["stages"]["csv_load"]["rows"] == len(ROWS)
+    assert perf["stages"]["matching"]["rows"] == len(diag)
+    assert perf["lookups"]["rows_looked_up"] == summary["match_cache_hits"] + summary["match_cache_misses"]
+
+
+@pytest.mark.parametrize("engine", ["columnar", "rows"])
+def test_colour_missing_from_routed_model_is_no_match(engine):
+    # Crema (MAGNOLIA) existe en 06 ZENIT pero no en 08 / 09: no se pide otro color.
+    records = [
+        ["SP-12345 Juan Perez", "SKU0", "P0", "Puerta", 297, 138, "MDF", "LAC FINGERPULL", "Crema", "", "", "", "", ""],
+        ["SP-12345 Juan Perez", "SKU1", "P1", "Puerta", 297, 138, "MDF 22MM", "LAC", "Crema", "", "", "", "", ""],
+        ["SP-12345 Juan Perez", "SKU2", "P2", "Puerta", 297, 138, "MDF", "LAC", "Crema", "", "", "", "", ""],
+    ]
+    inp = pd.DataFrame(records, columns=EXPECTED_COLS)
+    result = translate_dataframe(inp, AlvicCatalogIndex.from_csv(str(DB_PATH)), engine=engine)
+    diag = result.diag
+
+    assert diag["Match_type"].tolist() == ["NO_MATCH", "NO_MATCH", "EXACT"]
+    assert diag["Color_filter_mode"].tolist() == ["COLOR_NOT_IN_MODEL", "COLOR_NOT_IN_MODEL", "TEXT"]
+    assert diag["Codigo_ALVIC"].tolist()[:2] == ["", ""]
+    assert result.summary["total_no_match"] == 2
+
+
+def test_batch_job_with_empty_catalog_reports_no_match(tmp_path):
+    from translator import _translate_batch_job
+
+    input_path = tmp_path / "PRJ_cocina.csv"
+    _write_input(input_path)
+    full = AlvicCatalogIndex.from_csv(str(DB_PATH))
+    empty = AlvicCatalogIndex(full.db.iloc[:0])
+
+    job = _translate_batch_job(("PRJ_cocina.csv", "csv", input_path.read_bytes()), catalog=empty)
+    assert job.ok, job.error
+    assert (job.result.diag["Codigo_ALVIC"] == "").all()
+    assert job.result.summary["total_no_match"] > 0
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import translator
+from benchmarks import translator_bench
+from benchmarks.translator_bench import STAGES, bench_size, check_regressions, generate_cubro_input, run_stages
+from translator import EXPECTED_COLS, AlvicCatalogIndex
+
+DB_PATH = Path(__file__).resolve().parents[1] / "data" / "base_datos_alvic_2026.csv"
+
+
+def test_generator_produces_cubro_layout():
+    df = generate_cubro_input(300, seed=1)
+    assert df.columns.tolist() == EXPECTED_COLS
+    assert len(df) == 300
+    assert (df["Gama"] == "LAC").mean() > 0.5
+
+
+def test_bench_reports_every_stage_and_flags_regressions(tmp_path):
+    result = bench_size(200, AlvicCatalogIndex.from_csv(str(DB_PATH)), tmp_path)
+    assert set(result["stages"]) == set(STAGES)
+    assert result["rows"] == 200 and result["rows_per_sec"] > 0
+    assert result["peak_mem_mb"] > 0
+
+    baseline = {"200": {"rows_per_sec": result["rows_per_sec"] * 10}}
+    assert check_regressions({200: result}, baseline, max_regression=0.25)
+    assert not check_regressions({200: result}, baseline, max_regression=0.95)
+
+
+def test_stages_run_mec_rules_once(tmp_path, monkeypatch):
+    input_csv = tmp_path / "PRJ_bench.csv"
+    generate_cubro_input(200, seed=2).to_csv(input_csv, index=False)
+    calls = []
+    original = translator.machined_rules_mask
+
+    def counted(df):
+        calls.append(len(df))
+        return original(df)
+
+    monkeypatch.setattr(translator_bench, "machined_rules_mask", counted)
+    monkeypatch.setattr(translator, "machined_rules_mask", counted)
+    result = run_stages(input_csv, AlvicCatalogIndex.from_csv(str(DB_PATH)))
+    assert calls == [result["lac_rows"]]
@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+import bisect
+import difflib
+import io
 import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Iterable
 
+import numpy as np
 import pandas as pd
 
+from utils.alvic_catalog_cache import DERIVED_COLS, load_catalog_frame
+
 
 def normalize_code(code: str) -> str:
     return str(code).replace("\t", " ").strip().upper()
@@ -101,14 +110,8 @@ def detect_color_columns(df: pd.DataFrame) -> dict:
 
 
 def load_alvic_db(db_path: Path) -> pd.DataFrame:
-    try:
-        df = pd.read_csv(db_path, sep=None, engine="python")
-    except Exception:
-        try:
-            df = pd.read_csv(db_path, sep=";")
-        except Exception:
-            df = pd.read_csv(db_path, sep=",")
-
+    frame = load_catalog_frame(db_path)
+    df = frame.drop(columns=DERIVED_COLS)
     df.columns = [str(col).strip().lower() for col in df.columns]
     return df
 
@@ -130,14 +133,14 @@ def _as_clean_text(value) -> str | None:
     return text if text else None
 
 
-def find_code(df: pd.DataFrame, code: str) -> dict | None:
+def find_code(df: pd.DataFrame | VerifierIndex, code: str) -> dict | None:
+    if isinstance(df, VerifierIndex):
+        return df.lookup(code)
     if df.empty:
         return None
 
     code_col = detect_code_column(df)
-    work = df.copy()
-    work["__code_norm"] = work[code_col].map(normalize_code)
-    rows = work[work["__code_norm"] == normalize_code(code)]
+    rows = df[df[code_col].map(normalize_code) == normalize_code(code)]
     if rows.empty:
         return None
 
@@ -168,6 +171,187 @@ def find_code(df: pd.DataFrame, code: str) -> dict | None:
     }
 
 
+RECORD_FIELDS = ["alto_mm", "ancho_mm", "grueso_mm", "color", "modelo"]
+
+
+def _clean_column(df: pd.DataFrame, col: str | None) -> pd.Series:
+    if not col:
+        return pd.Series(None, index=df.index, dtype=object)
+    return df[col].map(_as_clean_text).astype(object)
+
+
+@dataclass
+class VerifierIndex:
+    """Índice del catálogo para el verificador: código normalizado -> registro de `find_code`.
+
+    Las columnas (código, medidas, color) se detectan una sola vez al construirlo;
+    cachéalo por versión del catálogo (p.ej. `source_fingerprint` del CSV).
+    """
+
+    table: pd.DataFrame
+    records: dict[str, dict]
+    _search: CodeSearchIndex | None = field(default=None, repr=False)
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame) -> VerifierIndex:
+        if df.empty:
+            return cls(pd.DataFrame(columns=RECORD_FIELDS), {})
+
+        code_col = detect_code_column(df)
+        dim_cols = detect_dim_columns(df)
+        color_cols = detect_color_columns(df)
+
+        codes = df[code_col].map(normalize_code)
+        first = ~codes.duplicated()
+        work = df[first]
+
+        dims = {key: _clean_column(work, dim_cols[key]) for key in ["alto_mm", "ancho_mm", "grueso_mm"]}
+        if dim_cols["medidas"]:
+            incomplete = dims["alto_mm"].isna() | dims["ancho_mm"].isna() | dims["grueso_mm"].isna()
+            if incomplete.any():
+                extracted = work.loc[incomplete, dim_cols["medidas"]].map(_extract_dims_from_text)
+                for i, key in enumerate(["alto_mm", "ancho_mm", "grueso_mm"]):
+                    dims[key] = dims[key].fillna(extracted.map(lambda parts: parts[i]))
+
+        table = pd.DataFrame(
+            {
+                "alto_mm": dims["alto_mm"].fillna("—"),
+                "ancho_mm": dims["ancho_mm"].fillna("—"),
+                "grueso_mm": dims["grueso_mm"].fillna("—"),
+                "color": _clean_column(work, color_cols["color"]).fillna("—"),
+                "modelo": _clean_column(work, color_cols["modelo"]),
+            }
+        )
+        table.index = pd.Index(codes[first].to_numpy(dtype=object), dtype=object, name="code")
+        table = table.astype(object).where(table.notna(), None)
+
+        columns = [table[field].tolist() for field in RECORD_FIELDS]
+        records = {
+            code: {"code": code, **dict(zip(RECORD_FIELDS, values))}
+            for code, *values in zip(table.index.tolist(), *columns)
+        }
+        return cls(table, records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def lookup(self, code: str) -> dict | None:
+        return self.records.get(normalize_code(code))
+
+    def search(self, query: str, k: int = 10) -> list[dict]:
+        """Top-k códigos para un código parcial o con erratas (ver `CodeSearchIndex`)."""
+        if self._search is None:
+            self._search = CodeSearchIndex(list(self.records))
+        return [
+            {**self.records[code], "match": kind, "score": round(score, 3)}
+            for code, kind, score in self._search.search(query, k)
+        ]
+
+    def verify_codes(self, codes: Iterable[str] | pd.Series) -> pd.DataFrame:
+        """Verificación masiva: una fila por código distinto (en orden de aparición)
+        con nº de líneas, si existe en el catálogo y su registro."""
+        counts = Counter(code for code in map(normalize_code, codes) if code)
+        keys = list(counts)
+        pos = self.table.index.get_indexer(keys)
+        found = pos >= 0
+
+        report = self.table.iloc[np.where(found, pos, 0)].reset_index(drop=True)
+        report.loc[~found, RECORD_FIELDS] = None
+        report.insert(0, "code", keys)
+        report.insert(1, "lineas", list(counts.values()))
+        report.insert(2, "encontrado", found)
+        return report
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class CodeSearchIndex:
+    """Búsqueda aproximada sobre códigos ARTICULO.
+
+    - Prefijo: lista ordenada + bisect.
+    - Subcadena (p.ej. falta el prefijo `LGFCL`) y erratas (dígitos cambiados):
+      índice invertido de trigramas; los candidatos con más trigramas en común
+      se reordenan con `difflib`.
+    """
+
+    FUZZY_CANDIDATES = 50
+
+    def __init__(self, codes: list[str]):
+        self.codes = list(codes)
+        self.sorted_codes = sorted(self.codes)
+        postings: dict[str, list[int]] = defaultdict(list)
+        for i, code in enumerate(self.codes):
+            for gram in _trigrams(code):
+                postings[gram].append(i)
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def prefix(self, prefix: str, k: int) -> list[str]:
+        start = bisect.bisect_left(self.sorted_codes, prefix)
+        out = []
+        for code in self.sorted_codes[start:]:
+            if not code.startswith(prefix) or len(out) >= k:
+                break
+            out.append(code)
+        return out
+
+    def search(self, query: str, k: int = 10) -> list[tuple[str, str, float]]:
+        """Lista de (código, tipo, score) con tipo exact / prefix / substring / fuzzy."""
+        query = normalize_code(query).replace(" ", "")
+        if not query or k <= 0:
+            return []
+
+        results: list[tuple[str, str, float]] = []
+        seen: set[str] = set()
+
+        def add(code: str, kind: str, score: float) -> None:
+            if code not in seen and len(results) < k:
+                seen.add(code)
+                results.append((code, kind, score))
+
+        for code in self.prefix(query, k):
+            add(code, "exact" if code == query else "prefix", len(query) / len(code))
+        grams = [g for g in _trigrams(query) if g in self.postings]
+        if len(results) >= k or not grams:
+            return results
+
+        hits = np.bincount(
+            np.concatenate([self.postings[g] for g in grams]),
+            minlength=len(self.codes),
+        )
+        n_query_grams = len(_trigrams(query))
+        top = np.argpartition(-hits, min(self.FUZZY_CANDIDATES, len(hits) - 1))[: self.FUZZY_CANDIDATES]
+        top = top[hits[top] > 0]
+
+        if len(grams) == n_query_grams:
+            full = [self.codes[i] for i in np.flatnonzero(hits == n_query_grams)]
+            for code in sorted(c for c in full if query in c):
+                add(code, "substring", len(query) / len(code))
+
+        scored = [
+            (difflib.SequenceMatcher(None, query, self.codes[i]).ratio(), self.codes[i])
+            for i in top.tolist()
+        ]
+        for score, code in sorted(scored, key=lambda item: (-item[0], item[1])):
+            add(code, "fuzzy", score)
+        return results
+
+
+def read_order_codes(path_or_buffer) -> pd.Series:
+    """Códigos de artículo de un pedido ALVIC (CSV `|` con `acod`, u otro CSV de códigos)."""
+    raw = path_or_buffer.read() if hasattr(path_or_buffer, "read") else Path(path_or_buffer).read_bytes()
+    text = raw.decode("utf-8-sig", errors="replace") if isinstance(raw, bytes) else str(raw)
+    # El sniffer de csv confunde letras con separadores en cabeceras cortas; se elige por frecuencia.
+    first_line = text.split("\n", 1)[0]
+    sep = max(["|", ";", ",", "\t"], key=first_line.count)
+    order = pd.read_csv(io.StringIO(text), sep=sep, dtype=str)
+    order.columns = [str(col).strip().lower() for col in order.columns]
+    # En el pedido ALVIC `referencia` es la del proyecto; el artículo va en `acod`.
+    code_col = next((c for c in ["acod", "articulo"] if c in order.columns), None)
+    return order[code_col or detect_code_column(order)].dropna()
+
+
 def format_result(item: dict | None, code: str) -> str:
     code = normalize_code(code)
     if item is None:
@@ -1,8 +1,30 @@
+import bisect
+import csv
+import hashlib
+import io
 import os
 import re
+import threading
+import time
 import unicodedata
+from collections import OrderedDict
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import numpy as np
 import pandas as pd
-from typing import Dict, Tuple, Optional, List, Any
+from typing import Dict, Tuple, Optional, List, Any, Union
+
+from utils.alvic_catalog_cache import (
+    ALTO_NUM_COL,
+    ANCHO_NUM_COL,
+    COLOR_NORM_COL,
+    DERIVED_COLS,
+    MODELO_NORM_COL,
+    VALID_COL,
+    load_catalog_frame,
+)
 
 
 # =========================================================
@@ -104,6 +126,21 @@ COLOR_CODE_MAP: Dict[str, str] = {
     for c, code in zip(CUBRO_COLORS_ORDER, ALVIC_COLOR_CODES_ORDER)
 }
 
+# Modelos ALVIC del catálogo. COLOR_TEXT_MAP usa los nombres de 06 ZENIT;
+# cada modelo escribe el mismo color a su manera en la columna Color.
+DEFAULT_ALVIC_MODEL = "06 ZENIT"
+ALVIC_MODELS = ["06 ZENIT", "08 ZENIT - FINGERPULL", "09 ZENIT - 22MM"]
+MODEL_COLOR_FORMATS: Dict[str, str] = {
+    "06 ZENIT": "{name} SM",
+    "08 ZENIT - FINGERPULL": "{name} U.{name} SM",
+    "09 ZENIT - 22MM": "{name}",
+}
+# Palabras clave en Gama / Material que envían la pieza a otro modelo (por prioridad).
+MODEL_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("08 ZENIT - FINGERPULL", ("FINGERPULL", "FINGER PULL")),
+    ("09 ZENIT - 22MM", ("22MM", "22 MM")),
+]
+
 
 # =========================================================
 # Helpers
@@ -186,6 +223,16 @@ def _float_to_comma_str(v: float, decimals: int = 3) -> str:
     return f"{v:.{decimals}f}".replace(".", ",")
 
 
+def _map_unique(series: pd.Series, func) -> pd.Series:
+    """Como `series.map(func)`, pero evaluando `func` una sola vez por valor distinto."""
+    if series.empty:
+        return series.map(func)
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    mapped = [func(u) for u in uniques]
+    values = [mapped[c] for c in codes.tolist()]
+    return pd.Series(values, index=series.index, name=series.name)
+
+
 def enforce_min_meters_series(series: pd.Series, min_m: float = 0.1) -> pd.Series:
     """Aplica mínimo sobre una serie que puede contener strings con coma o floats."""
 
@@ -197,7 +244,7 @@ def enforce_min_meters_series(series: pd.Series, min_m: float = 0.1) -> pd.Serie
             v = min_m
         return _float_to_comma_str(v, 3)
 
-    return series.apply(_fix)
+    return _map_unique(series, _fix)
 
 
 def final_safety_min_dims_on_output(
@@ -233,11 +280,48 @@ def final_safety_min_dims_on_output(
 
 
 def _safe_min_meter(series: pd.Series) -> Optional[float]:
-    vals = series.apply(_comma_str_to_float).dropna()
+    vals = _map_unique(series, _comma_str_to_float).dropna()
     if vals.empty:
         return None
     return float(vals.min())
 
+def model_color_text(color_text: Optional[str], model: str) -> Optional[str]:
+    """Traduce un color de COLOR_TEXT_MAP (formato 06 ZENIT) al texto del modelo dado."""
+    if not isinstance(color_text, str) or model == DEFAULT_ALVIC_MODEL:
+        return color_text
+    fmt = MODEL_COLOR_FORMATS.get(model)
+    if fmt is None:
+        return color_text
+    name = color_text[:-3] if color_text.endswith(" SM") else color_text
+    return fmt.format(name=name)
+
+
+def resolve_alvic_model(row: pd.Series) -> str:
+    """Modelo ALVIC de una pieza según Gama / Material (06 ZENIT por defecto)."""
+    text = " ".join(str(row[col]).upper() for col in ["Gama", "Material"] if col in row.index)
+    for model, keywords in MODEL_KEYWORDS:
+        if any(k in text for k in keywords):
+            return model
+    return DEFAULT_ALVIC_MODEL
+
+
+def resolve_alvic_model_series(df: pd.DataFrame) -> pd.Series:
+    """Versión vectorizada de `resolve_alvic_model`."""
+    model = pd.Series(DEFAULT_ALVIC_MODEL, index=df.index, dtype=object)
+    pending = pd.Series(True, index=df.index)
+    for target, keywords in MODEL_KEYWORDS:
+        hit = pd.Series(False, index=df.index)
+        for col in ["Gama", "Material"]:
+            if col in df.columns:
+                text = df[col].astype(str).str.upper()
+                for keyword in keywords:
+                    hit |= text.str.contains(keyword, regex=False, na=False)
+        hit &= pending
+        model[hit] = target
+        pending &= ~hit
+    return model
+
+
 def _is_empty_value(v) -> bool:
     """True si el valor debe considerarse vacío (incluye NaN)."""
     if v is None:
@@ -316,32 +400,102 @@ def _normalize_input_df(df: pd.DataFrame) -> pd.DataFrame:
     )
 
 
-def load_input_csv(path: str) -> pd.DataFrame:
+def _sniff_csv_dialect(path) -> Tuple[Any, int]:
+    """Detecta el dialecto con la primera línea (como `sep=None`) y cuenta sus campos."""
+    if hasattr(path, "read"):
+        path.seek(0)
+        first = path.readline()
+        path.seek(0)
+    else:
+        with open(path, "rb") as fh:
+            first = fh.readline()
+    if isinstance(first, bytes):
+        first = first.decode("utf-8-sig", errors="replace")
+    first = first.lstrip("\ufeff")
+    dialect = csv.Sniffer().sniff(first)
+    n_fields = len(next(csv.reader([first], dialect), []))
+    return dialect, n_fields
+
+
+def _csv_has_valid_header(path, **read_kwargs) -> bool:
+    if hasattr(path, "seek"):
+        path.seek(0)
+    header_df = pd.read_csv(path, nrows=0, **read_kwargs)
+    if hasattr(path, "seek"):
+        path.seek(0)
+    try:
+        _normalize_input_df(header_df)
+        return True
+    except ValueError:
+        return False
+
+
+def _headerless_columns(n_cols: int) -> List[str]:
+    return EXPECTED_COLS[: min(n_cols, len(EXPECTED_COLS))]
+
+
+def load_input_csv(path) -> pd.DataFrame:
     """
+    `path` puede ser una ruta o un buffer (p.ej. `io.BytesIO` de un upload).
     - Si el CSV viene con cabecera válida, la usa.
     - Si viene sin cabecera (como tu ejemplo), re-lee con header=None y asigna EXPECTED_COLS.
+    La cabecera se valida antes de leer el cuerpo, así que el fichero se parsea una sola vez.
     """
     read_kwargs = {"sep": None, "engine": "python"}
 
-    df = pd.read_csv(path, **read_kwargs)
-    try:
-        return _normalize_input_df(df)
-    except ValueError:
-        pass
+    if _csv_has_valid_header(path, **read_kwargs):
+        return _normalize_input_df(pd.read_csv(path, **read_kwargs))
 
     df2 = pd.read_csv(path, header=None, **read_kwargs)
     if df2.shape[1] >= MIN_REQUIRED_COLS:
-        assign_cols = EXPECTED_COLS[: min(df2.shape[1], len(EXPECTED_COLS))]
+        assign_cols = _headerless_columns(df2.shape[1])
         df2 = df2.iloc[:, : len(assign_cols)]
         df2.columns = assign_cols
         return _normalize_input_df(df2)
 
+    if hasattr(path, "seek"):
+        path.seek(0)
+    header_cols = pd.read_csv(path, nrows=0, **read_kwargs).columns.tolist()
     raise ValueError(
         "El CSV input no tiene el formato esperado.\n"
-        f"Columnas detectadas: {df.columns.tolist()} | (sin header): {df2.shape[1]} columnas"
+        f"Columnas detectadas: {header_cols} | (sin header): {df2.shape[1]} columnas"
     )
 
 
+def iter_input_csv_chunks(path, chunksize: int = 50_000):
+    """Lee un CSV CUBRO por bloques normalizados (mismas reglas que `load_input_csv`).
+
+    El dialecto se detecta una vez con la primera línea y el cuerpo se parsea
+    con el motor C en bloques de `chunksize` filas, sin cargar el fichero entero.
+    """
+    dialect, n_fields = _sniff_csv_dialect(path)
+    read_kwargs = {"sep": dialect.delimiter, "quotechar": dialect.quotechar or '"'}
+
+    if _csv_has_valid_header(path, **read_kwargs):
+        reader = pd.read_csv(path, chunksize=chunksize, **read_kwargs)
+    else:
+        if n_fields < MIN_REQUIRED_COLS:
+            raise ValueError(
+                "El CSV input no tiene el formato esperado.\n"
+                f"(sin header): {n_fields} columnas"
+            )
+        assign_cols = _headerless_columns(n_fields)
+        reader = pd.read_csv(
+            path,
+            header=None,
+            names=assign_cols,
+            usecols=range(len(assign_cols)),
+            chunksize=chunksize,
+            **read_kwargs,
+        )
+
+    with reader:
+        for chunk in reader:
+            chunk = chunk.dropna(how="all")
+            if not chunk.empty:
+                yield _normalize_input_df(chunk)
+
+
 def load_input_gsheet(values: List[List[Any]], debug: bool = False) -> pd.DataFrame:
     if not values:
         raise ValueError("La pestaña no tiene datos en A:Q")
@@ -385,27 +539,23 @@ def load_input_gsheet(values: List[List[Any]], debug: bool = False) -> pd.DataFr
 # DB ALVIC
 # =========================================================
 
-def load_alvic_db(db_csv_path: str) -> pd.DataFrame:
+def load_alvic_db(db_csv_path: str, models: Optional[List[str]] = None) -> pd.DataFrame:
+    """Catálogo ALVIC normalizado. Por defecto solo 06 ZENIT; `models` elige otros
+    (p.ej. `ALVIC_MODELS` para cargar 06/08/09 de una vez)."""
     if not os.path.exists(db_csv_path):
         raise FileNotFoundError(f"No existe la base ALVIC: {db_csv_path}")
 
-    db = pd.read_csv(db_csv_path)
-
-    # Normaliza campos clave
-    db["Modelo"] = db["Modelo"].astype(str).str.upper().str.strip()
-    db["Color_raw"] = db["Color"].astype(str).str.upper().str.strip()
+    # Catálogo compilado (columnas .npy mapeadas en memoria, se recompila solo si cambia el CSV)
+    frame = load_catalog_frame(db_csv_path)
+    raw_cols = [c for c in frame.columns if c not in DERIVED_COLS]
 
-    for c in ["Alto", "Ancho"]:
-        db[c] = pd.to_numeric(db[c], errors="coerce")
-
-    db = db.dropna(subset=["ARTICULO", "Color_raw", "Alto", "Ancho"])
-
-    # Filtra SOLO 06 ZENIT (según tu requisito)
-    db = db[
-        db["Modelo"].str.contains("ZENIT", na=False)
-        & db["Modelo"].str.contains("06", na=False)
-    ].copy()
+    keep = frame[VALID_COL].astype(bool) & frame[MODELO_NORM_COL].isin(models or [DEFAULT_ALVIC_MODEL])
 
+    # Campos clave normalizados: se toman de las columnas derivadas en la misma selección (una sola copia).
+    normalized = {"Modelo": MODELO_NORM_COL, "Color_raw": COLOR_NORM_COL, "Alto": ALTO_NUM_COL, "Ancho": ANCHO_NUM_COL}
+    names = raw_cols + [c for c in normalized if c not in raw_cols]
+    db = frame.loc[keep, [normalized.get(c, c) for c in names]]
+    db.columns = names
     return db
 
 
@@ -494,6 +644,237 @@ def _filter_db_by_color(db: pd.DataFrame, color_text: Optional[str], color_code:
     return db, "FALLBACK_NO_COLOR_FILTER"
 
 
+# =========================================================
+# Índice precalculado de la DB ALVIC
+# =========================================================
+
+class _CatalogPartition:
+    """Artículos de un mismo `Color_raw` preparados para matching rápido.
+
+    - `exact`: (Ancho, Alto) -> posición (iloc) del primer artículo en orden DB.
+    - `fit_*`: "escalera" de artículos no dominados, ordenada por
+      (area, Alto, Ancho, posición) igual que el `sort_values` de `find_best_match`.
+      Un artículo queda fuera si otro anterior en ese orden admite (con tolerancia)
+      todo lo que admite él: nunca podría ser el primero en encajar.
+    """
+
+    __slots__ = ("exact", "fit_cap_w", "fit_cap_h", "fit_pos")
+
+    def __init__(self, ancho: np.ndarray, alto: np.ndarray, pos: np.ndarray):
+        self.exact: Dict[Tuple[Any, Any], int] = {}
+        for key, p in zip(zip(ancho.tolist(), alto.tolist()), pos.tolist()):
+            self.exact.setdefault(key, p)
+
+        # Misma tolerancia que find_best_match (excepciones 1197 / 2498).
+        cap_w = ancho + np.where(ancho != 1197, 3, 0)
+        cap_h = alto + np.where(alto != 2498, 3, 0)
+
+        order = np.lexsort((pos, ancho, alto, ancho * alto))
+        kept: List[int] = []
+        # Frontera de Pareto de lo ya visto: anchos crecientes, altos decrecientes.
+        front_w: List[Any] = []
+        front_h: List[Any] = []
+        cap_w_list = cap_w.tolist()
+        cap_h_list = cap_h.tolist()
+        for i in order.tolist():
+            cw, ch = cap_w_list[i], cap_h_list[i]
+            j = bisect.bisect_left(front_w, cw)
+            if j < len(front_w) and front_h[j] >= ch:
+                continue
+            kept.append(i)
+            end = bisect.bisect_right(front_w, cw)
+            start = end
+            while start > 0 and front_h[start - 1] <= ch:
+                start -= 1
+            front_w[start:end] = [cw]
+            front_h[start:end] = [ch]
+
+        self.fit_cap_w = cap_w[kept]
+        self.fit_cap_h = cap_h[kept]
+        self.fit_pos = pos[kept]
+
+    def first_fit(self, w: int, h: int) -> Optional[int]:
+        if len(self.fit_pos) == 0:
+            return None
+        mask = (self.fit_cap_w >= w) & (self.fit_cap_h >= h)
+        i = int(mask.argmax())
+        if not mask[i]:
+            return None
+        return int(self.fit_pos[i])
+
+    def best_match(self, w: int, h: int) -> Tuple[Optional[int], str]:
+        pos = self.exact.get((w, h))
+        if pos is not None:
+            return pos, "EXACT"
+
+        pos = self.exact.get((h, w))
+        if pos is not None:
+            return pos, "ROTATED_EXACT"
+
+        pos = self.first_fit(w, h)
+        if pos is not None:
+            return pos, "FIT"
+
+        pos = self.first_fit(h, w)
+        if pos is not None:
+            return pos, "ROTATED_FIT"
+
+        return None, "NO_MATCH"
+
+
+# Tamaño del memo LRU de matches por índice (combinaciones color/ancho/alto).
+MATCH_CACHE_SIZE = 65536
+
+
+class AlvicCatalogIndex:
+    """Índice de la DB ALVIC (salida de `load_alvic_db`) particionado por
+    (`Modelo`, `Color_raw`).
+
+    Se construye una vez por catálogo y resuelve, sin recorrer el DataFrame,
+    lo mismo que `_filter_db_by_color` + `find_best_match` dentro de un modelo:
+    EXACT / ROTATED_EXACT por hash y FIT / ROTATED_FIT sobre la escalera de
+    artículos de área mínima de cada partición.
+
+    Los resultados se memorizan en un LRU acotado por (modelo, color, ancho, alto).
+    Como el memo vive en el índice, queda ligado a esa versión del catálogo
+    y se reutiliza entre proyectos mientras el índice siga cacheado.
+    """
+
+    def __init__(self, db: pd.DataFrame, match_cache_size: int = MATCH_CACHE_SIZE):
+        self.db = db
+        self.match_cache_size = match_cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._match_cache: "OrderedDict[Tuple[str, str, str, int, int], Tuple[Optional[int], str, str]]" = OrderedDict()
+        self._match_lock = threading.Lock()
+        self._version: Optional[str] = None
+
+        ancho = db["Ancho"].to_numpy()
+        alto = db["Alto"].to_numpy()
+        colors = db["Color_raw"].astype(str).to_numpy()
+        if "Modelo" in db.columns:
+            models = db["Modelo"].astype(str).to_numpy()
+        else:
+            models = np.full(len(db), DEFAULT_ALVIC_MODEL, dtype=object)
+        positions = np.arange(len(db))
+
+        self._empty = _CatalogPartition(ancho[:0], alto[:0], positions[:0])
+        self._by_model: Dict[str, _CatalogPartition] = {}
+        for model, idx in pd.Series(positions).groupby(models, sort=False):
+            pos = idx.to_numpy()
+            self._by_model[str(model)] = _CatalogPartition(ancho[pos], alto[pos], pos)
+        self._by_model_color: Dict[Tuple[str, str], _CatalogPartition] = {}
+        for (model, color), idx in pd.Series(positions).groupby([models, colors], sort=False):
+            pos = idx.to_numpy()
+            self._by_model_color[(str(model), str(color))] = _CatalogPartition(ancho[pos], alto[pos], pos)
+
+    @classmethod
+    def from_csv(cls, db_csv_path: str, models: Optional[List[str]] = None) -> "AlvicCatalogIndex":
+        """Carga el catálogo con todos los modelos de `ALVIC_MODELS` (o los indicados)."""
+        return cls(load_alvic_db(db_csv_path, models=models or ALVIC_MODELS))
+
+    @property
+    def models(self) -> List[str]:
+        return list(self._by_model)
+
+    def __len__(self) -> int:
+        return len(self.db)
+
+    @property
+    def version(self) -> str:
+        """Huella del contenido del catálogo (invalida traducciones previas si cambia)."""
+        if self._version is None:
+            cols = [c for c in ["ARTICULO", "Modelo", "Color_raw", "Ancho", "Alto", "Grueso"] if c in self.db.columns]
+            hashed = pd.util.hash_pandas_object(self.db[cols], index=False).to_numpy()
+            self._version = hashlib.sha1(hashed.tobytes()).hexdigest()[:16]
+        return self._version
+
+    def partition_for_color(
+        self,
+        color_text: Optional[str],
+        color_code: Optional[str],
+        model: str = DEFAULT_ALVIC_MODEL,
+    ) -> Tuple[_CatalogPartition, str]:
+        """Equivalente indexado de `_filter_db_by_color` dentro de un modelo.
+
+        Un modelo que no está en el catálogo cargado devuelve una partición vacía (NO_MATCH).
+        Fuera de 06 ZENIT, un color reconocido que el modelo no ofrece (08 / 09
+        solo tienen parte de la carta) también da partición vacía, con modo
+        `COLOR_NOT_IN_MODEL`: mejor NO_MATCH que pedir un artículo de otro color.
+        """
+        if color_code:
+            part = self._by_model_color.get((model, str(color_code).upper()))
+            if part is not None:
+                return part, "CODE"
+
+        if color_text:
+            part = self._by_model_color.get((model, str(color_text).upper()))
+            if part is not None:
+                return part, "TEXT"
+
+        if model != DEFAULT_ALVIC_MODEL and (color_text or color_code) and model in self._by_model:
+            return self._empty, "COLOR_NOT_IN_MODEL"
+        return self._by_model.get(model, self._empty), "FALLBACK_NO_COLOR_FILTER"
+
+    def lookup(
+        self,
+        w: int,
+        h: int,
+        color_text: Optional[str] = None,
+        color_code: Optional[str] = None,
+        model: str = DEFAULT_ALVIC_MODEL,
+    ) -> Tuple[Optional[int], str, str, bool]:
+        """(posición en `db`, match_type, color_filter_mode, vino_del_memo)."""
+        key = (model, color_text or "", color_code or "", int(w), int(h))
+        with self._match_lock:
+            cached = self._match_cache.get(key)
+            if cached is not None:
+                self._match_cache.move_to_end(key)
+                self.cache_hits += 1
+                return (*cached, True)
+
+        part, color_filter_mode = self.partition_for_color(color_text, color_code, model)
+        pos, match_type = part.best_match(int(w), int(h))
+        with self._match_lock:
+            self.cache_misses += 1
+            self._match_cache[key] = (pos, match_type, color_filter_mode)
+            if len(self._match_cache) > self.match_cache_size:
+                self._match_cache.popitem(last=False)
+        return pos, match_type, color_filter_mode, False
+
+    def match_cache_info(self) -> Dict[str, int]:
+        """Estado acumulado del memo (todas las traducciones sobre este índice)."""
+        with self._match_lock:
+            return {
+                "memo_size": len(self._match_cache),
+                "memo_max_size": self.match_cache_size,
+                "memo_total_hits": self.cache_hits,
+                "memo_total_misses": self.cache_misses,
+                "catalog_rows": len(self.db),
+                "partitions": len(self._by_model_color),
+            }
+
+    def clear_match_cache(self) -> None:
+        with self._match_lock:
+            self._match_cache.clear()
+            self.cache_hits = 0
+            self.cache_misses = 0
+
+    def find_best_match(
+        self,
+        w: int,
+        h: int,
+        color_text: Optional[str] = None,
+        color_code: Optional[str] = None,
+        model: str = DEFAULT_ALVIC_MODEL,
+    ) -> Tuple[Optional[pd.Series], str, str]:
+        """Devuelve (artículo, match_type, color_filter_mode) como el flujo sin índice."""
+        pos, match_type, color_filter_mode, _ = self.lookup(w, h, color_text, color_code, model)
+        if pos is None:
+            return None, match_type, color_filter_mode
+        return self.db.iloc[pos], match_type, color_filter_mode
+
+
 # =========================================================
 # Motor principal
 # =========================================================
@@ -608,37 +989,52 @@ def extract_filename_suffix(input_filename: Optional[str]) -> str:
     return ""
 
 
-def translate_and_split(
-    input_csv_path: str,
-    db_csv_path: str,
-    output_machined_csv_path: str,
-    output_non_machined_csv_path: str,
-    input_filename: Optional[str] = None,
-) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, int], pd.DataFrame, pd.DataFrame]:
-
-    db = load_alvic_db(db_csv_path)
-    inp = load_input_csv(input_csv_path)
+DIAG_COLUMNS = [
+    "Codigo_ALVIC",
+    "Match_type",
+    "Color_filter_mode",
+    "Color_ALVIC_text",
+    "Color_ALVIC_code",
+    "Input_Ancho_norm",
+    "Input_Alto_norm",
+    "DB_Ancho",
+    "DB_Alto",
+    "Es_LAC",
+    "Es_Mecanizada",
+    "Mec_reason",
+    "Is_Mec_Origin",
+    "Needs_Min_Fix",
+    "Is_Mec_Final",
+    "Ancho_raw",
+    "Alto_raw",
+    "Ancho_parsed_mm",
+    "Alto_parsed_mm",
+    "Output_Ancho_mm",
+    "Output_Largo_mm",
+    "Output_Grueso_mm",
+    "Cuttable_Axis_Side",
+    "Long_Axis_Raised",
+    "Original_Long_Axis_mm",
+    "Modelo_ALVIC",
+]
 
-    required_cols = ["Ancho", "Alto", "Acabado"]
-    missing = [c for c in required_cols if c not in inp.columns]
-    if missing:
-        raise ValueError(f"Faltan columnas obligatorias en input: {missing}. Disponibles: {inp.columns.tolist()}")
+TRANSLATION_ENGINES = ("columnar", "rows")
 
-    project_id_col = _choose_project_id_column(inp)
-    filename_suffix = extract_filename_suffix(input_filename)
-    is_lac_mask = inp.apply(detect_is_lac, axis=1)
-    lac_df = inp[is_lac_mask].copy()
 
+def _translate_lac_rows(
+    lac_df: pd.DataFrame,
+    catalog: AlvicCatalogIndex,
+    stats: Optional[Dict[str, int]] = None,
+) -> pd.DataFrame:
+    """Motor fila a fila (referencia): construye el diagnóstico pieza por pieza."""
     out_rows: List[dict] = []
-    min_dims_counts = {"Ancho": 0, "Alto": 0}
-    mec_override_count = 0
-    long_axis_raised_count = 0
 
     for _, row in lac_df.iterrows():
         base = row.to_dict()
 
         # Clasificación MEC basada en datos de origen (antes de corregir dimensiones)
         is_mec_origin, machined_reason = is_machined(row)
+        model = resolve_alvic_model(row)
         ancho_raw = row.get("Ancho")
         alto_raw = row.get("Alto")
         w_origin_f = parse_mm(ancho_raw)
@@ -650,18 +1046,10 @@ def translate_and_split(
         )
         is_mec_final = bool(is_mec_origin or needs_min_fix)
 
-        if (not is_mec_origin) and needs_min_fix:
-            mec_override_count += 1
-
         # Corrección de dimensiones para output (sin afectar clasificación MEC)
         w_fixed_f = enforce_min_mm(w_origin_f, min_mm=100.0)
         h_fixed_f = enforce_min_mm(h_origin_f, min_mm=100.0)
 
-        if w_origin_f is not None and w_fixed_f is not None and w_fixed_f > w_origin_f:
-            min_dims_counts["Ancho"] += 1
-        if h_origin_f is not None and h_fixed_f is not None and h_fixed_f > h_origin_f:
-            min_dims_counts["Alto"] += 1
-
         if w_fixed_f is None or h_fixed_f is None:
             out_rows.append({
                 **base,
@@ -690,6 +1078,7 @@ def translate_and_split(
                 "Cuttable_Axis_Side": "",
                 "Long_Axis_Raised": False,
                 "Original_Long_Axis_mm": "",
+                "Modelo_ALVIC": model,
             })
             continue
 
@@ -698,7 +1087,7 @@ def translate_and_split(
 
         # Mapea color
         cubro_color = _norm_str(row["Acabado"])
-        color_text = COLOR_TEXT_MAP.get(_norm_key(cubro_color))
+        color_text = model_color_text(COLOR_TEXT_MAP.get(_norm_key(cubro_color)), model)
         color_code = COLOR_CODE_MAP.get(_norm_key(cubro_color))
 
         if not (color_text or color_code):
@@ -729,14 +1118,17 @@ def translate_and_split(
                 "Cuttable_Axis_Side": "",
                 "Long_Axis_Raised": False,
                 "Original_Long_Axis_mm": "",
+                "Modelo_ALVIC": model,
             })
             continue
 
-        # Filtra DB por color (con fallback)
-        d_color, color_filter_mode = _filter_db_by_color(db, color_text=color_text, color_code=color_code)
-
-        # Matching tamaño
-        match, match_type = find_best_match(d_color, w=w, h=h)
+        # Filtra DB por color (con fallback) + matching tamaño, vía índice (memoizado)
+        match_pos, match_type, color_filter_mode, cached = catalog.lookup(
+            w=w, h=h, color_text=color_text, color_code=color_code, model=model
+        )
+        if stats is not None:
+            stats["match_cache_hits" if cached else "match_cache_misses"] += 1
+        match = None if match_pos is None else catalog.db.iloc[match_pos]
 
         if match is None:
             out_rows.append({
@@ -766,6 +1158,7 @@ def translate_and_split(
                 "Cuttable_Axis_Side": "",
                 "Long_Axis_Raised": False,
                 "Original_Long_Axis_mm": "",
+                "Modelo_ALVIC": model,
             })
         else:
             if match_type.startswith("ROTATED"):
@@ -799,9 +1192,6 @@ def translate_and_split(
                         output_ancho = int(ALVIC_MIN_LONG_MM)
                         long_axis_raised = True
 
-            if long_axis_raised:
-                long_axis_raised_count += 1
-
             out_rows.append({
                 **base,
                 "Codigo_ALVIC": match["ARTICULO"],
@@ -829,117 +1219,875 @@ def translate_and_split(
                 "Cuttable_Axis_Side": cuttable_axis_side,
                 "Long_Axis_Raised": long_axis_raised,
                 "Original_Long_Axis_mm": original_long_axis_mm,
+                "Modelo_ALVIC": model,
             })
 
     out = pd.DataFrame(out_rows)
     if out.empty:
-        out = pd.DataFrame(columns=[
-            *inp.columns.tolist(),
-            "Codigo_ALVIC",
-            "Match_type",
-            "Color_filter_mode",
-            "Color_ALVIC_text",
-            "Color_ALVIC_code",
-            "Input_Ancho_norm",
-            "Input_Alto_norm",
-            "DB_Ancho",
-            "DB_Alto",
-            "Es_LAC",
-            "Es_Mecanizada",
-            "Mec_reason",
-            "Is_Mec_Origin",
-            "Needs_Min_Fix",
-            "Is_Mec_Final",
-            "Ancho_raw",
-            "Alto_raw",
-            "Ancho_parsed_mm",
-            "Alto_parsed_mm",
-            "Output_Ancho_mm",
-            "Output_Largo_mm",
-            "Output_Grueso_mm",
-            "Cuttable_Axis_Side",
-            "Long_Axis_Raised",
-            "Original_Long_Axis_mm",
-        ])
+        out = pd.DataFrame(columns=[*lac_df.columns.tolist(), *DIAG_COLUMNS])
 
     out["Output_Ancho_m"] = out["Output_Ancho_mm"].apply(_format_meters)
     out["Output_Largo_m"] = out["Output_Largo_mm"].apply(_format_meters)
     out["Output_Grueso_m"] = out["Output_Grueso_mm"].apply(_format_meters)
+    return out
+
+
+# ---------------------------------------------------------
+# Motor columnar (mismas reglas que el motor fila a fila, en bloque)
+# ---------------------------------------------------------
+
+def detect_is_lac_mask(df: pd.DataFrame) -> pd.Series:
+    """Versión vectorizada de `detect_is_lac` para todo el DataFrame."""
+    mask = pd.Series(False, index=df.index)
+    for col in ["Material", "Gama"]:
+        if col in df.columns:
+            mask |= df[col].astype(str).str.upper().str.contains("LAC", regex=False, na=False)
+    return mask
+
+
+def _is_empty_mask(series: pd.Series) -> pd.Series:
+    """Versión vectorizada de `_is_empty_value`."""
+    text = series.astype(str).str.strip().str.casefold()
+    return series.isna() | text.isin(["", "nan", "none", "null"])
+
+
+def _parse_mm_series(series: pd.Series) -> pd.Series:
+    """Versión vectorizada de `parse_mm` (NaN donde `parse_mm` devuelve None)."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype(float)
+    return series.map(_to_float_mm).astype(float)
+
+
+def machined_rules_mask(df: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+    """Reglas A1..A4 de `is_machined` como máscaras. Devuelve (es_mec, motivo)."""
+    mech_col = "Mecanizado o sin mecanizar (vacío)"
+    if mech_col in df.columns:
+        a1 = ~_is_empty_mask(df[mech_col])
+    else:
+        a1 = pd.Series(False, index=df.index)
 
-    machined = out[out["Is_Mec_Final"] == True].copy().reset_index(drop=True)
-    non_machined = out[out["Is_Mec_Final"] == False].copy().reset_index(drop=True)
-
-    def _build_output(df: pd.DataFrame, is_mec: bool) -> pd.DataFrame:
-        df = df.copy().reset_index(drop=True)
-        out_df = pd.DataFrame()
-        project_ids = df[project_id_col].astype(str)
-        out_df["referencia"] = [
-            build_reference(pid, filename_suffix, is_mec)
-            for pid in project_ids
-        ]
-        out_df["csub"] = "430037779"
-        out_df["cordir"] = "1"
-        out_df["almacen"] = "07"
-        out_df["lin"] = range(1, len(df) + 1)
-        out_df["acod"] = df["Codigo_ALVIC"].astype(str)
-        out_df["cant"] = "1"
-        out_df["alargo"] = df["Output_Largo_m"]
-        out_df["aancho"] = df["Output_Ancho_m"]
-        out_df["agrueso"] = df["Output_Grueso_m"]
-        out_df["nplano"] = pd.NA
-
-        for col in out_df.columns:
-            if out_df[col].dtype == object:
-                out_df[col] = out_df[col].map(sanitize_no_spaces)
-
-        return out_df[OUTPUT_COLUMNS]
-
-    output_machined = _build_output(machined, True)
-    output_non_machined = _build_output(non_machined, False)
-
-    # Regla final a prueba de balas: aplicar sobre columnas exactas de salida,
-    # justo antes de exportar CSV. Pasa el eje cortable por fila para reforzar
-    # el mínimo ALVIC (250 mm) sobre el lado largo del panel.
-    machined_axis = (
-        machined["Cuttable_Axis_Side"]
-        if "Cuttable_Axis_Side" in machined.columns
-        else pd.Series([""] * len(machined))
+    if "Modelo de tirador" in df.columns:
+        a2 = (
+            df["Modelo de tirador"].astype(str).str.casefold()
+            .str.contains("round|square|pill", regex=True, na=False)
+        )
+    else:
+        a2 = pd.Series(False, index=df.index)
+
+    w = _parse_mm_series(df["Ancho"]) if "Ancho" in df.columns else pd.Series(np.nan, index=df.index)
+    h = _parse_mm_series(df["Alto"]) if "Alto" in df.columns else pd.Series(np.nan, index=df.index)
+    missing_dims = w.isna() | h.isna()
+
+    reason = np.select(
+        [
+            a1.to_numpy(dtype=bool),
+            a2.to_numpy(dtype=bool),
+            missing_dims.to_numpy(dtype=bool),
+            ((w < 100) | (h < 100)).to_numpy(dtype=bool),
+            ((w < 250) & (h < 250)).to_numpy(dtype=bool),
+        ],
+        ["A1_mecanizado_text", "A2_handle_model", "NO", "A3_lt_100", "A4_lt_250x250"],
+        default="NO",
     )
-    non_machined_axis = (
-        non_machined["Cuttable_Axis_Side"]
-        if "Cuttable_Axis_Side" in non_machined.columns
-        else pd.Series([""] * len(non_machined))
+    reason_s = pd.Series(reason, index=df.index, dtype=object)
+    return reason_s != "NO", reason_s
+
+
+def _format_meters_series(series: pd.Series) -> np.ndarray:
+    """Versión vectorizada de `_format_meters` para columnas de mm (enteros o "")."""
+    mm = pd.to_numeric(series, errors="coerce").astype(float).to_numpy()
+    valid = ~np.isnan(mm)
+    out = np.full(len(mm), "", dtype=object)
+    if valid.any():
+        text = np.char.mod("%.3f", mm[valid] / 1000)
+        out[valid] = np.char.replace(text, ".", ",").astype(object)
+    return out
+
+
+def _translate_lac_columnar(
+    lac_df: pd.DataFrame,
+    catalog: AlvicCatalogIndex,
+    stats: Optional[Dict[str, int]] = None,
+    mec_rules: Optional[Tuple[pd.Series, pd.Series]] = None,
+) -> pd.DataFrame:
+    """Motor columnar: mismo diagnóstico que `_translate_lac_rows`, calculado en bloque.
+
+    `mec_rules` es la salida de `machined_rules_mask(lac_df)` si ya se calculó
+    (p.ej. el benchmark la mide como etapa propia); si no, se calcula aquí.
+    """
+    base = lac_df.reset_index(drop=True)
+    n = len(base)
+    if n == 0:
+        out = pd.DataFrame(columns=[*lac_df.columns.tolist(), *DIAG_COLUMNS])
+        for col in ["Output_Ancho_m", "Output_Largo_m", "Output_Grueso_m"]:
+            out[col] = pd.Series(dtype=object)
+        return out
+
+    is_mec_origin, machined_reason = mec_rules if mec_rules is not None else machined_rules_mask(base)
+    is_mec_origin = is_mec_origin.to_numpy(dtype=bool)
+
+    w_origin = _parse_mm_series(base["Ancho"]).to_numpy()
+    h_origin = _parse_mm_series(base["Alto"]).to_numpy()
+    needs_min_fix = (w_origin < 100) | (h_origin < 100)
+    is_mec_final = is_mec_origin | needs_min_fix
+
+    # Corrección de dimensiones para output (sin afectar clasificación MEC)
+    w_fixed = np.where(w_origin < 100, 100.0, w_origin)
+    h_fixed = np.where(h_origin < 100, 100.0, h_origin)
+    valid_dims = ~(np.isnan(w_fixed) | np.isnan(h_fixed))
+    w_int = np.where(valid_dims, np.rint(np.nan_to_num(w_fixed)), 0).astype(np.int64)
+    h_int = np.where(valid_dims, np.rint(np.nan_to_num(h_fixed)), 0).astype(np.int64)
+
+    # Mapea color
+    color_key = base["Acabado"].map(_norm_key)
+    color_text = color_key.map(COLOR_TEXT_MAP).to_numpy(dtype=object)
+    color_code = color_key.map(COLOR_CODE_MAP).to_numpy(dtype=object)
+    known_color = pd.notna(color_text) | pd.notna(color_code)
+
+    # Modelo ALVIC por pieza; el texto de color se adapta al formato de cada modelo.
+    model = resolve_alvic_model_series(base).to_numpy(dtype=object)
+    routed = np.flatnonzero(model != DEFAULT_ALVIC_MODEL)
+    if len(routed):
+        color_text[routed] = [model_color_text(t, m) for t, m in zip(color_text[routed], model[routed])]
+
+    bad_dims = ~valid_dims
+    unknown_color = valid_dims & ~known_color
+    to_match = valid_dims & known_color
+
+    # Matching por lotes: una consulta al índice por combinación distinta.
+    match_pos = np.full(n, -1, dtype=np.int64)
+    match_type = np.full(n, "", dtype=object)
+    color_mode = np.full(n, "", dtype=object)
+    match_type[bad_dims] = "BAD_DIMS"
+    match_type[unknown_color] = "UNKNOWN_COLOR"
+
+    rows_to_match = np.flatnonzero(to_match)
+    if len(rows_to_match):
+        keys = pd.MultiIndex.from_arrays([
+            model[rows_to_match],
+            pd.Series(color_text[rows_to_match]).fillna(""),
+            pd.Series(color_code[rows_to_match]).fillna(""),
+            w_int[rows_to_match],
+            h_int[rows_to_match],
+        ])
+        codes, uniques = keys.factorize()
+        u_pos = np.full(len(uniques), -1, dtype=np.int64)
+        u_type = np.empty(len(uniques), dtype=object)
+        u_mode = np.empty(len(uniques), dtype=object)
+        misses = 0
+        for i, (c_model, c_text, c_code, w, h) in enumerate(uniques):
+            pos, mtype, mode, cached = catalog.lookup(int(w), int(h), c_text or None, c_code or None, c_model)
+            misses += not cached
+            u_pos[i] = -1 if pos is None else pos
+            u_type[i] = mtype
+            u_mode[i] = mode
+        if stats is not None:
+            # Las filas repetidas dentro del lote cuentan como aciertos, igual que en el motor fila a fila.
+            stats["match_cache_misses"] += misses
+            stats["match_cache_hits"] += len(rows_to_match) - misses
+        match_pos[rows_to_match] = u_pos[codes]
+        match_type[rows_to_match] = u_type[codes]
+        color_mode[rows_to_match] = u_mode[codes]
+
+    matched = match_pos >= 0
+    db = catalog.db
+    safe_pos = np.where(matched, match_pos, 0)
+
+    def _db_values(col: str, dtype=None) -> np.ndarray:
+        # Con un catálogo vacío no hay posición 0: nada casa y todo queda en blanco.
+        values = db[col].to_numpy(dtype=dtype)
+        return values[safe_pos] if len(values) else np.full(n, np.nan, dtype=object)
+
+    db_ancho = _db_values("Ancho")
+    db_alto = _db_values("Alto")
+    db_ancho_ok = matched & pd.notna(db_ancho)
+    db_alto_ok = matched & pd.notna(db_alto)
+
+    # Orientación de salida: ROTATED_* intercambia largo/ancho.
+    rotated = matched & pd.Series(match_type).str.startswith("ROTATED").to_numpy(dtype=bool)
+    out_largo = np.where(rotated, w_int, h_int)
+    out_ancho = np.where(rotated, h_int, w_int)
+
+    # Eje cortable del panel y mínimo ALVIC (250 mm), igual que el motor fila a fila.
+    panel_ok = db_ancho_ok & db_alto_ok
+    panel_alto = np.where(panel_ok, np.nan_to_num(db_alto.astype(float)), 0).astype(np.int64)
+    panel_ancho = np.where(panel_ok, np.nan_to_num(db_ancho.astype(float)), 0).astype(np.int64)
+    axis_largo = panel_ok & (panel_alto > panel_ancho)
+    axis_ancho = panel_ok & (panel_ancho > panel_alto)
+    raise_largo = axis_largo & (out_largo < ALVIC_MIN_LONG_MM)
+    raise_ancho = axis_ancho & (out_ancho < ALVIC_MIN_LONG_MM)
+    long_axis_raised = raise_largo | raise_ancho
+    original_long = np.where(raise_largo, out_largo, out_ancho)
+    out_largo = np.where(raise_largo, int(ALVIC_MIN_LONG_MM), out_largo)
+    out_ancho = np.where(raise_ancho, int(ALVIC_MIN_LONG_MM), out_ancho)
+
+    def _ints_or_blank(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        col = np.full(n, "", dtype=object)
+        col[mask] = values[mask].astype(np.int64).tolist()
+        return col
+
+    def _values_or_blank(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        col = np.full(n, "", dtype=object)
+        col[mask] = values[mask]
+        return col
+
+    articulo = _db_values("ARTICULO", dtype=object)
+    if "Grueso" in db.columns:
+        grueso = _values_or_blank(_db_values("Grueso", dtype=object), matched)
+    else:
+        grueso = np.full(n, "", dtype=object)
+
+    has_color_cols = to_match
+    axis_side = np.full(n, "", dtype=object)
+    axis_side[axis_largo] = "alargo"
+    axis_side[axis_ancho] = "aancho"
+
+    diag_data = {
+        "Codigo_ALVIC": _values_or_blank(articulo, matched),
+        "Match_type": match_type,
+        "Color_filter_mode": color_mode,
+        "Color_ALVIC_text": _values_or_blank(color_text, has_color_cols & pd.notna(color_text)),
+        "Color_ALVIC_code": _values_or_blank(color_code, has_color_cols & pd.notna(color_code)),
+        "Input_Ancho_norm": _ints_or_blank(w_int, valid_dims),
+        "Input_Alto_norm": _ints_or_blank(h_int, valid_dims),
+        "DB_Ancho": _ints_or_blank(np.nan_to_num(db_ancho.astype(float)), db_ancho_ok),
+        "DB_Alto": _ints_or_blank(np.nan_to_num(db_alto.astype(float)), db_alto_ok),
+        "Es_LAC": np.full(n, True),
+        "Es_Mecanizada": is_mec_final,
+        "Mec_reason": machined_reason.to_numpy(dtype=object),
+        "Is_Mec_Origin": is_mec_origin,
+        "Needs_Min_Fix": needs_min_fix,
+        "Is_Mec_Final": is_mec_final,
+        "Ancho_raw": base["Ancho"],
+        "Alto_raw": base["Alto"],
+        "Ancho_parsed_mm": w_origin,
+        "Alto_parsed_mm": h_origin,
+        "Output_Ancho_mm": _ints_or_blank(out_ancho, valid_dims),
+        "Output_Largo_mm": _ints_or_blank(out_largo, valid_dims),
+        "Output_Grueso_mm": grueso,
+        "Cuttable_Axis_Side": axis_side,
+        "Long_Axis_Raised": long_axis_raised,
+        "Original_Long_Axis_mm": _ints_or_blank(original_long, long_axis_raised),
+        "Modelo_ALVIC": model,
+    }
+    diag = pd.DataFrame({
+        col: (values.to_numpy() if isinstance(values, pd.Series) else values)
+        for col, values in diag_data.items()
+    })
+    # Columnas mixtas ("" + enteros) quedan object; el resto recupera su dtype.
+    diag = diag.infer_objects()
+
+    out = base.copy()
+    overlapping = [c for c in diag.columns if c in out.columns]
+    for col in overlapping:
+        out[col] = diag.pop(col)
+    out = pd.concat([out, diag], axis=1)
+
+    out["Output_Ancho_m"] = _format_meters_series(out["Output_Ancho_mm"])
+    out["Output_Largo_m"] = _format_meters_series(out["Output_Largo_mm"])
+    out["Output_Grueso_m"] = _format_meters_series(out["Output_Grueso_mm"])
+    return out
+
+
+# ---------------------------------------------------------
+# Re-traducción incremental (reutiliza el diagnóstico de la ejecución anterior)
+# ---------------------------------------------------------
+
+def _input_row_hashes(df: pd.DataFrame, cols: List[str]) -> np.ndarray:
+    # Se hashea el texto de cada celda para que un cambio de dtype no cuente como edición.
+    return pd.util.hash_pandas_object(df[cols].astype(str), index=False).to_numpy()
+
+
+def _previous_row_positions(
+    lac_df: pd.DataFrame,
+    previous_diag: Optional[pd.DataFrame],
+    catalog_version: str,
+) -> Optional[np.ndarray]:
+    """Posición en `previous_diag` de cada fila LAC sin cambios (-1 = nueva o editada).
+
+    Devuelve None si el diagnóstico anterior no es reutilizable (otro catálogo,
+    columnas distintas o colisión de nombres con las columnas de diagnóstico).
+    """
+    if previous_diag is None or previous_diag.empty or lac_df.empty:
+        return None
+    if previous_diag.attrs.get("catalog_version") != catalog_version:
+        return None
+    input_cols = lac_df.columns.tolist()
+    if any(c in DIAG_COLUMNS for c in input_cols):
+        return None
+    if any(c not in previous_diag.columns for c in [*input_cols, *DIAG_COLUMNS]):
+        return None
+
+    prev_hashes = _input_row_hashes(previous_diag, input_cols)
+    first_pos: Dict[int, int] = {}
+    for pos, row_hash in enumerate(prev_hashes.tolist()):
+        first_pos.setdefault(row_hash, pos)
+    new_hashes = _input_row_hashes(lac_df, input_cols)
+    return np.array([first_pos.get(h, -1) for h in new_hashes.tolist()], dtype=np.int64)
+
+
+def _translate_lac_incremental(
+    lac_df: pd.DataFrame,
+    catalog: AlvicCatalogIndex,
+    translate_fn,
+    stats: Dict[str, int],
+    previous_diag: Optional[pd.DataFrame],
+) -> pd.DataFrame:
+    """Traduce solo las filas nuevas/editadas y reutiliza el diagnóstico del resto.
+
+    El orden de `lac_df` se conserva, así que `lin` y el orden de salida no cambian.
+    """
+    prev_pos = _previous_row_positions(lac_df, previous_diag, catalog.version)
+    stats["rows_reused"] = 0
+    if prev_pos is None or (prev_pos < 0).all():
+        return translate_fn(lac_df, catalog, stats)
+
+    changed = prev_pos < 0
+    fresh = translate_fn(lac_df[changed], catalog, stats)
+    diag_cols = [c for c in fresh.columns if c not in lac_df.columns]
+
+    reused = previous_diag.iloc[prev_pos[~changed]][diag_cols]
+    parts = [reused.set_axis(np.flatnonzero(~changed))]
+    if changed.any():
+        parts.append(fresh[diag_cols].set_axis(np.flatnonzero(changed)))
+    diag = pd.concat(parts).sort_index().reset_index(drop=True)
+    stats["rows_reused"] = int((~changed).sum())
+
+    return pd.concat([lac_df.reset_index(drop=True), diag], axis=1)
+
+
+def _build_output(
+    df: pd.DataFrame,
+    is_mec: bool,
+    project_id_col: str,
+    filename_suffix: str,
+) -> pd.DataFrame:
+    df = df.copy().reset_index(drop=True)
+    out_df = pd.DataFrame()
+    project_ids = df[project_id_col].astype(str)
+    out_df["referencia"] = _map_unique(
+        project_ids, lambda pid: build_reference(pid, filename_suffix, is_mec)
+    ).tolist()
+    out_df["csub"] = "430037779"
+    out_df["cordir"] = "1"
+    out_df["almacen"] = "07"
+    out_df["lin"] = range(1, len(df) + 1)
+    out_df["acod"] = df["Codigo_ALVIC"].astype(str)
+    out_df["cant"] = "1"
+    out_df["alargo"] = df["Output_Largo_m"]
+    out_df["aancho"] = df["Output_Ancho_m"]
+    out_df["agrueso"] = df["Output_Grueso_m"]
+    out_df["nplano"] = pd.NA
+
+    for col in out_df.columns:
+        if out_df[col].dtype == object:
+            out_df[col] = _map_unique(out_df[col], sanitize_no_spaces)
+
+    return out_df[OUTPUT_COLUMNS]
+
+
+def to_alvic_csv_bytes(df: pd.DataFrame) -> bytes:
+    """Serializa un output ALVIC al formato de descarga (pipe, coma decimal, UTF-8 BOM)."""
+    export_df = df.copy()
+    for col in ["alargo", "aancho", "agrueso"]:
+        if col in export_df.columns:
+            export_df[col] = pd.to_numeric(
+                export_df[col].astype(str).str.strip().str.replace(",", ".", regex=False),
+                errors="coerce",
+            )
+    csv_buffer = io.BytesIO()
+    export_df.to_csv(
+        csv_buffer,
+        index=False,
+        sep="|",
+        decimal=",",
+        float_format="%.3f",
+        lineterminator="\n",
+        encoding="utf-8-sig",
+        quoting=csv.QUOTE_NONE,
+        escapechar="\\",
     )
-    output_machined = final_safety_min_dims_on_output(
-        output_machined, cuttable_axis=machined_axis
+    return csv_buffer.getvalue()
+
+
+@dataclass
+class TranslationResult:
+    """Resultado completo de una traducción, sin pasar por disco."""
+
+    machined: pd.DataFrame
+    non_machined: pd.DataFrame
+    summary: Dict[str, int]
+    no_match: pd.DataFrame
+    diag: pd.DataFrame
+    machined_csv: bytes = b""
+    non_machined_csv: bytes = b""
+
+    def as_tuple(self) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, int], pd.DataFrame, pd.DataFrame]:
+        return self.machined, self.non_machined, self.summary, self.no_match, self.diag
+
+
+class PipelineProfiler:
+    """Tiempo y filas por etapa del pipeline. Desactivado no mide nada."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None):
+        """Mide el bloque; el dict cedido permite fijar `rows` cuando se conoce al final."""
+        record: Dict[str, Any] = {"seconds": 0.0, "rows": rows}
+        if not self.enabled:
+            yield record
+            return
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self.stages[name] = record
+
+    def report(self, **extra: Any) -> Dict[str, Any]:
+        total = sum(st["seconds"] for st in self.stages.values())
+        return {"stages": dict(self.stages), "total_seconds": total, **extra}
+
+
+def translate_dataframe(
+    inp: pd.DataFrame,
+    catalog: Union[AlvicCatalogIndex, pd.DataFrame],
+    input_filename: Optional[str] = None,
+    engine: str = "columnar",
+    previous_diag: Optional[pd.DataFrame] = None,
+    profile: Union[bool, PipelineProfiler] = False,
+    build_csv: bool = True,
+) -> TranslationResult:
+    """Traduce un input CUBRO ya normalizado (p.ej. `load_input_csv` / `load_input_gsheet`).
+
+    `catalog` es el índice precargado (o el DataFrame de `load_alvic_db`).
+    No lee ni escribe ficheros: los CSV ALVIC se devuelven en memoria.
+    `engine="columnar"` (por defecto) calcula el diagnóstico en bloque;
+    `engine="rows"` conserva el motor fila a fila original como referencia.
+    `previous_diag` (el `diag` de una ejecución anterior con el mismo catálogo)
+    permite re-traducir solo las filas añadidas o editadas.
+    Con `profile=True` el resultado trae tiempos/filas por etapa y estadísticas
+    de consultas al catálogo en `summary["perf"]`.
+    Con `build_csv=False` no se generan `machined_csv` / `non_machined_csv`
+    (quedan vacíos), para quien escribe la salida por su cuenta.
+    """
+    if engine not in TRANSLATION_ENGINES:
+        raise ValueError(f"Motor de traducción desconocido: {engine}. Opciones: {TRANSLATION_ENGINES}")
+    prof = profile if isinstance(profile, PipelineProfiler) else PipelineProfiler(bool(profile))
+    if not isinstance(catalog, AlvicCatalogIndex):
+        with prof.stage("catalog_index", rows=len(catalog)):
+            catalog = AlvicCatalogIndex(catalog)
+
+    required_cols = ["Ancho", "Alto", "Acabado"]
+    missing = [c for c in required_cols if c not in inp.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias en input: {missing}. Disponibles: {inp.columns.tolist()}")
+
+    project_id_col = _choose_project_id_column(inp)
+    filename_suffix = extract_filename_suffix(input_filename)
+
+    match_stats = {"match_cache_hits": 0, "match_cache_misses": 0}
+    with prof.stage("lac_detection", rows=len(inp)):
+        if engine == "rows":
+            is_lac_mask = inp.apply(detect_is_lac, axis=1)
+            lac_df = inp[is_lac_mask].copy()
+            translate_fn = _translate_lac_rows
+        else:
+            lac_df = inp[detect_is_lac_mask(inp)]
+            translate_fn = _translate_lac_columnar
+    with prof.stage("matching", rows=len(lac_df)):
+        out = _translate_lac_incremental(lac_df, catalog, translate_fn, match_stats, previous_diag)
+        out.attrs["catalog_version"] = catalog.version
+
+    with prof.stage("output_build", rows=len(out)):
+        machined = out[out["Is_Mec_Final"] == True].copy().reset_index(drop=True)
+        non_machined = out[out["Is_Mec_Final"] == False].copy().reset_index(drop=True)
+
+        output_machined = _build_output(machined, True, project_id_col, filename_suffix)
+        output_non_machined = _build_output(non_machined, False, project_id_col, filename_suffix)
+
+    with prof.stage("final_safety", rows=len(out)):
+        # Regla final a prueba de balas: aplicar sobre columnas exactas de salida,
+        # justo antes de exportar CSV. Pasa el eje cortable por fila para reforzar
+        # el mínimo ALVIC (250 mm) sobre el lado largo del panel.
+        machined_axis = (
+            machined["Cuttable_Axis_Side"]
+            if "Cuttable_Axis_Side" in machined.columns
+            else pd.Series([""] * len(machined))
+        )
+        non_machined_axis = (
+            non_machined["Cuttable_Axis_Side"]
+            if "Cuttable_Axis_Side" in non_machined.columns
+            else pd.Series([""] * len(non_machined))
+        )
+        output_machined = final_safety_min_dims_on_output(
+            output_machined, cuttable_axis=machined_axis
+        )
+        output_non_machined = final_safety_min_dims_on_output(
+            output_non_machined, cuttable_axis=non_machined_axis
+        )
+
+        # Check mínimo automático para evitar regresiones.
+        for df_out in (output_machined, output_non_machined):
+            for col in ["aancho", "alargo"]:
+                if col in df_out.columns:
+                    min_value = _safe_min_meter(df_out[col])
+                    assert min_value is None or min_value >= 0.1, f"{col} contiene valores < 0,100m"
+
+    with prof.stage("summary", rows=len(out)):
+        no_match = out[out["Codigo_ALVIC"] == ""].copy()
+        summary = _build_summary(out, machined, non_machined)
+        summary.update(match_stats)
+
+    machined_csv = non_machined_csv = b""
+    if build_csv:
+        with prof.stage("csv_export", rows=len(output_machined) + len(output_non_machined)):
+            machined_csv = to_alvic_csv_bytes(output_machined)
+            non_machined_csv = to_alvic_csv_bytes(output_non_machined)
+
+    if prof.enabled:
+        lookups = match_stats["match_cache_hits"] + match_stats["match_cache_misses"]
+        summary["perf"] = prof.report(
+            engine=engine,
+            lookups={
+                "rows_looked_up": lookups,
+                "catalog_queries": match_stats["match_cache_misses"],
+                "memo_hit_rate": match_stats["match_cache_hits"] / lookups if lookups else 0.0,
+                **catalog.match_cache_info(),
+            },
+        )
+
+    return TranslationResult(
+        machined=output_machined,
+        non_machined=output_non_machined,
+        summary=summary,
+        no_match=no_match,
+        diag=out,
+        machined_csv=machined_csv,
+        non_machined_csv=non_machined_csv,
     )
-    output_non_machined = final_safety_min_dims_on_output(
-        output_non_machined, cuttable_axis=non_machined_axis
+
+
+def translate_and_split(
+    input_csv_path: str,
+    db_csv_path: str,
+    output_machined_csv_path: str,
+    output_non_machined_csv_path: str,
+    input_filename: Optional[str] = None,
+    engine: str = "columnar",
+    previous_diag: Optional[pd.DataFrame] = None,
+    profile: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, int], pd.DataFrame, pd.DataFrame]:
+    """Wrapper por rutas de `translate_dataframe` (compatibilidad): lee input y DB
+    desde disco y escribe los dos outputs como CSV. Con `profile=True`,
+    `summary["perf"]` incluye también la carga de catálogo, input y escritura."""
+    prof = PipelineProfiler(profile)
+    with prof.stage("catalog_load") as stage:
+        catalog = AlvicCatalogIndex.from_csv(db_csv_path)
+        stage["rows"] = len(catalog)
+    with prof.stage("csv_load") as stage:
+        inp = load_input_csv(input_csv_path)
+        stage["rows"] = len(inp)
+
+    result = translate_dataframe(
+        inp,
+        catalog,
+        input_filename=input_filename,
+        engine=engine,
+        previous_diag=previous_diag,
+        profile=prof,
+        build_csv=False,
     )
 
-    # Check mínimo automático para evitar regresiones.
-    for df_out in (output_machined, output_non_machined):
-        for col in ["aancho", "alargo"]:
-            if col in df_out.columns:
-                min_value = _safe_min_meter(df_out[col])
-                assert min_value is None or min_value >= 0.1, f"{col} contiene valores < 0,100m"
+    with prof.stage("csv_write", rows=len(result.machined) + len(result.non_machined)):
+        result.machined.to_csv(output_machined_csv_path, index=False)
+        result.non_machined.to_csv(output_non_machined_csv_path, index=False)
+    if profile:
+        result.summary["perf"].update(prof.report())
+
+    return result.as_tuple()
+
+
+def _csv_chunk_bytes(df: pd.DataFrame, csv_format: str) -> bytes:
+    if csv_format == "alvic":
+        return to_alvic_csv_bytes(df)
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def _strip_csv_header(data: bytes) -> bytes:
+    return data.split(b"\n", 1)[1] if b"\n" in data else b""
 
-    output_machined.to_csv(output_machined_csv_path, index=False)
-    output_non_machined.to_csv(output_non_machined_csv_path, index=False)
 
-    no_match = out[out["Codigo_ALVIC"] == ""].copy()
-    bad_dims = out[out["Match_type"] == "BAD_DIMS"].copy()
-    no_match_only = out[out["Match_type"] == "NO_MATCH"].copy()
-    summary = {
+def translate_and_split_streaming(
+    input_csv_path,
+    catalog: Union[AlvicCatalogIndex, str],
+    output_machined_csv_path: str,
+    output_non_machined_csv_path: str,
+    input_filename: Optional[str] = None,
+    engine: str = "columnar",
+    chunksize: int = 50_000,
+    csv_format: str = "plain",
+) -> Dict[str, int]:
+    """Versión por bloques de `translate_and_split` para inputs muy grandes.
+
+    Lee el input en bloques (`iter_input_csv_chunks`), traduce cada bloque y
+    lo añade a los dos CSV de salida; `lin` continúa entre bloques. Solo se
+    devuelve el `summary` acumulado: la memoria no crece con el tamaño del input.
+    `csv_format="plain"` escribe como `translate_and_split`; `"alvic"`, como la descarga
+    (`to_alvic_csv_bytes`).
+    """
+    if csv_format not in ("plain", "alvic"):
+        raise ValueError(f"Formato de salida desconocido: {csv_format}")
+    if not isinstance(catalog, AlvicCatalogIndex):
+        catalog = AlvicCatalogIndex.from_csv(catalog)
+
+    summary: Dict[str, int] = {}
+    with open(output_machined_csv_path, "wb") as fh_m, open(output_non_machined_csv_path, "wb") as fh_nm:
+        # Por fichero de salida: [filas escritas, cabecera ya escrita]
+        state = {id(fh_m): [0, False], id(fh_nm): [0, False]}
+        for chunk in iter_input_csv_chunks(input_csv_path, chunksize=chunksize):
+            # Cada bloque se serializa abajo en `csv_format`: los bytes ALVIC del resultado sobran.
+            result = translate_dataframe(chunk, catalog, input_filename=input_filename, engine=engine, build_csv=False)
+            for out_df, fh in ((result.machined, fh_m), (result.non_machined, fh_nm)):
+                rows_written, header_done = state[id(fh)]
+                if header_done and out_df.empty:
+                    continue
+                out_df = out_df.assign(lin=out_df["lin"] + rows_written)
+                data = _csv_chunk_bytes(out_df, csv_format)
+                fh.write(_strip_csv_header(data) if header_done else data)
+                state[id(fh)] = [rows_written + len(out_df), True]
+            for key, value in result.summary.items():
+                summary[key] = summary.get(key, 0) + int(value)
+
+        for fh in (fh_m, fh_nm):
+            if not state[id(fh)][1]:
+                fh.write(_csv_chunk_bytes(pd.DataFrame(columns=OUTPUT_COLUMNS), csv_format))
+
+    return summary
+
+
+def _build_summary(out: pd.DataFrame, machined: pd.DataFrame, non_machined: pd.DataFrame) -> Dict[str, int]:
+    """Contadores de negocio derivados del DataFrame de diagnóstico."""
+    w_parsed = pd.to_numeric(out["Ancho_parsed_mm"], errors="coerce")
+    h_parsed = pd.to_numeric(out["Alto_parsed_mm"], errors="coerce")
+    mec_overrides = (out["Is_Mec_Origin"] == False) & (out["Needs_Min_Fix"] == True)
+    return {
         "total_lac": int(len(out)),
         "total_mec": int(len(machined)),
         "total_sin_mec": int(len(non_machined)),
-        "total_no_match": int(len(no_match_only)),
-        "total_bad_dims": int(len(bad_dims)),
-        "dims_raised_ancho": int(min_dims_counts.get("Ancho", 0)),
-        "dims_raised_alto": int(min_dims_counts.get("Alto", 0)),
-        "mec_overrides_by_min_fix": int(mec_override_count),
-        "total_raised_to_min_long": int(long_axis_raised_count),
+        "total_no_match": int((out["Match_type"] == "NO_MATCH").sum()),
+        "total_bad_dims": int((out["Match_type"] == "BAD_DIMS").sum()),
+        "dims_raised_ancho": int((w_parsed < 100).sum()),
+        "dims_raised_alto": int((h_parsed < 100).sum()),
+        "mec_overrides_by_min_fix": int(mec_overrides.sum()),
+        "total_raised_to_min_long": int((out["Long_Axis_Raised"] == True).sum()),
     }
 
-    return output_machined, output_non_machined, summary, no_match, out
+
+def alvic_download_names(
+    result: TranslationResult,
+    inp: pd.DataFrame,
+    input_filename: Optional[str] = None,
+) -> Tuple[str, str]:
+    """Nombres de descarga (MEC, SIN MEC): la referencia del output o, si está vacío,
+    la derivada del ID de proyecto + sufijo del nombre de archivo."""
+    project_id = ""
+    for id_col in ["ID de Proyecto", "ProjectID"]:
+        if id_col in inp.columns:
+            series = inp[id_col].dropna()
+            if not series.empty:
+                project_id = str(series.iloc[0]).strip()
+                break
+    project_id = project_id.replace("/", "-").replace("\\", "-")
+
+    filename_suffix = extract_filename_suffix(input_filename)
+    ref_base = f"{project_id}_{filename_suffix}" if filename_suffix else project_id
+
+    mec_ref = ""
+    if not result.machined.empty and "referencia" in result.machined.columns:
+        mec_ref = str(result.machined.iloc[0]["referencia"]).strip()
+    if not mec_ref:
+        mec_ref = build_mec_reference(ref_base)
+
+    non_mec_ref = ""
+    if not result.non_machined.empty and "referencia" in result.non_machined.columns:
+        non_mec_ref = str(result.non_machined.iloc[0]["referencia"]).strip()
+    if not non_mec_ref:
+        non_mec_ref = build_non_mec_reference_from_mec(mec_ref)
+
+    mec_name = f"{mec_ref}.csv" if mec_ref else "MEC.csv"
+    non_mec_name = f"{non_mec_ref}.csv" if non_mec_ref else "sin_mecanizar.csv"
+    return sanitize_no_spaces(mec_name), sanitize_no_spaces(non_mec_name)
+
+
+# =========================================================
+# Traducción por lotes (varios proyectos)
+# =========================================================
+
+@dataclass(frozen=True)
+class SheetTabRef:
+    """Pestaña de Google Sheets a traducir dentro de un lote."""
+
+    spreadsheet_id: str
+    sheet_title: str
+    range_a1: str = "A:Q"
+
+    @property
+    def name(self) -> str:
+        return f"{self.sheet_title}.csv"
+
+
+@dataclass
+class BatchProjectResult:
+    name: str
+    result: Optional[TranslationResult] = None
+    error: str = ""
+    mec_filename: str = ""
+    non_mec_filename: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.result is not None
+
+
+@dataclass
+class BatchResult:
+    projects: List[BatchProjectResult]
+    summary: Dict[str, int]
+    zip_bytes: bytes = b""
+    failed: List[BatchProjectResult] = field(default_factory=list)
+
+
+# Catálogo cargado una sola vez por proceso worker (ver `_init_batch_worker`).
+_BATCH_CATALOG: Optional[AlvicCatalogIndex] = None
+
+
+def _init_batch_worker(db_csv_path: str) -> None:
+    global _BATCH_CATALOG
+    _BATCH_CATALOG = AlvicCatalogIndex.from_csv(db_csv_path)
+
+
+def _translate_batch_job(job: Tuple[str, str, Any], catalog: Optional[AlvicCatalogIndex] = None) -> BatchProjectResult:
+    """Traduce un proyecto del lote. Nunca lanza: los errores quedan en `error`."""
+    name, kind, payload = job
+    try:
+        if kind == "csv":
+            inp = load_input_csv(io.BytesIO(payload) if isinstance(payload, bytes) else payload)
+        else:
+            inp = load_input_gsheet(payload)
+        result = translate_dataframe(inp, catalog if catalog is not None else _BATCH_CATALOG, input_filename=name)
+        mec_name, non_mec_name = alvic_download_names(result, inp, name)
+        return BatchProjectResult(name, result, mec_filename=mec_name, non_mec_filename=non_mec_name)
+    except Exception as exc:
+        return BatchProjectResult(name, error=f"{type(exc).__name__}: {exc}")
+
+
+BatchInput = Union[str, SheetTabRef, Tuple[str, bytes]]
+
+
+def _batch_input_name(item: BatchInput) -> str:
+    if isinstance(item, SheetTabRef):
+        return item.name
+    if isinstance(item, tuple):
+        return item[0]
+    return os.path.basename(str(item))
+
+
+def _resolve_batch_input(item: BatchInput, fetch_values) -> Tuple[str, str, Any]:
+    if isinstance(item, SheetTabRef):
+        values = fetch_values(item.spreadsheet_id, item.sheet_title, item.range_a1)
+        return item.name, "gsheet", values
+    if isinstance(item, tuple):
+        return item[0], "csv", item[1]
+    return _batch_input_name(item), "csv", str(item)
+
+
+def _unique_zip_name(name: str, used: set) -> str:
+    stem, ext = os.path.splitext(name)
+    candidate, n = name, 2
+    while candidate in used:
+        candidate = f"{stem}_{n}{ext}"
+        n += 1
+    used.add(candidate)
+    return candidate
+
+
+def build_batch_zip(projects: List[BatchProjectResult]) -> bytes:
+    """ZIP con los CSV ALVIC (MEC / SIN MEC) de cada proyecto traducido + `resumen_lote.csv`."""
+    buffer = io.BytesIO()
+    used: set = set()
+    rows = []
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for project in projects:
+            row = {"proyecto": project.name, "estado": "OK" if project.ok else "ERROR", "error": project.error}
+            if project.ok:
+                res = project.result
+                if not res.machined.empty:
+                    row["csv_mec"] = _unique_zip_name(f"MEC/{project.mec_filename}", used)
+                    zf.writestr(row["csv_mec"], res.machined_csv)
+                if not res.non_machined.empty:
+                    row["csv_sin_mec"] = _unique_zip_name(f"SIN_MEC/{project.non_mec_filename}", used)
+                    zf.writestr(row["csv_sin_mec"], res.non_machined_csv)
+                row.update(res.summary)
+            rows.append(row)
+        resumen = pd.DataFrame(rows)
+        zf.writestr("resumen_lote.csv", resumen.to_csv(index=False).encode("utf-8-sig"))
+    return buffer.getvalue()
+
+
+def translate_batch(
+    inputs: List[BatchInput],
+    db_csv_path: str,
+    max_workers: Optional[int] = None,
+    fetch_values=None,
+) -> BatchResult:
+    """Traduce varios proyectos en paralelo: rutas CSV, `(nombre, bytes)` de CSVs
+    subidos o pestañas de Sheets (`SheetTabRef`).
+
+    Las pestañas se leen en el proceso principal (`fetch_values`, por defecto
+    `utils.gsheets_io.read_sheet_values`); la traducción se reparte en un pool
+    de procesos que carga el catálogo una vez por worker. Un proyecto que falla
+    queda marcado con su error sin abortar el resto del lote.
+    """
+    if fetch_values is None and any(isinstance(item, SheetTabRef) for item in inputs):
+        from utils.gsheets_io import read_sheet_values as fetch_values
+
+    projects: List[Optional[BatchProjectResult]] = [None] * len(inputs)
+    jobs: List[Tuple[int, Tuple[str, str, Any]]] = []
+    for i, item in enumerate(inputs):
+        try:
+            jobs.append((i, _resolve_batch_input(item, fetch_values)))
+        except Exception as exc:
+            projects[i] = BatchProjectResult(_batch_input_name(item), error=f"{type(exc).__name__}: {exc}")
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        catalog = AlvicCatalogIndex.from_csv(db_csv_path)
+        for i, job in jobs:
+            projects[i] = _translate_batch_job(job, catalog)
+    elif jobs:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(jobs)),
+            initializer=_init_batch_worker,
+            initargs=(db_csv_path,),
+        ) as pool:
+            futures = [(i, job[0], pool.submit(_translate_batch_job, job)) for i, job in jobs]
+            for i, name, future in futures:
+                try:
+                    projects[i] = future.result()
+                except Exception as exc:  # p.ej. worker caído (BrokenProcessPool)
+                    projects[i] = BatchProjectResult(name, error=f"{type(exc).__name__}: {exc}")
+
+    summary: Dict[str, int] = {}
+    for project in projects:
+        if project.ok:
+            for key, value in project.result.summary.items():
+                summary[key] = summary.get(key, 0) + int(value)
+    failed = [p for p in projects if not p.ok]
+    summary["projects_ok"] = len(projects) - len(failed)
+    summary["projects_failed"] = len(failed)
+
+    return BatchResult(projects=projects, summary=summary, zip_bytes=build_batch_zip(projects), failed=failed)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Versión del formato compilado: súbela si cambian las columnas derivadas.
+CATALOG_FORMAT_VERSION = 2
+CACHE_DIRNAME = ".alvic_cache"
+
+# Columnas derivadas (normalización que antes repetía cada carga).
+MODELO_NORM_COL = "__modelo_norm"
+COLOR_NORM_COL = "__color_norm"
+ALTO_NUM_COL = "__alto_num"
+ANCHO_NUM_COL = "__ancho_num"
+VALID_COL = "__valid"
+DERIVED_COLS = [MODELO_NORM_COL, COLOR_NORM_COL, ALTO_NUM_COL, ANCHO_NUM_COL, VALID_COL]
+
+_lock = threading.Lock()
+# (ruta, tamaño, mtime_ns) -> huella del contenido; evita re-hashear si el CSV no cambió.
+_fingerprints: dict[tuple[str, int, int], str] = {}
+# huella -> columnas memory-mapped (una copia de solo lectura por proceso).
+_arrays: dict[str, dict[str, np.ndarray]] = {}
+# huella -> diccionario de cada columna de texto (sus `.npy` guardan códigos).
+_categories: dict[str, dict[str, pd.Index]] = {}
+# huella -> DataFrame ya construido sobre esos arrays.
+_frames: dict[str, pd.DataFrame] = {}
+
+
+def _read_source_csv(csv_path: Path) -> pd.DataFrame:
+    try:
+        return pd.read_csv(csv_path, sep=None, engine="python")
+    except Exception:
+        try:
+            return pd.read_csv(csv_path, sep=";")
+        except Exception:
+            return pd.read_csv(csv_path, sep=",")
+
+
+def _derive_columns(raw: pd.DataFrame) -> dict[str, pd.Series]:
+    def col(name: str) -> pd.Series:
+        # El verificador acepta CSVs con otras cabeceras: columnas ausentes = vacías.
+        return raw[name] if name in raw.columns else pd.Series(np.nan, index=raw.index)
+
+    def text(name: str) -> pd.Series:
+        # Los vacíos siguen vacíos: `astype(str)` los convierte en "nan" según la versión de pandas.
+        values = col(name)
+        return values.astype(str).str.upper().str.strip().where(values.notna())
+
+    modelo = text("Modelo")
+    color = text("Color")
+    alto = pd.to_numeric(col("Alto"), errors="coerce")
+    ancho = pd.to_numeric(col("Ancho"), errors="coerce")
+    valid = col("ARTICULO").notna() & col("Color").notna() & alto.notna() & ancho.notna()
+    return {
+        MODELO_NORM_COL: modelo,
+        COLOR_NORM_COL: color,
+        ALTO_NUM_COL: alto,
+        ANCHO_NUM_COL: ancho,
+        VALID_COL: valid,
+    }
+
+
+def _to_storable(series: pd.Series) -> tuple[np.ndarray, list[str] | None]:
+    """Columna -> (array numpy memory-mappable, diccionario o None).
+
+    Los numéricos se guardan tal cual; el texto como códigos `int32` (-1 = vacío)
+    más la lista de valores distintos, que es lo único que cada proceso tiene en memoria.
+    """
+    if pd.api.types.is_bool_dtype(series) or (
+        pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_object_dtype(series)
+    ):
+        return series.to_numpy(), None
+    codes, categories = pd.factorize(series.astype(str).where(series.notna()))
+    return codes.astype(np.int32), [str(c) for c in categories]
+
+
+def source_fingerprint(csv_path: str | Path) -> str:
+    """Huella del CSV fuente (contenido + versión de formato), cacheada por mtime/tamaño."""
+    path = Path(csv_path).resolve()
+    stat = path.stat()
+    stamp = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        cached = _fingerprints.get(stamp)
+    if cached is not None:
+        return cached
+
+    digest = hashlib.sha1(f"alvic-catalog-v{CATALOG_FORMAT_VERSION}|".encode("utf-8"))
+    digest.update(path.read_bytes())
+    fingerprint = digest.hexdigest()
+    with _lock:
+        _fingerprints[stamp] = fingerprint
+    return fingerprint
+
+
+def default_cache_dir(csv_path: str | Path) -> Path:
+    return Path(csv_path).resolve().parent / CACHE_DIRNAME
+
+
+def compile_catalog(csv_path: str | Path, cache_dir: str | Path | None = None) -> Path:
+    """Compila el CSV ALVIC a un directorio de columnas `.npy` y devuelve su ruta.
+
+    El directorio se nombra con la huella del CSV, así que un CSV modificado
+    genera un artefacto nuevo automáticamente. La escritura es atómica
+    (directorio temporal + rename) para que varios procesos puedan compilar a la vez.
+    """
+    csv_path = Path(csv_path)
+    cache_root = Path(cache_dir) if cache_dir is not None else default_cache_dir(csv_path)
+    fingerprint = source_fingerprint(csv_path)
+    target = cache_root / f"{csv_path.stem}-{fingerprint[:16]}"
+    if (target / "meta.json").exists():
+        return target
+
+    raw = _read_source_csv(csv_path)
+    columns = {str(col): raw[col] for col in raw.columns}
+    columns.update(_derive_columns(raw))
+
+    cache_root.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{csv_path.stem}-", dir=cache_root))
+    try:
+        meta = {
+            "format_version": CATALOG_FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "source": csv_path.name,
+            "rows": int(len(raw)),
+            "raw_columns": [str(col) for col in raw.columns],
+            "columns": [],
+        }
+        for i, (name, series) in enumerate(columns.items()):
+            file_name = f"c{i:03d}.npy"
+            values, categories = _to_storable(series)
+            np.save(tmp_dir / file_name, values, allow_pickle=False)
+            entry = {"name": name, "file": file_name}
+            if categories is not None:
+                entry["categories"] = f"c{i:03d}.json"
+                (tmp_dir / entry["categories"]).write_text(json.dumps(categories, ensure_ascii=False), encoding="utf-8")
+            meta["columns"].append(entry)
+        (tmp_dir / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        try:
+            os.replace(tmp_dir, target)
+        except OSError:
+            # Otro proceso ganó la carrera: su artefacto es equivalente.
+            if not (target / "meta.json").exists():
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Limpieza best-effort de artefactos de versiones anteriores del mismo CSV.
+    for old in cache_root.glob(f"{csv_path.stem}-*"):
+        if old != target and old.is_dir() and not old.name.startswith("."):
+            shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+def load_catalog_arrays(csv_path: str | Path, cache_dir: str | Path | None = None) -> dict[str, np.ndarray]:
+    """Columnas del catálogo como arrays memory-mapped de solo lectura.
+
+    Las columnas de texto son códigos `int32` sobre su diccionario
+    (`load_catalog_categories`). Todas las sesiones de un proceso comparten el
+    mismo dict; entre procesos, el SO comparte las páginas de los `.npy` mapeados.
+    """
+    fingerprint = source_fingerprint(csv_path)
+    with _lock:
+        cached = _arrays.get(fingerprint)
+    if cached is not None:
+        return cached
+
+    artifact = compile_catalog(csv_path, cache_dir=cache_dir)
+    meta = json.loads((artifact / "meta.json").read_text(encoding="utf-8"))
+    arrays = {
+        col["name"]: np.load(artifact / col["file"], mmap_mode="r", allow_pickle=False)
+        for col in meta["columns"]
+    }
+    categories = {
+        col["name"]: pd.Index(json.loads((artifact / col["categories"]).read_text(encoding="utf-8")), dtype=object)
+        for col in meta["columns"]
+        if "categories" in col
+    }
+    with _lock:
+        _arrays[fingerprint] = arrays
+        _categories[fingerprint] = categories
+    return arrays
+
+
+def load_catalog_categories(csv_path: str | Path, cache_dir: str | Path | None = None) -> dict[str, pd.Index]:
+    """Diccionario (valores distintos) de cada columna de texto del catálogo compilado."""
+    load_catalog_arrays(csv_path, cache_dir=cache_dir)
+    fingerprint = source_fingerprint(csv_path)
+    with _lock:
+        return _categories[fingerprint]
+
+
+def load_catalog_frame(csv_path: str | Path, cache_dir: str | Path | None = None) -> pd.DataFrame:
+    """Catálogo completo (columnas originales + derivadas `__*`) como DataFrame.
+
+    Devuelve una copia superficial: las columnas numéricas siguen apuntando a
+    los `.npy` mapeados y las de texto son `category` (códigos + el diccionario
+    del proceso). Si la caché no se puede escribir (p.ej. disco de solo
+    lectura) se parsea el CSV directamente.
+    """
+    try:
+        fingerprint = source_fingerprint(csv_path)
+        with _lock:
+            cached = _frames.get(fingerprint)
+        if cached is None:
+            arrays = load_catalog_arrays(csv_path, cache_dir=cache_dir)
+            categories = load_catalog_categories(csv_path, cache_dir=cache_dir)
+    except OSError:
+        raw = _read_source_csv(Path(csv_path))
+        return pd.concat([raw, pd.DataFrame(_derive_columns(raw))], axis=1)
+
+    if cached is None:
+        data = {}
+        for name, values in arrays.items():
+            if name in categories:
+                data[name] = pd.Series(
+                    pd.Categorical.from_codes(np.asarray(values), categories=categories[name], validate=False)
+                )
+            else:
+                data[name] = pd.Series(np.asarray(values), copy=False)
+        cached = pd.DataFrame(data, copy=False)
+        with _lock:
+            _frames[fingerprint] = cached
+    return cached.copy(deep=False)
+
+
+def clear_memory_cache() -> None:
+    with _lock:
+        _fingerprints.clear()
+        _arrays.clear()
+        _categories.clear()
+        _frames.clear()